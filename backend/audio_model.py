@@ -1,39 +1,92 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from transformers import Wav2Vec2FeatureExtractor, Wav2Vec2ForSequenceClassification
-import torch
-import sounddevice as sd
-import soundfile as sf
+try:
+    import sounddevice as sd
+except (ImportError, OSError) as e:
+    # sounddevice/PortAudio is missing on headless hosts; uploads still work without it
+    print(f"Microphone recording unavailable: {e}")
+    sd = None
 import librosa
 import numpy as np
+import hashlib
 import tempfile
+import threading
+import time
 import os
 from datetime import datetime
 
+from inference import MODELS, ModelRunner, cache_from_env, error_response, prediction_payload
+from deadlines import enforce_deadlines
+from instrumentation import instrument_flask, stage
+from jobs import JobQueueFull, accepted, jobs_from_env, register_jobs
+from profiling import register_profiling
+from serving import assign_priorities, respond, run_app
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend communication
 
-# Load the emotion recognition model (loads once at startup)
-print("Loading emotion recognition model...")
-MODEL_NAME = "ehcalabres/wav2vec2-lg-xlsr-en-speech-emotion-recognition"
+MODEL_NAME = MODELS['audio']
 
 # Emotion labels from RAVDESS dataset
 EMOTION_LABELS = ['angry', 'calm', 'disgust', 'fearful', 'happy', 'neutral', 'sad', 'surprised']
 
-try:
-    # Load feature extractor and model separately
-    feature_extractor = Wav2Vec2FeatureExtractor.from_pretrained(MODEL_NAME)
-    model = Wav2Vec2ForSequenceClassification.from_pretrained(MODEL_NAME, ignore_mismatched_sizes=True)
-    model.eval()  # Set to evaluation mode
+# Configuration
+SAMPLE_RATE = 16000  # Required sample rate for the model
+# Recordings longer than this are analyzed in windows of this many seconds
+WINDOW_SECONDS = float(os.getenv('AUDIO_WINDOW_SECONDS', '30'))
+
+
+class AudioEmotionRunner(ModelRunner):
+    """wav2vec2 speech emotion classifier over 16 kHz mono waveforms"""
+
+    name = 'audio'
+
+    def load_model(self):
+        # Load feature extractor and model separately
+        self.feature_extractor = self.pretrained_processor(Wav2Vec2FeatureExtractor)
+        return self.pretrained_model(Wav2Vec2ForSequenceClassification, ignore_mismatched_sizes=True)
+
+    def preprocess(self, waveforms):
+        return self.feature_extractor(waveforms, sampling_rate=SAMPLE_RATE, return_tensors="pt", padding=True)
+
+    def cache_key(self, waveform):
+        return hashlib.blake2b(np.ascontiguousarray(waveform).tobytes(), digest_size=16).hexdigest()
+
+    def warmup_inputs(self):
+        # A short clip and a typical recording length, so batches pad to realistic sizes
+        return [np.zeros(SAMPLE_RATE, dtype=np.float32), np.zeros(5 * SAMPLE_RATE, dtype=np.float32)]
+
+
+# Load the emotion recognition model (loads once at startup)
+print("Loading emotion recognition model...")
+
+runner = AudioEmotionRunner(MODEL_NAME, labels=EMOTION_LABELS, cache=cache_from_env('audio'), max_batch_size=4)
+instrument_flask(app, 'audio', runner)
+enforce_deadlines(app, 'audio', runner)
+assign_priorities(app)
+register_profiling(app, runner)
+# Long recordings run as asynchronous jobs (see jobs.py)
+jobs = jobs_from_env('audio')
+register_jobs(app, jobs)
+# One microphone: recordings take turns
+recording_lock = threading.Lock()
+if runner.load():
+    runner.warmup()
     print("Model loaded successfully!")
     print(f"Emotion labels: {EMOTION_LABELS}")
-except Exception as e:
-    print(f"Error loading model: {e}")
-    feature_extractor = None
-    model = None
+else:
+    print(f"Error loading model: {runner.load_error}")
 
-# Configuration
-SAMPLE_RATE = 16000  # Required sample rate for the model
+
+def predict_waveform(audio):
+    """
+    Predict emotion from a 16 kHz mono float waveform
+    """
+    try:
+        return runner.predict(np.asarray(audio, dtype=np.float32))
+    except Exception as e:
+        raise Exception(f"Prediction error: {str(e)}")
 
 def predict_emotion(audio_path):
     """
@@ -41,41 +94,156 @@ def predict_emotion(audio_path):
     """
     try:
         # Load audio file
-        audio, sr = librosa.load(audio_path, sr=SAMPLE_RATE)
-        
-        # Process audio
-        inputs = feature_extractor(audio, sampling_rate=SAMPLE_RATE, return_tensors="pt", padding=True)
-        
-        # Make prediction
-        with torch.no_grad():
-            logits = model(inputs.input_values).logits
-        
-        # Get probabilities
-        probabilities = torch.nn.functional.softmax(logits, dim=-1)
-        probabilities = probabilities[0].tolist()
-        
-        # Create results
-        results = []
-        for idx, prob in enumerate(probabilities):
-            if idx < len(EMOTION_LABELS):
-                results.append({
-                    'label': EMOTION_LABELS[idx],
-                    'score': float(prob)
-                })
-        
-        # Sort by score
-        results.sort(key=lambda x: x['score'], reverse=True)
-        
-        return results
-        
+        with stage('decode'):
+            audio, sr = librosa.load(audio_path, sr=SAMPLE_RATE)
     except Exception as e:
         raise Exception(f"Prediction error: {str(e)}")
+    return predict_waveform(audio)
+
+def predict_uploaded_file(audio_file):
+    """
+    Save an uploaded file temporarily (librosa needs a seekable path for most formats) and predict
+    """
+    with stage('decode'), tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp_file:
+        audio_file.save(tmp_file.name)
+        tmp_path = tmp_file.name
+
+    try:
+        return predict_emotion(tmp_path)
+    finally:
+        os.unlink(tmp_path)
+
+def load_audio_bytes(audio_bytes):
+    """
+    Decode audio file bytes to a 16 kHz mono waveform
+    """
+    with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp_file:
+        tmp_file.write(audio_bytes)
+        tmp_path = tmp_file.name
+
+    try:
+        with stage('decode'):
+            audio, sr = librosa.load(tmp_path, sr=SAMPLE_RATE)
+        return audio
+    finally:
+        os.unlink(tmp_path)
+
+def analyze_long_audio(audio, progress=None):
+    """
+    Predict emotion over a recording of any length
+
+    The recording is cut into WINDOW_SECONDS windows that go through the model in
+    batches, and the window scores are averaged weighted by length (a recording of
+    one window gets the same predictions as predict_waveform). Returns
+    (predictions, segments) with each window's top emotion in segments.
+    """
+    audio = np.asarray(audio, dtype=np.float32)
+    window = max(1, int(WINDOW_SECONDS * SAMPLE_RATE))
+    windows = [audio[start:start + window] for start in range(0, max(len(audio), 1), window)]
+    # A few seconds of tail would count as much as a window; fold it into the previous one
+    if len(windows) > 1 and len(windows[-1]) < window // 4:
+        tail = windows.pop()
+        windows[-1] = np.concatenate([windows[-1], tail])
+
+    totals = {}
+    segments = []
+    offset = 0
+    for start in range(0, len(windows), runner.max_batch_size):
+        group = windows[start:start + runner.max_batch_size]
+        for samples, predictions in zip(group, runner.predict_batch(group)):
+            weight = len(samples) / max(len(audio), 1)
+            for prediction in predictions:
+                totals[prediction['label']] = totals.get(prediction['label'], 0.0) + prediction['score'] * weight
+            segments.append({
+                'start': round(offset / SAMPLE_RATE, 2),
+                'end': round((offset + len(samples)) / SAMPLE_RATE, 2),
+                'top_emotion': predictions[0]['label'],
+                'confidence': predictions[0]['score'],
+            })
+            offset += len(samples)
+        if progress is not None:
+            progress(len(segments) / len(windows),
+                     f"Analyzed {offset / SAMPLE_RATE:.0f}s of {len(audio) / SAMPLE_RATE:.0f}s")
+
+    predictions = [{'label': label, 'score': score} for label, score in totals.items()]
+    predictions.sort(key=lambda prediction: prediction['score'], reverse=True)
+    return predictions, segments
+
+def upload_job(progress, audio_bytes, filename):
+    """Job body: decode and analyze an uploaded recording"""
+    progress(0.0, 'Decoding audio')
+    audio = load_audio_bytes(audio_bytes)
+    predictions, segments = analyze_long_audio(audio, progress)
+    return prediction_payload(predictions, filename=filename,
+                              duration=round(len(audio) / SAMPLE_RATE, 2), segments=segments)
+
+def record_job(progress, duration):
+    """Job body: record from the microphone, then analyze (each half of the progress)"""
+    with recording_lock:
+        audio_data = sd.rec(int(duration * SAMPLE_RATE), samplerate=SAMPLE_RATE, channels=1, dtype='float32')
+        started = time.monotonic()
+        while time.monotonic() - started < duration:
+            progress(0.5 * (time.monotonic() - started) / duration, 'Recording')
+            time.sleep(0.25)
+        sd.wait()
+
+    predictions, segments = analyze_long_audio(
+        audio_data[:, 0], lambda fraction, message=None: progress(0.5 + 0.5 * fraction, message))
+    return prediction_payload(predictions, duration=duration, segments=segments)
+
+def submit_audio_job(kind, fn, *args):
+    """
+    Queue an analysis job without going through HTTP
+
+    Used by the job routes below and by the gateway's monolith mode.
+    Returns a (payload, status_code) tuple; 202 with the job ID when queued.
+    """
+    if not runner.available:
+        return {
+            'success': False,
+            'error': 'Model not loaded'
+        }, 500
+
+    try:
+        job_id = jobs.submit(kind, fn, *args)
+    except JobQueueFull as e:
+        return {
+            'success': False,
+            'error': f'Too many queued jobs ({e})'
+        }, 429
+
+    return accepted(job_id), 202
+
+def run_audio_analysis(audio_bytes, filename=None):
+    """
+    Predict emotion for raw audio file bytes without going through HTTP
+
+    Used by the gateway's monolith mode. Returns a (payload, status_code) tuple.
+    """
+    if not runner.available:
+        return {
+            'success': False,
+            'error': 'Model not loaded'
+        }, 500
+
+    # Save to temporary file
+    with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp_file:
+        tmp_file.write(audio_bytes)
+        tmp_path = tmp_file.name
+
+    try:
+        results = predict_emotion(tmp_path)
+    finally:
+        os.unlink(tmp_path)
+
+    return prediction_payload(results, filename=filename), 200
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
-        'status': 'healthy' if model is not None else 'model_not_loaded',
+        'status': runner.status,
+        'model_state': runner.load_state(),
         'model': MODEL_NAME,
         'emotions': EMOTION_LABELS,
         'timestamp': datetime.now().isoformat()
@@ -86,159 +254,134 @@ def record_and_predict():
     """
     Record audio from microphone and predict emotion
     """
-    if model is None:
-        return jsonify({
-            'success': False,
-            'error': 'Model not loaded'
-        }), 500
-    
+    if not runner.available:
+        return error_response('Model not loaded', 500)
+
+    if sd is None:
+        return error_response('Microphone recording is not available on this host', 503)
+
     try:
         # Get duration from request or use default
         data = request.get_json() or {}
         duration = data.get('duration', 5)
-        
+
         print(f"Recording audio for {duration} seconds...")
-        
+
         # Record audio from microphone
-        audio_data = sd.rec(
-            int(duration * SAMPLE_RATE),
-            samplerate=SAMPLE_RATE,
-            channels=1,
-            dtype='float32'
-        )
-        sd.wait()  # Wait until recording is finished
-        
+        with recording_lock:
+            audio_data = sd.rec(
+                int(duration * SAMPLE_RATE),
+                samplerate=SAMPLE_RATE,
+                channels=1,
+                dtype='float32'
+            )
+            sd.wait()  # Wait until recording is finished
+
         print("Recording finished. Processing...")
-        
-        # Save to temporary file
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp_file:
-            sf.write(tmp_file.name, audio_data, SAMPLE_RATE)
-            tmp_path = tmp_file.name
-        
-        # Predict emotion
-        results = predict_emotion(tmp_path)
-        
-        # Clean up temporary file
-        os.unlink(tmp_path)
-        
+
+        # The recording is already 16 kHz float32, so skip the temp-file round trip
+        results = predict_waveform(audio_data[:, 0])
+
         print(f"Prediction results: {results[:3]}")
-        
-        return jsonify({
-            'success': True,
-            'predictions': results,
-            'top_emotion': results[0]['label'],
-            'confidence': results[0]['score'],
-            'duration': duration
-        })
-        
+
+        return respond(prediction_payload(results, duration=duration), runner.label_index)
+
     except Exception as e:
         print(f"Error: {str(e)}")
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
+        return error_response(str(e), 500)
 
 @app.route('/api/upload-and-predict', methods=['POST'])
 def upload_and_predict():
     """
     Accept uploaded audio file and predict emotion
     """
-    if model is None:
-        return jsonify({
-            'success': False,
-            'error': 'Model not loaded'
-        }), 500
-    
+    if not runner.available:
+        return error_response('Model not loaded', 500)
+
     try:
         if 'audio' not in request.files:
-            return jsonify({
-                'success': False,
-                'error': 'No audio file provided'
-            }), 400
-        
+            return error_response('No audio file provided', 400)
+
         audio_file = request.files['audio']
-        
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp_file:
-            audio_file.save(tmp_file.name)
-            tmp_path = tmp_file.name
-        
+
         print(f"Processing uploaded file: {audio_file.filename}")
-        
+
         # Predict emotion
-        results = predict_emotion(tmp_path)
-        
-        # Clean up temporary file
-        os.unlink(tmp_path)
-        
+        results = predict_uploaded_file(audio_file)
+
         print(f"Prediction results: {results[:3]}")
-        
-        return jsonify({
-            'success': True,
-            'predictions': results,
-            'top_emotion': results[0]['label'],
-            'confidence': results[0]['score'],
-            'filename': audio_file.filename
-        })
-        
+
+        return respond(prediction_payload(results, filename=audio_file.filename), runner.label_index)
+
     except Exception as e:
         print(f"Error: {str(e)}")
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
+        return error_response(str(e), 500)
 
 @app.route('/api/predict-from-data', methods=['POST'])
 def predict_from_data():
     """
     Accept audio data as base64 or raw bytes and predict emotion
     """
-    if model is None:
-        return jsonify({
-            'success': False,
-            'error': 'Model not loaded'
-        }), 500
-    
+    if not runner.available:
+        return error_response('Model not loaded', 500)
+
     try:
         # Get audio data from request
         audio_file = request.files.get('audio')
-        
+
         if not audio_file:
-            return jsonify({
-                'success': False,
-                'error': 'No audio data provided'
-            }), 400
-        
-        # Save to temporary file
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp_file:
-            audio_file.save(tmp_file.name)
-            tmp_path = tmp_file.name
-        
+            return error_response('No audio data provided', 400)
+
         # Predict emotion
-        results = predict_emotion(tmp_path)
-        
-        # Clean up
-        os.unlink(tmp_path)
-        
-        return jsonify({
-            'success': True,
-            'predictions': results,
-            'top_emotion': results[0]['label'],
-            'confidence': results[0]['score']
-        })
-        
+        results = predict_uploaded_file(audio_file)
+
+        return respond(prediction_payload(results), runner.label_index)
+
     except Exception as e:
         print(f"Error: {str(e)}")
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
+        return error_response(str(e), 500)
+
+@app.route('/api/jobs/upload-and-predict', methods=['POST'])
+def submit_upload_job():
+    """
+    Queue analysis of an uploaded audio file of any length
+    Answers 202 with the job ID; poll /api/jobs/<job_id> or stream /api/jobs/<job_id>/events
+    """
+    if 'audio' not in request.files:
+        return error_response('No audio file provided', 400)
+
+    audio_file = request.files['audio']
+    payload, status = submit_audio_job('upload', upload_job, audio_file.read(), audio_file.filename)
+    return jsonify(payload), status
+
+@app.route('/api/jobs/record-and-predict', methods=['POST'])
+def submit_record_job():
+    """
+    Queue a microphone recording and its analysis
+    Answers 202 with the job ID right away instead of holding the request for the recording
+    """
+    if sd is None:
+        return error_response('Microphone recording is not available on this host', 503)
+
+    data = request.get_json(silent=True) or {}
+    try:
+        duration = float(data.get('duration', 5))
+    except (TypeError, ValueError):
+        return error_response('duration must be a number of seconds', 400)
+    if duration <= 0:
+        return error_response('duration must be positive', 400)
+
+    payload, status = submit_audio_job('record', record_job, duration)
+    return jsonify(payload), status
 
 @app.route('/api/available-devices', methods=['GET'])
 def get_audio_devices():
     """
     Get list of available audio input devices
     """
+    if sd is None:
+        return error_response('Microphone recording is not available on this host', 503)
+
     try:
         devices = sd.query_devices()
         input_devices = [
@@ -250,17 +393,14 @@ def get_audio_devices():
             for i, device in enumerate(devices)
             if device['max_input_channels'] > 0
         ]
-        
+
         return jsonify({
             'success': True,
             'devices': input_devices
         })
-        
+
     except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
+        return error_response(str(e), 500)
 
 @app.route('/api/emotions', methods=['GET'])
 def get_emotions():
@@ -280,5 +420,9 @@ if __name__ == '__main__':
     print("  - POST /api/record-and-predict")
     print("  - POST /api/upload-and-predict")
     print("  - POST /api/predict-from-data")
+    print("  - POST /api/jobs/upload-and-predict")
+    print("  - POST /api/jobs/record-and-predict")
+    print("  - GET  /api/jobs/<job_id>")
+    print("  - GET  /api/jobs/<job_id>/events")
     print("  - GET  /api/available-devices")
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    run_app(app, 'audio')
@@ -0,0 +1,143 @@
+"""
+LLM Path Benchmark
+Drives the gateway's /api/generate-tips, /api/fusion or /api/fusion/stream at a
+configurable concurrency and reports latency percentiles alongside what the LLM layer
+did (upstream calls, coalesced callers, cache hits) from /api/llm-metrics.
+
+Run the gateway against the mock server so results do not depend on OpenAI:
+
+    python benchmarks/mock_llm_server.py --latency 1.5 --seed 1
+    LLM_BASE_URL=http://127.0.0.1:8100/v1 python gateway/app.py
+    python benchmarks/bench_llm.py --endpoint tips --requests 200 --concurrency 20 --profiles 5
+
+--profiles sets how many distinct emotional states the requests cycle through: 1 makes
+every request identical (best case for coalescing and caching), a large number makes
+them all distinct.
+"""
+
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from latency_stats import summarize
+
+EMOTIONS = ["sadness", "joy", "anger", "fear", "neutral", "surprise", "disgust"]
+
+
+def profile_payload(endpoint, index, profiles):
+    """Request body for emotional state number `index % profiles`"""
+    state = index % profiles
+    emotion = EMOTIONS[state % len(EMOTIONS)]
+    # Spread states over stress buckets too, so profiles map to distinct cache keys
+    stress = round((state // len(EMOTIONS) % 10) / 10 + 0.05, 2)
+    predictions = [{'label': emotion, 'score': 0.7}, {'label': 'neutral', 'score': 0.2}, {'label': 'surprise', 'score': 0.1}]
+    if endpoint == 'tips':
+        return {
+            'stressScore': stress,
+            'primaryEmotion': emotion,
+            'emotionBreakdown': predictions,
+            'hasTextAnalysis': True,
+            'hasFaceAnalysis': False,
+            'textStress': stress,
+            'faceStress': 0
+        }
+    return {'text_result': {'success': True, 'predictions': predictions}}
+
+
+def send(session, url, endpoint, payload):
+    """One request; returns (latency_ms, time_to_first_byte_ms, ok)"""
+    t0 = time.perf_counter()
+    if endpoint == 'fusion-stream':
+        ttfb = None
+        with session.post(url, json=payload, stream=True, timeout=120) as response:
+            for line in response.iter_lines():
+                if ttfb is None and line.startswith(b'event: token'):
+                    ttfb = (time.perf_counter() - t0) * 1000
+            ok = response.status_code == 200
+        return (time.perf_counter() - t0) * 1000, ttfb, ok
+    response = session.post(url, json=payload, timeout=120)
+    return (time.perf_counter() - t0) * 1000, None, response.status_code == 200
+
+
+def fetch_metrics(session, gateway_url):
+    try:
+        return session.get(f"{gateway_url}/api/llm-metrics", timeout=5).json()
+    except Exception:
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the gateway's LLM-backed endpoints")
+    parser.add_argument('--gateway-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--endpoint', choices=['tips', 'fusion', 'fusion-stream'], default='tips')
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--profiles', type=int, default=1, help='Distinct emotional states to cycle through')
+    parser.add_argument('--mock-url', help='Mock LLM server base URL, to include its /stats')
+    parser.add_argument('--json', action='store_true', help='Print the result as JSON')
+    args = parser.parse_args()
+
+    path = {'tips': '/api/generate-tips', 'fusion': '/api/fusion', 'fusion-stream': '/api/fusion/stream'}[args.endpoint]
+    url = f"{args.gateway_url}{path}"
+    local = threading.local()
+
+    def worker(index):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        return send(local.session, url, args.endpoint, profile_payload(args.endpoint, index, args.profiles))
+
+    control = requests.Session()
+    before = fetch_metrics(control, args.gateway_url)
+    if args.mock_url:
+        control.post(f"{args.mock_url}/stats", timeout=5)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(worker, range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    after = fetch_metrics(control, args.gateway_url)
+    latencies = [latency for latency, _, ok in results if ok]
+    result = {
+        'endpoint': args.endpoint,
+        'concurrency': args.concurrency,
+        'profiles': args.profiles,
+        'failed': sum(1 for _, _, ok in results if not ok),
+        'latency': summarize(latencies, elapsed),
+        'llm': {
+            key: after.get(key, 0) - before.get(key, 0)
+            for key in ('callers', 'upstream_calls', 'coalesced', 'timeouts', 'errors')
+        },
+        'cache_hits': after.get('cache', {}).get('hits', 0) - before.get('cache', {}).get('hits', 0)
+    }
+    first_tokens = [ttfb for _, ttfb, ok in results if ok and ttfb is not None]
+    if first_tokens:
+        result['time_to_first_token'] = summarize(first_tokens, elapsed)
+    if args.mock_url:
+        result['mock'] = control.get(f"{args.mock_url}/stats", timeout=5).json()
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    latency = result['latency']
+    print(f"\n{args.endpoint}: {args.requests} requests, concurrency {args.concurrency}, {args.profiles} profile(s)")
+    print(f"  throughput {latency['throughput_rps']} req/s, failed {result['failed']}")
+    print(f"  latency ms  p50 {latency['p50_ms']}  p95 {latency['p95_ms']}  p99 {latency['p99_ms']}  max {latency['max_ms']}")
+    if 'time_to_first_token' in result:
+        ttft = result['time_to_first_token']
+        print(f"  first token ms  p50 {ttft['p50_ms']}  p95 {ttft['p95_ms']}  p99 {ttft['p99_ms']}")
+    llm = result['llm']
+    print(f"  LLM: {llm['upstream_calls']} upstream calls for {llm['callers']} callers "
+          f"({llm['coalesced']} coalesced), {result['cache_hits']} cache hits, "
+          f"{llm['timeouts']} timeouts, {llm['errors']} errors")
+    if 'mock' in result:
+        print(f"  mock server: {result['mock']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Transport Benchmark
+Compares gateway->service round trips over loopback TCP and Unix domain sockets
+
+By default two local echo servers that mimic the text service payload are started,
+so the numbers isolate per-hop overhead from model inference. Like the services, they
+run on Werkzeug's server, which closes the connection after every response, so every
+case opens a new connection per request. Pass --text-url and/or
+--text-socket to benchmark a running text service instead.
+
+Usage:
+    python benchmarks/bench_transport.py --requests 2000
+    python benchmarks/bench_transport.py --text-url http://127.0.0.1:5001 --text-socket /tmp/neuropulse-text.sock
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+
+import requests
+from werkzeug.serving import WSGIRequestHandler, make_server
+from werkzeug.wrappers import Request, Response
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from transport import UNIX_SCHEME, create_session
+
+# Response shaped like /api/analyze-text so serialization cost is realistic
+SAMPLE_RESPONSE = {
+    'success': True,
+    'predictions': [
+        {'label': label, 'score': score}
+        for label, score in [
+            ('joy', 0.81), ('surprise', 0.07), ('neutral', 0.05), ('sadness', 0.03),
+            ('anger', 0.02), ('fear', 0.01), ('disgust', 0.01)
+        ]
+    ],
+    'top_emotion': 'joy',
+    'confidence': 0.81,
+    'text_length': 24
+}
+SAMPLE_TEXT = "I am feeling happy today!"
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """Request handler without per-request access logging"""
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+@Request.application
+def echo_app(request):
+    request.get_json()
+    return Response(json.dumps(SAMPLE_RESPONSE), mimetype='application/json')
+
+
+def start_echo_server(host, port=0):
+    """Start a threaded echo server in the background and return it"""
+    server = make_server(host, port, echo_app, threaded=True, request_handler=QuietRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def run_case(name, post, url, count, warmup):
+    """Issue `count` requests through `post` and collect latencies in milliseconds"""
+    for _ in range(warmup):
+        post(url, json={'text': SAMPLE_TEXT}, timeout=20).raise_for_status()
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(count):
+        t0 = time.perf_counter()
+        response = post(url, json={'text': SAMPLE_TEXT}, timeout=20)
+        response.raise_for_status()
+        response.json()
+        latencies.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'case': name,
+        'requests': count,
+        'throughput_rps': count / elapsed,
+        'mean_ms': statistics.mean(latencies),
+        'p50_ms': latencies[int(0.50 * (count - 1))],
+        'p95_ms': latencies[int(0.95 * (count - 1))],
+        'p99_ms': latencies[int(0.99 * (count - 1))],
+    }
+
+
+def print_results(results):
+    print(f"{'Case':<34}{'req/s':>10}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+    print("-" * 84)
+    for r in results:
+        print(f"{r['case']:<34}{r['throughput_rps']:>10.0f}{r['mean_ms']:>10.3f}"
+              f"{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['p99_ms']:>10.3f}")
+    print("(latencies in ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark loopback TCP vs Unix socket transport")
+    parser.add_argument('--requests', type=int, default=1000, help='Requests per case')
+    parser.add_argument('--warmup', type=int, default=50, help='Warm-up requests per case')
+    parser.add_argument('--text-url', help='Benchmark a running text service over TCP')
+    parser.add_argument('--text-socket', help='Benchmark a running text service over this Unix socket')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    servers = []
+    tcp_base = args.text_url
+    socket_path = args.text_socket
+    tmp_dir = None
+
+    if not tcp_base and not socket_path:
+        tcp_server = start_echo_server('127.0.0.1')
+        servers.append(tcp_server)
+        tcp_base = f"http://127.0.0.1:{tcp_server.server_port}"
+
+        tmp_dir = tempfile.mkdtemp(prefix='neuropulse-bench-')
+        socket_path = os.path.join(tmp_dir, 'echo.sock')
+        servers.append(start_echo_server(f"unix://{socket_path}"))
+
+    endpoint = '/api/analyze-text'
+    session = create_session()
+    results = []
+
+    try:
+        if tcp_base:
+            results.append(run_case("TCP, requests.post per call", requests.post,
+                                    tcp_base + endpoint, args.requests, args.warmup))
+            results.append(run_case("TCP, shared session", session.post,
+                                    tcp_base + endpoint, args.requests, args.warmup))
+        if socket_path:
+            unix_base = UNIX_SCHEME + quote(socket_path, safe="")
+            results.append(run_case("Unix socket, shared session", session.post,
+                                    unix_base + endpoint, args.requests, args.warmup))
+    finally:
+        session.close()
+        for server in servers:
+            server.shutdown()
+        if tmp_dir and os.path.exists(socket_path):
+            os.unlink(socket_path)
+            os.rmdir(tmp_dir)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+"""
+CPU Budget Autotune
+Tries candidate CPU splits between the co-located model services under mixed traffic
+and writes the best one as a plan file for cpu_budget.py (CPU_PLAN_FILE).
+
+Each candidate is a weighting of the services' core shares, a worker layout and,
+with --affinity, core pinning on or off:
+
+    wide   one process per service using all of its share's cores
+    split  pre-forked workers, one per two cores of the share (prefork.py)
+
+For every distinct resulting allocation the services are started with that plan, a
+mixed load (loadtest.py request kinds) runs for --duration seconds, and the candidate
+is scored by its worst per-kind p95 latency, so the winner is the split that keeps
+every modality predictable rather than the one that makes one of them fast. Runs with
+more than 1% failed requests are disqualified.
+
+Run it with the real models on the target host (stubbed models measure only the
+serving path, so --stub is for trying the script out):
+
+Usage:
+    python benchmarks/cpu_autotune.py --duration 60 --concurrency 12 --output cpu_plan.json
+    CPU_PLAN_FILE=cpu_plan.json python start_all_services.py --workers auto
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from loadtest import PayloadFactory, LoadTest, KINDS, parse_mix, report, spawn_stack
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+from cpu_budget import DEFAULT_WEIGHTS, describe_cpus, host_cpus, plan
+from transport import service_base_url
+
+DEFAULT_MIX = 'text:short=2,text:long=1,face:medium=2,audio:3s=1'
+
+WEIGHT_PRESETS = {
+    'default': DEFAULT_WEIGHTS,
+    'equal': {'audio': 1, 'text': 1, 'face': 1},
+    'audio-heavy': {'audio': 4, 'text': 1, 'face': 1},
+    'text-heavy': {'audio': 2, 'text': 2, 'face': 1},
+    'face-heavy': {'audio': 2, 'text': 1, 'face': 3},
+}
+
+LAYOUTS = ('wide', 'split')
+
+MAX_ERROR_RATE = 0.01
+
+
+def candidates(services, cpus, affinity_options):
+    """Distinct (name, weights, workers, affinity, allocations) to try"""
+    seen = set()
+    for preset, weights in WEIGHT_PRESETS.items():
+        for layout in LAYOUTS:
+            for affinity in affinity_options:
+                allocations = plan(services, cpus=cpus, weights=weights, affinity=affinity,
+                                   workers={name: 1 for name in services} if layout == 'wide' else None)
+                workers = {name: allocation.workers for name, allocation in allocations.items()}
+                fingerprint = tuple(sorted(
+                    (name, tuple(a.cpus), a.workers, a.threads, a.affinity) for name, a in allocations.items()))
+                if fingerprint in seen:
+                    continue
+                seen.add(fingerprint)
+                name = f"{preset}/{layout}{'/pinned' if affinity else ''}"
+                yield name, weights, layout, workers, affinity, allocations
+
+
+def describe(allocations):
+    return '  '.join(f"{name} {describe_cpus(a.cpus)} {a.workers}x{a.threads}t" for name, a in allocations.items())
+
+
+def score(run):
+    """Worst per-kind p95 in ms (lower is better); None when too many requests failed"""
+    if run['overall']['error_rate'] > MAX_ERROR_RATE or not run['kinds']:
+        return None
+    return max(kind['p95_ms'] for kind in run['kinds'].values())
+
+
+def run_candidate(args, mix, services, weights, layout, workers, affinity):
+    os.environ['CPU_BUDGET_SERVICES'] = ','.join(services)
+    os.environ['CPU_BUDGET_WEIGHTS'] = ','.join(f"{name}={weight}" for name, weight in weights.items())
+    os.environ['CPU_AFFINITY'] = '1' if affinity else '0'
+    # The candidate under test replaces any plan already in place
+    os.environ.pop('CPU_PLAN_FILE', None)
+    os.environ.pop('OMP_NUM_THREADS', None)
+
+    log_dir = tempfile.mkdtemp(prefix='neuropulse-autotune-')
+    spawned = spawn_stack('services', mix, workers if layout == 'split' else None, log_dir,
+                          args.ready_timeout, stub=args.stub)
+    try:
+        if any(service.ready_status != 'ready' for service in spawned):
+            print(f"  ⚠️  Stack did not come up (logs in {log_dir})")
+            return None
+        urls = {key: service_base_url(key) for key in ('text', 'face', 'audio')}
+        test = LoadTest('services', mix, urls, PayloadFactory(args.seed),
+                        concurrency=args.concurrency, timeout=args.timeout, seed=args.seed)
+        test.warmup(args.warmup)
+        results, elapsed = test.run(duration=args.duration)
+        return report(results, elapsed)
+    finally:
+        for service in spawned:
+            service.stop()
+        # Let the ports close before the next candidate binds them
+        time.sleep(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pick the CPU split between model services under mixed load")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"Weighted request kinds (default {DEFAULT_MIX})")
+    parser.add_argument('--duration', type=float, default=30, help='Seconds of load per candidate')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--affinity', action='store_true', help='Also try every split with core pinning')
+    parser.add_argument('--limit', type=int, help='Try at most this many candidates')
+    parser.add_argument('--stub', action='store_true', help='Use stub models (tries the script, not the models)')
+    parser.add_argument('--ready-timeout', type=float, default=300)
+    parser.add_argument('--output', default='cpu_plan.json', help='Plan file to write (use as CPU_PLAN_FILE)')
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix, 'services')
+    except ValueError as e:
+        parser.error(str(e))
+
+    services = sorted({KINDS[kind][0] for kind, _ in mix})
+    cpus = host_cpus()
+    affinity_options = (False, True) if args.affinity else (False,)
+    tried = list(candidates(services, cpus, affinity_options))[:args.limit]
+    print(f"🧮 {len(tried)} candidate split(s) of {len(cpus)} core(s) for {', '.join(services)}; "
+          f"{args.duration:.0f}s of load each")
+
+    results = []
+    for name, weights, layout, workers, affinity, allocations in tried:
+        print(f"\n▶ {name}: {describe(allocations)}")
+        run = run_candidate(args, mix, services, weights, layout, workers, affinity)
+        value = score(run) if run is not None else None
+        if run is not None:
+            kinds = '  '.join(f"{kind} p95 {summary['p95_ms']:.0f}ms" for kind, summary in run['kinds'].items())
+            print(f"  {run['overall']['throughput_rps']:.1f} req/s  {kinds}")
+        results.append({
+            'name': name,
+            'weights': weights,
+            'layout': layout,
+            'workers': workers,
+            'affinity': affinity,
+            'allocation': {service: a.to_dict() for service, a in allocations.items()},
+            'score_ms': value,
+            'throughput_rps': run['overall']['throughput_rps'] if run else None,
+            'kinds': run['kinds'] if run else None,
+        })
+
+    ranked = sorted((r for r in results if r['score_ms'] is not None),
+                    key=lambda r: (r['score_ms'], -r['throughput_rps']))
+    if not ranked:
+        print("\n❌ No candidate completed; nothing written")
+        sys.exit(1)
+
+    print(f"\n{'candidate':<28}{'worst p95':>12}{'req/s':>10}")
+    for result in ranked:
+        print(f"{result['name']:<28}{result['score_ms']:>10.0f}ms{result['throughput_rps']:>10.1f}")
+
+    best = ranked[0]
+    tuned = {
+        'weights': best['weights'],
+        'workers': best['workers'],
+        'affinity': best['affinity'],
+        'layout': best['layout'],
+        'cores': len(cpus),
+        'mix': dict(mix),
+        'stub_models': args.stub,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'candidates': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(tuned, f, indent=2)
+    print(f"\n🏆 {best['name']} (worst p95 {best['score_ms']:.0f}ms); plan written to {args.output}")
+    command = 'start_all_services.py --workers auto' if best['layout'] == 'split' else 'start_all_services.py'
+    print(f"   Run with: CPU_PLAN_FILE={args.output} python {command}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,504 @@
+"""
+End-to-end Load Test
+Drives the gateway or the model services directly at a configurable concurrency with a
+weighted mix of request kinds, reports throughput and p50/p95/p99 latency overall and
+per kind, stores the run as a JSON baseline and diffs it against a previous one.
+
+Request kinds (--mix weights them, e.g. text:short=3,face:medium=1):
+    text:short / text:medium / text:long      ~40 / 400 / 4000 characters
+    face:small / face:medium / face:large     64 / 224 / 640 px JPEG
+    audio:1s / audio:3s / audio:10s           16 kHz mono WAV
+    fusion                                    /api/fusion with text and face results (gateway only)
+
+Every request carries a distinct input unless --repeat is given, in which case each
+kind sends one fixed input so the runner and LLM caches are exercised instead.
+
+--spawn starts the services and the gateway with INFERENCE_STUB_MODELS=1 and
+LLM_PROVIDER=fake, so the whole stack runs offline in seconds with tiny stand-in
+models (see inference/stub.py). Numbers from a stubbed stack measure the serving path
+(HTTP, batching, serialization, the gateway) rather than the models.
+
+Usage:
+    python benchmarks/loadtest.py --spawn --target gateway --requests 2000 --concurrency 16 --output runs/base.json
+    python benchmarks/loadtest.py --spawn --target gateway --requests 2000 --concurrency 16 --baseline runs/base.json
+    python benchmarks/loadtest.py --target services --mix text:short=1 --duration 30
+
+With --baseline the exit status is 1 if any latency percentile grew, or throughput
+dropped, by more than --threshold (default 10%), so the script can gate CI.
+"""
+
+import argparse
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from latency_stats import summarize
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+from transport import create_session, service_base_url
+
+# kind -> (modality, size): characters, pixels per side or seconds
+KINDS = {
+    'text:short': ('text', 40),
+    'text:medium': ('text', 400),
+    'text:long': ('text', 4000),
+    'face:small': ('face', 64),
+    'face:medium': ('face', 224),
+    'face:large': ('face', 640),
+    'audio:1s': ('audio', 1),
+    'audio:3s': ('audio', 3),
+    'audio:10s': ('audio', 10),
+    'fusion': ('fusion', None),
+}
+
+DEFAULT_MIX = 'text:short=3,text:medium=2,text:long=1,face:medium=2,audio:3s=1'
+
+SAMPLE_RATE = 16000
+
+SENTENCES = [
+    "I finally finished the project and I feel really proud of it.",
+    "Nothing seems to go right today and I am exhausted.",
+    "The meeting was moved again, which is honestly frustrating.",
+    "I'm a bit nervous about the results coming out tomorrow.",
+    "We spent the afternoon at the beach and it was lovely.",
+    "I did not expect that at all, what a surprise!",
+    "The kitchen smelled awful after the fridge broke.",
+]
+
+EMOTIONS = ["joy", "sadness", "anger", "fear", "neutral", "surprise", "disgust"]
+
+# Latency percentiles are regressions when they grow, throughput when it shrinks
+LATENCY_KEYS = ('p50_ms', 'p95_ms', 'p99_ms')
+
+# A tail percentile from a handful of requests is just the slowest one; below these
+# counts a change is shown but does not count as a regression
+MIN_SAMPLES = {'p50_ms': 10, 'p95_ms': 40, 'p99_ms': 200, 'throughput_rps': 10}
+
+
+def parse_mix(mix, target):
+    """'text:short=3,face:medium=1' -> [(kind, weight), ...]"""
+    weights = []
+    for part in mix.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        kind, _, weight = part.partition('=')
+        if kind not in KINDS:
+            raise ValueError(f"Unknown request kind {kind!r}; expected one of {', '.join(KINDS)}")
+        if kind == 'fusion' and target != 'gateway':
+            raise ValueError("fusion requests need --target gateway")
+        weights.append((kind, float(weight or 1)))
+    if not weights or sum(w for _, w in weights) <= 0:
+        raise ValueError("--mix needs at least one kind with a positive weight")
+    return weights
+
+
+class PayloadFactory:
+    """Builds the input for request number `index` of each kind"""
+
+    def __init__(self, seed=0, repeat=False):
+        self.seed = seed
+        self.repeat = repeat
+        self._bases = {}
+        self._fixed = {}
+        self._lock = threading.Lock()
+
+    def _base(self, key, build):
+        with self._lock:
+            if key not in self._bases:
+                self._bases[key] = build(np.random.default_rng([self.seed, len(self._bases)]))
+            return self._bases[key]
+
+    def build(self, kind, index):
+        if self.repeat:
+            with self._lock:
+                fixed = self._fixed.get(kind)
+            if fixed is None:
+                fixed = self._build(kind, 0)
+                with self._lock:
+                    self._fixed[kind] = fixed
+            return fixed
+        return self._build(kind, index)
+
+    def _build(self, kind, index):
+        modality, size = KINDS[kind]
+        if modality == 'text':
+            return self.text(size, index)
+        if modality == 'face':
+            return self.image(size, index)
+        if modality == 'audio':
+            return self.audio(size, index)
+        return self.fusion(index)
+
+    def text(self, length, index):
+        rng = random.Random(self.seed * 1000003 + index)
+        parts = []
+        while sum(len(p) + 1 for p in parts) < length:
+            parts.append(rng.choice(SENTENCES))
+        # The suffix makes every request a cache miss
+        return f"{' '.join(parts)[:length]} #{index}"
+
+    def image(self, side, index, height=None):
+        height = height or side
+        base = self._base(('face', side, height), lambda rng: rng.integers(0, 256, (height, side, 3), dtype=np.uint8))
+        pixels = base.copy()
+        # Stamp the index into the first pixels so decoded images differ
+        pixels.reshape(-1)[:8] = np.frombuffer(index.to_bytes(8, 'little', signed=True), dtype=np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, format='JPEG', quality=90)
+        return buffer.getvalue()
+
+    def audio(self, seconds, index):
+        samples = int(seconds * SAMPLE_RATE)
+        base = self._base(
+            ('audio', seconds),
+            lambda rng: (np.sin(np.arange(samples) * 2 * np.pi * 220 / SAMPLE_RATE) * 8000
+                         + rng.normal(0, 800, samples)).astype(np.int16)
+        )
+        pcm = base.copy()
+        pcm[:4] = np.frombuffer(index.to_bytes(8, 'little', signed=True), dtype=np.int16)
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(SAMPLE_RATE)
+            wav.writeframes(pcm.tobytes())
+        return buffer.getvalue()
+
+    def fusion(self, index):
+        rng = random.Random(self.seed * 1000003 + index)
+
+        def result():
+            scores = [rng.random() for _ in EMOTIONS]
+            total = sum(scores)
+            predictions = sorted(
+                ({'label': label, 'score': round(score / total, 4)} for label, score in zip(EMOTIONS, scores)),
+                key=lambda p: p['score'], reverse=True
+            )
+            return {'success': True, 'predictions': predictions}
+
+        return {'text_result': result(), 'face_result': result()}
+
+
+def request_for(target, kind, payload, urls):
+    """(url, requests kwargs) for one request"""
+    modality = KINDS[kind][0]
+    if target == 'gateway':
+        base = urls['gateway']
+        if modality == 'text':
+            return f"{base}/api/text", {'json': {'text': payload}}
+        if modality == 'face':
+            return f"{base}/api/face", {'files': {'file': ('image.jpg', payload, 'image/jpeg')}}
+        if modality == 'audio':
+            return f"{base}/api/audio", {'files': {'file': ('audio.wav', payload, 'audio/wav')}}
+        return f"{base}/api/fusion", {'json': payload}
+
+    if modality == 'text':
+        return f"{urls['text']}/api/analyze-text", {'json': {'text': payload}}
+    if modality == 'face':
+        return f"{urls['face']}/api/analyze-face", {'files': {'image': ('image.jpg', payload, 'image/jpeg')}}
+    return f"{urls['audio']}/api/upload-and-predict", {'files': {'audio': ('audio.wav', payload, 'audio/wav')}}
+
+
+def succeeded(response):
+    """HTTP 200 and no error reported in the body (the gateway wraps service errors in a 200)"""
+    if response.status_code != 200:
+        return False
+    try:
+        body = response.json()
+    except ValueError:
+        return False
+    if body.get('success') is False:
+        return False
+    result = body.get('result')
+    return not isinstance(result, dict) or result.get('status', 'success') == 'success'
+
+
+class LoadTest:
+    def __init__(self, target, mix, urls, factory, concurrency=8, timeout=60, seed=0):
+        self.target = target
+        self.kinds = [kind for kind, _ in mix]
+        self.weights = [weight for _, weight in mix]
+        self.urls = urls
+        self.factory = factory
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.seed = seed
+        self._local = threading.local()
+        self._counter = itertools.count()
+        self._counter_lock = threading.Lock()
+
+    def _session(self):
+        if not hasattr(self._local, 'session'):
+            self._local.session = create_session()
+        return self._local.session
+
+    def _next_index(self):
+        with self._counter_lock:
+            return next(self._counter)
+
+    def kind_for(self, index):
+        # Seeded per index so a run's request sequence is reproducible
+        return random.Random(self.seed * 7919 + index).choices(self.kinds, self.weights)[0]
+
+    def send(self, index):
+        """One request; returns (kind, latency_ms, ok, error)"""
+        kind = self.kind_for(index)
+        url, kwargs = request_for(self.target, kind, self.factory.build(kind, index), self.urls)
+        t0 = time.perf_counter()
+        try:
+            response = self._session().post(url, timeout=self.timeout, **kwargs)
+            ok = succeeded(response)
+            error = None if ok else f"HTTP {response.status_code}: {response.text[:200]}"
+        except Exception as e:
+            ok, error = False, str(e)
+        return kind, (time.perf_counter() - t0) * 1000, ok, error
+
+    def _worker(self, results, stop):
+        while True:
+            index = self._next_index()
+            if stop(index):
+                return
+            results.append(self.send(index))
+
+    def run(self, requests=None, duration=None):
+        """Run until `requests` have been sent or `duration` seconds have passed"""
+        results = []
+        deadline = time.perf_counter() + duration if duration else None
+
+        def stop(index):
+            if deadline is not None:
+                return time.perf_counter() >= deadline
+            return index >= requests
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for _ in range(self.concurrency):
+                pool.submit(self._worker, results, stop)
+        return results, time.perf_counter() - start
+
+    def warmup(self, requests):
+        """Unrecorded requests, so connection setup and lazy loading do not skew the run"""
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            list(pool.map(self.send, range(-requests, 0)))
+
+
+def report(results, elapsed):
+    """Overall and per-kind summaries of one run"""
+    by_kind = defaultdict(list)
+    for result in results:
+        by_kind[result[0]].append(result)
+
+    def section(rows):
+        latencies = [latency for _, latency, ok, _ in rows if ok]
+        summary = summarize(latencies, elapsed)
+        summary['failed'] = sum(1 for _, _, ok, _ in rows if not ok)
+        summary['error_rate'] = round(summary['failed'] / len(rows), 4) if rows else 0.0
+        return summary
+
+    errors = defaultdict(int)
+    for _, _, ok, error in results:
+        if not ok:
+            errors[error] += 1
+
+    return {
+        'elapsed_s': round(elapsed, 2),
+        'overall': section(results),
+        'kinds': {kind: section(rows) for kind, rows in sorted(by_kind.items())},
+        # The most common failure messages, to tell a broken stack from a slow one
+        'errors': dict(sorted(errors.items(), key=lambda item: -item[1])[:5])
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+            capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def relative_change(before, after):
+    if not before:
+        return None
+    return (after - before) / before
+
+
+def diff_runs(baseline, current, threshold):
+    """Per-section metric changes against a baseline; returns (rows, regressions)"""
+    rows = []
+    regressions = []
+    sections = [('overall', baseline.get('overall'), current.get('overall'))]
+    for kind, summary in current.get('kinds', {}).items():
+        sections.append((kind, baseline.get('kinds', {}).get(kind), summary))
+
+    for name, before, after in sections:
+        if not before or not after:
+            continue
+        for key in LATENCY_KEYS + ('throughput_rps',):
+            change = relative_change(before[key], after[key])
+            if change is None:
+                continue
+            worse = change > threshold if key in LATENCY_KEYS else change < -threshold
+            worse = worse and min(before['requests'], after['requests']) >= MIN_SAMPLES[key]
+            rows.append((name, key, before[key], after[key], change, worse))
+            if worse:
+                regressions.append(f"{name} {key}: {before[key]} -> {after[key]} ({change:+.1%})")
+        if after['error_rate'] > before['error_rate'] + threshold / 10:
+            regressions.append(f"{name} error_rate: {before['error_rate']} -> {after['error_rate']}")
+    return rows, regressions
+
+
+def print_report(run):
+    meta = run['meta']
+    print(f"\n{meta['target']}: {run['overall']['requests']} ok / {run['overall']['failed']} failed "
+          f"in {run['elapsed_s']}s, concurrency {meta['concurrency']}"
+          f"{', stub models' if meta['stub_models'] else ''}{', repeated inputs' if meta['repeat'] else ''}")
+    print(f"{'kind':<14}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'errors':>8}")
+    for name, summary in [('overall', run['overall'])] + list(run['kinds'].items()):
+        print(f"{name:<14}{summary['throughput_rps']:>9}{summary['p50_ms']:>10}{summary['p95_ms']:>10}"
+              f"{summary['p99_ms']:>10}{summary['max_ms']:>10}{summary['failed']:>8}")
+    for error, count in run['errors'].items():
+        print(f"  {count} x {error}")
+
+
+def print_diff(rows, regressions, baseline_path):
+    print(f"\nAgainst {baseline_path}:")
+    print(f"{'kind':<14}{'metric':<16}{'before':>10}{'after':>10}{'change':>9}")
+    for name, key, before, after, change, worse in rows:
+        print(f"{name:<14}{key:<16}{before:>10}{after:>10}{change:>+9.1%}{'  <- regression' if worse else ''}")
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s):")
+        for regression in regressions:
+            print(f"  {regression}")
+    else:
+        print("\n✅ No regressions")
+
+
+def spawn_stack(target, mix, workers, log_dir, ready_timeout, stub=True):
+    """
+    Start model services (and the gateway) the way start_all_services.py does
+
+    `workers` is one count for every model service or a {service: count} dict; None or
+    0 runs a service unforked. With stub=False the real models are loaded.
+    """
+    from start_all_services import SERVICES, ManagedService, wait_for_ready
+
+    if stub:
+        os.environ.setdefault('INFERENCE_STUB_MODELS', '1')
+    os.environ.setdefault('LLM_PROVIDER', 'fake')
+    modalities = {KINDS[kind][0] for kind, _ in mix}
+    keys = {m for m in modalities if m in ('text', 'face', 'audio')}
+    if target == 'gateway':
+        keys.add('gateway')
+    services = [
+        ManagedService(spec, log_dir=log_dir, echo=False,
+                       workers=workers.get(spec['key']) if isinstance(workers, dict) else workers)
+        for spec in SERVICES if spec['key'] in keys
+    ]
+    for service in services:
+        service.start()
+    wait_for_ready(services, ready_timeout)
+    for service in services:
+        ready = f"{service.time_to_ready:.1f}s" if service.time_to_ready is not None else "-"
+        print(f"  {service.name}: {service.ready_status} ({ready})")
+    return services
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the gateway or the model services")
+    parser.add_argument('--target', choices=['gateway', 'services'], default='gateway')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"Weighted request kinds (default {DEFAULT_MIX})")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--duration', type=float, help='Run for this many seconds instead of --requests')
+    parser.add_argument('--warmup', type=int, default=20, help='Unrecorded requests before measuring')
+    parser.add_argument('--repeat', action='store_true', help='Send one fixed input per kind (cache hits)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--gateway-url', default=os.getenv('GATEWAY_URL', 'http://127.0.0.1:8000'))
+    parser.add_argument('--output', help='Write the run to this JSON file (a baseline for later runs)')
+    parser.add_argument('--baseline', help='Previous run to diff against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Relative change that counts as a regression')
+    parser.add_argument('--spawn', action='store_true', help='Start a stubbed stack for the run')
+    parser.add_argument('--workers', type=int, default=1, help='Pre-forked workers per spawned model service')
+    parser.add_argument('--ready-timeout', type=float, default=120)
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix, args.target)
+    except ValueError as e:
+        parser.error(str(e))
+
+    services = []
+    if args.spawn:
+        log_dir = tempfile.mkdtemp(prefix='neuropulse-loadtest-')
+        print(f"🚀 Starting stubbed stack (logs in {log_dir})")
+        services = spawn_stack(args.target, mix, args.workers, log_dir, args.ready_timeout)
+
+    try:
+        urls = {
+            'gateway': args.gateway_url,
+            'text': service_base_url('text'),
+            'face': service_base_url('face'),
+            'audio': service_base_url('audio'),
+        }
+        test = LoadTest(args.target, mix, urls, PayloadFactory(args.seed, args.repeat),
+                        concurrency=args.concurrency, timeout=args.timeout, seed=args.seed)
+        if args.warmup:
+            test.warmup(args.warmup)
+        results, elapsed = test.run(requests=args.requests, duration=args.duration)
+    finally:
+        for service in services:
+            service.stop()
+
+    run = report(results, elapsed)
+    run['meta'] = {
+        'target': args.target,
+        'mix': dict(mix),
+        'concurrency': args.concurrency,
+        'repeat': args.repeat,
+        'seed': args.seed,
+        'stub_models': args.spawn or os.getenv('INFERENCE_STUB_MODELS', '').lower() in ('1', 'true', 'yes'),
+        'workers': args.workers if args.spawn else None,
+        'git': git_revision(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+    print_report(run)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(run, f, indent=2)
+        print(f"\n💾 Saved run to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows, regressions = diff_runs(baseline, run, args.threshold)
+        print_diff(rows, regressions, args.baseline)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
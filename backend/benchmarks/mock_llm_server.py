@@ -0,0 +1,242 @@
+"""
+Mock OpenAI-compatible LLM server
+
+Serves POST /v1/chat/completions (plain and "stream": true) with configurable latency
+distributions and injected failures, so the gateway's fusion and tips paths can be
+benchmarked offline and reproducibly. Point the gateway at it with LLM_BASE_URL.
+
+Latency per completion is drawn from --latency-dist with median --latency seconds:
+    fixed      always --latency
+    uniform    --latency +/- --spread
+    normal     mean --latency, standard deviation --spread
+    lognormal  median --latency, sigma --spread (long tail, closest to real APIs)
+Streaming sends the first token after --ttft-fraction of that time and spreads the
+rest over the tokens.
+
+Usage:
+    python benchmarks/mock_llm_server.py --port 8100 --latency-dist lognormal --latency 1.5 --spread 0.4
+    LLM_BASE_URL=http://127.0.0.1:8100/v1 python gateway/app.py
+
+GET /stats returns request and injected-failure counts; POST /stats/reset clears them.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+from werkzeug.wrappers import Request, Response
+
+SUMMARY_TEXT = (
+    "You seem to be handling a mix of emotions right now, with some tension showing through. "
+    "Your stress level suggests it would help to slow down and look after yourself today. "
+    "Try a short walk outside, a few minutes of slow breathing, and a quick chat with a friend."
+)
+
+TIPS = {
+    "summary": "You are dealing with a fair amount right now, and small steps can help.",
+    "tips": [
+        "Take five slow, deep breaths when you notice tension",
+        "Go for a 10-minute walk in daylight",
+        "Reach out to someone you trust",
+        "Keep a regular sleep schedule this week",
+        "Write down one thing that went well today"
+    ],
+    "resources": [
+        {"title": "Crisis Text Line", "description": "Text HOME to 741741 for free, 24/7 crisis support"}
+    ]
+}
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """Request handler without per-request access logging"""
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class LatencyModel:
+    """Draws completion latencies from the configured distribution"""
+
+    def __init__(self, dist="fixed", latency=1.0, spread=0.0, seed=None):
+        self.dist = dist
+        self.latency = latency
+        self.spread = spread
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self):
+        with self._lock:
+            if self.dist == "uniform":
+                value = self.random.uniform(self.latency - self.spread, self.latency + self.spread)
+            elif self.dist == "normal":
+                value = self.random.gauss(self.latency, self.spread)
+            elif self.dist == "lognormal":
+                value = self.latency * self.random.lognormvariate(0, self.spread)
+            else:
+                value = self.latency
+        return max(0.0, value)
+
+    def roll(self, rate):
+        with self._lock:
+            return self.random.random() < rate
+
+
+class MockLLM:
+    def __init__(self, latency_model, ttft_fraction=0.2, error_rate=0.0, rate_limit_rate=0.0,
+                 hang_rate=0.0, hang_seconds=60.0):
+        self.latency_model = latency_model
+        self.ttft_fraction = ttft_fraction
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stats = {"requests": 0, "streamed": 0, "errors": 0, "rate_limited": 0, "hung": 0, "in_flight": 0, "max_in_flight": 0}
+
+    def _count(self, key, delta=1):
+        with self._lock:
+            self.stats[key] += delta
+            if key == "in_flight":
+                self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+
+    @staticmethod
+    def completion_text(body):
+        prompt = body.get("messages", [{}])[-1].get("content", "")
+        if "JSON" in prompt:
+            tips = dict(TIPS)
+            # Distinct prompts get distinguishable answers
+            tips["summary"] = f"{TIPS['summary']} ({hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:6]})"
+            return json.dumps(tips)
+        return SUMMARY_TEXT
+
+    @staticmethod
+    def error(status, message, headers=None):
+        body = {"error": {"message": message, "type": "mock_error", "code": status}}
+        return Response(json.dumps(body), status=status, mimetype="application/json", headers=headers)
+
+    def __call__(self, environ, start_response):
+        return self.app(environ, start_response)
+
+    @Request.application
+    def app(self, request):
+        if request.path == "/stats":
+            if request.method == "POST":
+                self.reset()
+            return Response(json.dumps(self.stats), mimetype="application/json")
+        if request.path == "/v1/models":
+            return Response(json.dumps({"object": "list", "data": [{"id": "gpt-3.5-turbo", "object": "model"}]}),
+                            mimetype="application/json")
+        if request.path != "/v1/chat/completions" or request.method != "POST":
+            return self.error(404, f"No route for {request.method} {request.path}")
+
+        body = request.get_json(force=True)
+        self._count("requests")
+
+        if self.latency_model.roll(self.rate_limit_rate):
+            self._count("rate_limited")
+            return self.error(429, "Rate limit reached (injected)", headers={"Retry-After": "1"})
+        if self.latency_model.roll(self.error_rate):
+            self._count("errors")
+            return self.error(500, "Internal server error (injected)")
+
+        latency = self.latency_model.sample()
+        if self.latency_model.roll(self.hang_rate):
+            self._count("hung")
+            latency = self.hang_seconds
+
+        text = self.completion_text(body)
+        if body.get("stream"):
+            self._count("streamed")
+            return Response(self.stream(body, text, latency), mimetype="text/event-stream")
+
+        self._count("in_flight")
+        try:
+            time.sleep(latency)
+        finally:
+            self._count("in_flight", -1)
+        return Response(json.dumps(self.completion(body, text)), mimetype="application/json")
+
+    @staticmethod
+    def completion(body, text):
+        prompt_chars = sum(len(message.get("content", "")) for message in body.get("messages", []))
+        return {
+            "id": f"chatcmpl-mock-{int(time.time() * 1000)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-3.5-turbo"),
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}],
+            "usage": {
+                "prompt_tokens": prompt_chars // 4,
+                "completion_tokens": len(text) // 4,
+                "total_tokens": prompt_chars // 4 + len(text) // 4
+            }
+        }
+
+    def stream(self, body, text, latency):
+        """Server-Sent Events in the OpenAI chunk format, one word per chunk"""
+        words = text.split(" ")
+        created = int(time.time())
+        self._count("in_flight")
+        try:
+            time.sleep(latency * self.ttft_fraction)
+            per_token = latency * (1 - self.ttft_fraction) / max(1, len(words))
+            for i, word in enumerate(words):
+                if i:
+                    time.sleep(per_token)
+                chunk = {
+                    "id": f"chatcmpl-mock-{created}",
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": body.get("model", "gpt-3.5-turbo"),
+                    "choices": [{"index": 0, "delta": {"content": word if i == len(words) - 1 else word + " "}, "finish_reason": None}]
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+        finally:
+            self._count("in_flight", -1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock LLM server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "normal", "lognormal"], default="lognormal")
+    parser.add_argument("--latency", type=float, default=1.5, help="Median completion latency in seconds")
+    parser.add_argument("--spread", type=float, default=0.4, help="Uniform half-width, normal stddev or lognormal sigma")
+    parser.add_argument("--ttft-fraction", type=float, default=0.2, help="Share of the latency before the first streamed token")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 429")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Fraction of requests that take --hang-seconds")
+    parser.add_argument("--hang-seconds", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, help="Seed for reproducible latency and failure sequences")
+    args = parser.parse_args()
+
+    latency_model = LatencyModel(args.latency_dist, args.latency, args.spread, args.seed)
+    mock = MockLLM(
+        latency_model,
+        ttft_fraction=args.ttft_fraction,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        hang_rate=args.hang_rate,
+        hang_seconds=args.hang_seconds
+    )
+    server = make_server(args.host, args.port, mock, threaded=True, request_handler=QuietRequestHandler)
+    print(f"Mock LLM server on http://{args.host}:{args.port}/v1 "
+          f"({args.latency_dist}, median {args.latency}s, spread {args.spread})")
+    print(f"Point the gateway at it with LLM_BASE_URL=http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
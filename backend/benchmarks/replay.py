@@ -0,0 +1,331 @@
+"""
+Traffic Replay
+Re-issues requests captured by the gateway's traffic capture (see capture.py) against a
+target, at the captured pace (--speed 1), faster (--speed 10) or as fast as the
+concurrency allows (--speed max). Reports latency percentiles overall and per endpoint,
+how far the replay fell behind its schedule, and how responses differ from the captured
+ones.
+
+Redacted and hashed content is rebuilt synthetically at the captured size: texts of the
+same length, images of the same dimensions, audio of the same duration. Hashed inputs
+that repeated in the capture repeat in the replay, so caches see the same hit pattern.
+Response bodies are compared when the capture kept them (TRAFFIC_CAPTURE_RESPONSES);
+status codes are always compared.
+
+Usage:
+    TRAFFIC_CAPTURE_PATH=captures/traffic.jsonl.gz python gateway/app.py
+    python benchmarks/replay.py captures/traffic.jsonl.gz --speed 10 --concurrency 32 --output runs/replay.json
+    python benchmarks/replay.py captures/traffic.jsonl.gz --speed max --baseline runs/replay.json
+
+The --output file has the same layout as loadtest.py runs, so --baseline diffs two
+replays the same way (exit status 1 on a regression beyond --threshold).
+"""
+
+import argparse
+import base64
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from latency_stats import percentile, summarize
+from loadtest import SENTENCES, PayloadFactory, diff_runs, git_revision, print_diff
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from capture import read_capture
+from transport import create_session
+
+VOCABULARY = sorted({word.strip('.,!?').lower() for sentence in SENTENCES for word in sentence.split()})
+
+# Fields that legitimately differ between two runs of the same request
+DEFAULT_IGNORE = 'timestamp,upgrade_id,llm_summary,summary,tips,resources'
+
+
+def load_records(paths, limit=None):
+    """
+    Captured records with an 'at' schedule time in seconds from the start of the replay
+
+    Records are logged as requests finish, so they are put back in arrival order within
+    each capture session (one gateway process); sessions are replayed back to back.
+    """
+    sessions = {}
+    for path in paths:
+        for record in read_capture(path):
+            sessions.setdefault((path, record.get('session')), []).append(record)
+
+    records = []
+    base = 0.0
+    for session in sessions.values():
+        session.sort(key=lambda record: record.get('offset', 0.0))
+        start = session[0].get('offset', 0.0)
+        for record in session:
+            record['at'] = base + record.get('offset', 0.0) - start
+        base = session[-1]['at']
+        records.extend(session)
+    return records[:limit] if limit else records
+
+
+def synthetic_text(length, seed):
+    """Text of exactly `length` characters built from everyday words"""
+    rng = random.Random(seed)
+    words = []
+    size = -1
+    while size < length:
+        word = rng.choice(VOCABULARY)
+        words.append(word)
+        size += len(word) + 1
+    return ' '.join(words)[:length]
+
+
+def hash_seed(digest):
+    return int(digest[:15], 16)
+
+
+class RequestBuilder:
+    """Turns a captured record back into a request, synthesizing redacted content"""
+
+    def __init__(self, seed=0):
+        self.factory = PayloadFactory(seed)
+        self.seed = seed
+
+    def unscrub(self, value, seeds):
+        """Replace hashed/redacted placeholders; `seeds` yields a fresh seed per redacted field"""
+        if isinstance(value, dict):
+            if '$hash' in value:
+                return synthetic_text(value.get('len', 0), hash_seed(value['$hash']))
+            if '$redacted' in value:
+                return synthetic_text(value['$redacted'], next(seeds))
+            return {k: self.unscrub(v, seeds) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.unscrub(v, seeds) for v in value]
+        return value
+
+    def file_bytes(self, entry, index):
+        if 'data' in entry:
+            return base64.b64decode(entry['data'])
+        # Same input -> same bytes when the capture hashed it, otherwise unique per record
+        seed = hash_seed(entry['$hash']) if '$hash' in entry else index
+        if 'width' in entry:
+            return self.factory.image(entry['width'], seed, entry.get('height'))
+        if 'duration' in entry:
+            return self.factory.audio(entry['duration'], seed)
+        return np.random.default_rng(seed).bytes(entry.get('size', 0))
+
+    def build(self, record, index):
+        """(method, path with query, requests kwargs)"""
+        path = record['path'] + (f"?{record['query']}" if record.get('query') else '')
+        seeds = itertools.count(self.seed * 1000003 + index * 1000)
+        kwargs = {}
+        if 'json' in record:
+            kwargs['json'] = self.unscrub(record['json'], seeds)
+        elif 'files' in record:
+            kwargs['data'] = self.unscrub(record.get('form') or {}, seeds)
+            kwargs['files'] = {
+                entry['field']: (
+                    # Outside full mode only the extension was kept
+                    entry['filename'] if record.get('mode') == 'full' else f"upload{entry['filename']}",
+                    self.file_bytes(entry, index),
+                    entry.get('content_type')
+                )
+                for entry in record['files']
+            }
+        return record['method'], path, kwargs
+
+
+def diff_json(expected, actual, ignore, tolerance, path=''):
+    """Paths where two JSON values differ (floats compared with an absolute tolerance)"""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        differences = []
+        for key in sorted(set(expected) | set(actual)):
+            if key in ignore:
+                continue
+            if key not in expected or key not in actual:
+                differences.append(f"{path}.{key}")
+            else:
+                differences.extend(diff_json(expected[key], actual[key], ignore, tolerance, f"{path}.{key}"))
+        return differences
+    if isinstance(expected, list) and isinstance(actual, list):
+        if len(expected) != len(actual):
+            return [f"{path}[]"]
+        differences = []
+        for i, (a, b) in enumerate(zip(expected, actual)):
+            differences.extend(diff_json(a, b, ignore, tolerance, f"{path}[{i}]"))
+        return differences
+    if isinstance(expected, (int, float)) and isinstance(actual, (int, float)) \
+            and not isinstance(expected, bool) and not isinstance(actual, bool):
+        return [] if abs(expected - actual) <= tolerance else [path or '.']
+    return [] if expected == actual else [path or '.']
+
+
+class Replayer:
+    def __init__(self, target, records, builder, concurrency=16, timeout=60, ignore=(), tolerance=1e-3):
+        self.target = target.rstrip('/')
+        self.records = records
+        self.builder = builder
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.ignore = set(ignore)
+        self.tolerance = tolerance
+        self._local = threading.local()
+
+    def _session(self):
+        if not hasattr(self._local, 'session'):
+            self._local.session = create_session()
+        return self._local.session
+
+    def send(self, index, scheduled):
+        record = self.records[index]
+        method, path, kwargs = self.builder.build(record, index)
+        started = time.perf_counter()
+        result = {'path': record['path'], 'lag_ms': max(0.0, (started - scheduled) * 1000)}
+        try:
+            response = self._session().request(method, f"{self.target}{path}", timeout=self.timeout, **kwargs)
+            result['status'] = response.status_code
+            if 'response' in record and 'application/json' in response.headers.get('Content-Type', ''):
+                result['differences'] = diff_json(record['response'], response.json(), self.ignore, self.tolerance)
+        except Exception as e:
+            result['status'] = None
+            result['error'] = str(e)
+        result['latency_ms'] = (time.perf_counter() - started) * 1000
+        result['expected_status'] = record.get('status')
+        return result
+
+    def run(self, speed=None):
+        """Replay every record; speed None means as fast as the concurrency allows"""
+        start = time.perf_counter()
+        futures = []
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for index, record in enumerate(self.records):
+                scheduled = start if speed is None else start + record['at'] / speed
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                futures.append(pool.submit(self.send, index, scheduled))
+        return [future.result() for future in futures], time.perf_counter() - start
+
+
+def report(results, elapsed):
+    by_path = defaultdict(list)
+    for result in results:
+        by_path[result['path']].append(result)
+
+    def section(rows):
+        latencies = [r['latency_ms'] for r in rows if r['status'] is not None]
+        summary = summarize(latencies, elapsed)
+        summary['failed'] = sum(1 for r in rows if r['status'] is None)
+        summary['error_rate'] = round(summary['failed'] / len(rows), 4) if rows else 0.0
+        summary['status_mismatches'] = sum(
+            1 for r in rows if r['status'] is not None and r['expected_status'] is not None
+            and r['status'] != r['expected_status']
+        )
+        summary['body_mismatches'] = sum(1 for r in rows if r.get('differences'))
+        return summary
+
+    lags = [r['lag_ms'] for r in results]
+    differing_fields = Counter(field for r in results for field in r.get('differences', []))
+    errors = Counter(r['error'] for r in results if 'error' in r)
+    return {
+        'elapsed_s': round(elapsed, 2),
+        'overall': section(results),
+        'kinds': {path: section(rows) for path, rows in sorted(by_path.items())},
+        'schedule_lag_ms': {'p50': round(percentile(lags, 50), 2), 'p95': round(percentile(lags, 95), 2),
+                            'max': round(max(lags), 2) if lags else 0.0},
+        'differing_fields': dict(differing_fields.most_common(10)),
+        'errors': dict(errors.most_common(5)),
+    }
+
+
+def print_report(run):
+    meta = run['meta']
+    print(f"\nReplayed {meta['records']} requests against {meta['target']} at speed {meta['speed']} "
+          f"in {run['elapsed_s']}s (concurrency {meta['concurrency']})")
+    print(f"{'endpoint':<28}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'failed':>8}{'status≠':>9}{'body≠':>7}")
+    for name, s in [('overall', run['overall'])] + list(run['kinds'].items()):
+        print(f"{name:<28}{s['throughput_rps']:>9}{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}"
+              f"{s['failed']:>8}{s['status_mismatches']:>9}{s['body_mismatches']:>7}")
+    lag = run['schedule_lag_ms']
+    print(f"Schedule lag ms: p50 {lag['p50']}  p95 {lag['p95']}  max {lag['max']}"
+          f"{'  (replay could not keep pace; raise --concurrency)' if lag['p95'] > 100 and meta['speed'] != 'max' else ''}")
+    if run['differing_fields']:
+        print("Most frequently differing response fields:")
+        for field, count in run['differing_fields'].items():
+            print(f"  {count:>6} x {field}")
+    for error, count in run['errors'].items():
+        print(f"  {count} x {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured gateway traffic")
+    parser.add_argument('captures', nargs='+', help='Capture logs written by the gateway (TRAFFIC_CAPTURE_PATH)')
+    parser.add_argument('--target', default=os.getenv('GATEWAY_URL', 'http://127.0.0.1:8000'))
+    parser.add_argument('--speed', default='1', help="Multiple of the captured pace (1, 10, ...) or 'max'")
+    parser.add_argument('--concurrency', type=int, default=16, help='Maximum requests in flight')
+    parser.add_argument('--limit', type=int, help='Replay only the first N records')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for synthesized content')
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--ignore', default=DEFAULT_IGNORE, help='Response fields left out of body diffs')
+    parser.add_argument('--tolerance', type=float, default=1e-3, help='Allowed absolute difference between numbers')
+    parser.add_argument('--output', help='Write the run to this JSON file')
+    parser.add_argument('--baseline', help='Previous replay (or loadtest) run to diff against')
+    parser.add_argument('--threshold', type=float, default=0.10)
+    args = parser.parse_args()
+
+    if args.speed == 'max':
+        speed = None
+    else:
+        try:
+            speed = float(args.speed)
+        except ValueError:
+            parser.error("--speed must be a number or 'max'")
+        if speed <= 0:
+            parser.error("--speed must be positive")
+
+    records = load_records(args.captures, args.limit)
+    if not records:
+        parser.error("No records in the capture")
+
+    replayer = Replayer(
+        args.target, records, RequestBuilder(args.seed), concurrency=args.concurrency, timeout=args.timeout,
+        ignore=[field.strip() for field in args.ignore.split(',') if field.strip()], tolerance=args.tolerance
+    )
+    results, elapsed = replayer.run(speed)
+
+    run = report(results, elapsed)
+    run['meta'] = {
+        'target': args.target,
+        'captures': args.captures,
+        'records': len(records),
+        'captured_span_s': round(records[-1]['at'], 2),
+        'modes': sorted({record.get('mode', 'redact') for record in records}),
+        'speed': args.speed,
+        'concurrency': args.concurrency,
+        'seed': args.seed,
+        'git': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+    print_report(run)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(run, f, indent=2)
+        print(f"\n💾 Saved run to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows, regressions = diff_runs(baseline, run, args.threshold)
+        print_diff(rows, regressions, args.baseline)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+"""
+Traffic capture for the gateway
+
+An opt-in ASGI middleware that samples requests into a JSON Lines log so
+benchmarks/replay.py can re-issue real request mixes later. Capture happens off the
+request path: the middleware only copies the body and hands it to a writer thread,
+which does the parsing, redaction and disk writes (records are dropped, not queued
+without bound, if the writer falls behind).
+
+Enabled by setting TRAFFIC_CAPTURE_PATH (a .gz suffix compresses the log):
+
+    TRAFFIC_CAPTURE_PATH      log file to append to
+    TRAFFIC_CAPTURE_RATE      fraction of requests to sample (default 1.0)
+    TRAFFIC_CAPTURE_MODE      what is kept of user content (default redact):
+                                  redact  sizes only: text length, image dimensions,
+                                          audio duration
+                                  hash    sizes plus a salted hash, so replay keeps
+                                          repeated inputs repeated (cache behaviour)
+                                  full    the content itself (test environments only)
+    TRAFFIC_CAPTURE_FIELDS    JSON/form fields holding user content (default text,input)
+    TRAFFIC_CAPTURE_SALT      salt for hash mode (default: random per process)
+    TRAFFIC_CAPTURE_RESPONSES keep JSON response bodies for replay diffs (default 1 in
+                              full mode, 0 otherwise)
+    TRAFFIC_CAPTURE_MAX_MB    stop capturing once the log reaches this size (default 512)
+
+Structured, non-identifying fields (emotion scores, stress levels, labels) are kept
+verbatim in every mode because replay needs them to exercise the same code paths.
+"""
+
+import base64
+import gzip
+import hashlib
+import io
+import json
+import os
+import queue
+import random
+import threading
+import time
+import wave
+from email.parser import BytesParser
+from email.policy import HTTP
+
+CAPTURE_MODES = ('redact', 'hash', 'full')
+
+# Request bodies larger than this are recorded as truncated and not parsed
+MAX_BODY_BYTES = 16 * 1024 * 1024
+# Response bodies are kept for diffs only up to this size
+MAX_RESPONSE_BYTES = 256 * 1024
+
+
+class TrafficRecorder:
+    """Turns captured requests into log records on a background thread"""
+
+    def __init__(self, path, rate=1.0, mode='redact', fields=('text', 'input'), salt=None,
+                 keep_responses=None, max_bytes=512 * 1024 * 1024, path_prefix='/api/'):
+        if mode not in CAPTURE_MODES:
+            raise ValueError(f"Unknown capture mode {mode!r}; expected one of {', '.join(CAPTURE_MODES)}")
+        self.path = path
+        self.rate = rate
+        self.mode = mode
+        self.fields = set(fields)
+        self.salt = (salt or os.urandom(16).hex()).encode('utf-8')
+        self.keep_responses = mode == 'full' if keep_responses is None else keep_responses
+        self.max_bytes = max_bytes
+        self.path_prefix = path_prefix
+        self.stats = {'captured': 0, 'dropped': 0, 'skipped': 0}
+        self._started = time.monotonic()
+        # Offsets are relative to this process's start; replay orders records per session
+        self.session = os.urandom(4).hex()
+        self._written = os.path.getsize(path) if os.path.exists(path) else 0
+        self._queue = queue.Queue(maxsize=1000)
+        self._file = None
+        threading.Thread(target=self._write_loop, name='traffic-capture', daemon=True).start()
+
+    def sample(self, method, path):
+        """Whether to capture this request"""
+        if not path.startswith(self.path_prefix) or self._written >= self.max_bytes:
+            return False
+        return self.rate >= 1 or random.random() < self.rate
+
+    def submit(self, request):
+        try:
+            self._queue.put_nowait(request)
+        except queue.Full:
+            self.stats['dropped'] += 1
+
+    # ------------------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------------------
+    def _open(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        if self.path.endswith('.gz'):
+            return gzip.open(self.path, 'at', encoding='utf-8')
+        return open(self.path, 'a', encoding='utf-8')
+
+    def _write_loop(self):
+        while True:
+            request = self._queue.get()
+            try:
+                line = json.dumps(self.build_record(request), separators=(',', ':')) + '\n'
+                if self._file is None:
+                    self._file = self._open()
+                self._file.write(line)
+                self._file.flush()
+                self._written += len(line)
+                self.stats['captured'] += 1
+            except Exception as e:
+                self.stats['skipped'] += 1
+                print(f"⚠️  Traffic capture skipped a request: {e}")
+
+    # ------------------------------------------------------------------
+    # Records
+    # ------------------------------------------------------------------
+    def build_record(self, request):
+        record = {
+            'session': self.session,
+            'offset': round(request['started'] - self._started, 4),
+            'method': request['method'],
+            'path': request['path'],
+            'query': request['query'],
+            'content_type': request['content_type'],
+            'mode': self.mode,
+            'status': request['status'],
+            'latency_ms': round(request['latency'] * 1000, 2),
+        }
+        body = request['body']
+        content_type = request['content_type'] or ''
+        if request['truncated']:
+            record['truncated'] = True
+        elif body and 'application/json' in content_type:
+            record['json'] = self.scrub(json.loads(body))
+        elif body and content_type.startswith('multipart/form-data'):
+            record['form'], record['files'] = self.parse_multipart(content_type, body)
+
+        response = request['response']
+        if self.keep_responses and response is not None and 'application/json' in (request['response_type'] or ''):
+            try:
+                record['response'] = json.loads(response)
+            except ValueError:
+                pass
+        return record
+
+    def text_value(self, value):
+        if self.mode == 'full':
+            return value
+        if self.mode == 'hash':
+            return {'$hash': self.digest(value.encode('utf-8')), 'len': len(value)}
+        return {'$redacted': len(value)}
+
+    def digest(self, data):
+        return hashlib.blake2b(data, digest_size=12, key=self.salt[:64]).hexdigest()
+
+    def scrub(self, value, key=None):
+        """Apply the capture mode to user-content fields anywhere in a JSON body"""
+        if isinstance(value, dict):
+            return {k: self.scrub(v, k) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.scrub(v, key) for v in value]
+        if isinstance(value, str) and key in self.fields:
+            return self.text_value(value)
+        return value
+
+    def parse_multipart(self, content_type, body):
+        header = f"Content-Type: {content_type}\r\n\r\n".encode('latin-1')
+        message = BytesParser(policy=HTTP).parsebytes(header + body)
+        form, files = {}, []
+        for part in message.iter_parts():
+            name = part.get_param('name', header='content-disposition')
+            data = part.get_payload(decode=True) or b''
+            filename = part.get_filename()
+            if filename is None:
+                value = data.decode('utf-8', errors='replace')
+                form[name] = self.text_value(value) if name in self.fields else value
+                continue
+            entry = {
+                'field': name,
+                'filename': filename if self.mode == 'full' else os.path.splitext(filename)[1],
+                'content_type': part.get_content_type(),
+                'size': len(data),
+            }
+            entry.update(describe_media(data))
+            if self.mode == 'hash':
+                entry['$hash'] = self.digest(data)
+            elif self.mode == 'full':
+                entry['data'] = base64.b64encode(data).decode('ascii')
+            files.append(entry)
+        return form, files
+
+
+def describe_media(data):
+    """Image dimensions or WAV duration, read from the headers only"""
+    if data[:4] == b'RIFF' and data[8:12] == b'WAVE':
+        try:
+            with wave.open(io.BytesIO(data)) as wav:
+                return {'duration': round(wav.getnframes() / wav.getframerate(), 3)}
+        except (wave.Error, EOFError, ZeroDivisionError):
+            return {}
+    try:
+        from PIL import Image
+        with Image.open(io.BytesIO(data)) as image:
+            return {'width': image.width, 'height': image.height}
+    except Exception:
+        return {}
+
+
+def recorder_from_env():
+    """A TrafficRecorder configured from TRAFFIC_CAPTURE_*, or None when capture is off"""
+    path = os.getenv('TRAFFIC_CAPTURE_PATH')
+    if not path:
+        return None
+    mode = os.getenv('TRAFFIC_CAPTURE_MODE', 'redact').lower()
+    keep_responses = os.getenv('TRAFFIC_CAPTURE_RESPONSES')
+    fields = [f.strip() for f in os.getenv('TRAFFIC_CAPTURE_FIELDS', 'text,input').split(',') if f.strip()]
+    return TrafficRecorder(
+        path,
+        rate=float(os.getenv('TRAFFIC_CAPTURE_RATE', '1.0')),
+        mode=mode,
+        fields=fields,
+        salt=os.getenv('TRAFFIC_CAPTURE_SALT') or None,
+        keep_responses=None if keep_responses is None else keep_responses.lower() in ('1', 'true', 'yes'),
+        max_bytes=int(float(os.getenv('TRAFFIC_CAPTURE_MAX_MB', '512')) * 1024 * 1024),
+    )
+
+
+class TrafficCaptureMiddleware:
+    """ASGI middleware feeding sampled requests (and their responses) to a TrafficRecorder"""
+
+    def __init__(self, app, recorder):
+        self.app = app
+        self.recorder = recorder
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self.recorder.sample(scope['method'], scope['path']):
+            await self.app(scope, receive, send)
+            return
+
+        headers = {key.decode('latin-1'): value.decode('latin-1') for key, value in scope.get('headers', [])}
+        request = {
+            'started': time.monotonic(),
+            'method': scope['method'],
+            'path': scope['path'],
+            'query': scope.get('query_string', b'').decode('latin-1'),
+            'content_type': headers.get('content-type'),
+            'truncated': False,
+            'status': None,
+            'response_type': None,
+        }
+        body = bytearray()
+        response = bytearray()
+        keep_response = [self.recorder.keep_responses]
+
+        async def capture_receive():
+            message = await receive()
+            if message['type'] == 'http.request' and not request['truncated']:
+                body.extend(message.get('body', b''))
+                if len(body) > MAX_BODY_BYTES:
+                    request['truncated'] = True
+                    body.clear()
+            return message
+
+        async def capture_send(message):
+            if message['type'] == 'http.response.start':
+                request['status'] = message['status']
+                for key, value in message.get('headers', []):
+                    if key.lower() == b'content-type':
+                        request['response_type'] = value.decode('latin-1')
+            elif message['type'] == 'http.response.body' and keep_response[0]:
+                response.extend(message.get('body', b''))
+                if len(response) > MAX_RESPONSE_BYTES:
+                    keep_response[0] = False
+            await send(message)
+
+        try:
+            await self.app(scope, capture_receive, capture_send)
+        finally:
+            request['latency'] = time.monotonic() - request['started']
+            request['body'] = bytes(body)
+            request['response'] = bytes(response) if keep_response[0] else None
+            self.recorder.submit(request)
+
+
+def read_capture(path):
+    """Yield the records of a capture log (a crash-truncated .gz tail is ignored)"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        except EOFError:
+            return
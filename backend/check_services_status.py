@@ -2,13 +2,16 @@
 Check Services Status - Run this after starting all backend services
 """
 
-import requests
 import json
 
-def check_service_health(port, service_name):
+from transport import create_session, service_base_url
+
+session = create_session()
+
+def check_service_health(key, service_name):
     """Check health of a service"""
     try:
-        response = requests.get(f"http://127.0.0.1:{port}/api/health", timeout=3)
+        response = session.get(f"{service_base_url(key)}/api/health", timeout=3)
         if response.status_code == 200:
             data = response.json()
             return data
@@ -22,9 +25,9 @@ def main():
     print("=" * 50)
     
     services = [
-        {"port": 5000, "name": "Audio Emotion Analysis"},
-        {"port": 5001, "name": "Text Emotion Analysis"},
-        {"port": 5002, "name": "Face Emotion Analysis"}
+        {"key": "audio", "port": 5000, "name": "Audio Emotion Analysis"},
+        {"key": "text", "port": 5001, "name": "Text Emotion Analysis"},
+        {"key": "face", "port": 5002, "name": "Face Emotion Analysis"}
     ]
     
     running_count = 0
@@ -34,7 +37,7 @@ def main():
         name = service["name"]
         
         print(f"Checking {name} (Port {port})...")
-        health = check_service_health(port, name)
+        health = check_service_health(service["key"], name)
         
         if health.get("status") == "healthy":
             print(f"  ✅ Status: Healthy")
@@ -0,0 +1,238 @@
+"""
+CPU thread budget for co-located model services
+
+By default every torch process sizes its intra-op pool to all cores, so the audio,
+text and face services on one host (and every pre-forked worker) fight over the same
+cores and latency collapses under mixed load. This module divides the host's cores
+between the services by weight, then between each service's workers, and applies the
+result with torch.set_num_threads / set_num_interop_threads and, optionally, core
+affinity. Every process derives the same plan from the same settings, so services
+started separately still agree on who gets which cores.
+
+The budget only applies when CPU_BUDGET_SERVICES names the services sharing the host;
+start_all_services.py sets it to the services it starts. Without it a service (or a
+pre-forked one, split evenly between its workers) keeps the whole host, as a service
+running alone or scaled out across hosts should.
+
+    CPU_BUDGET_CORES      cores to divide (default: the cores this process may run on)
+    CPU_BUDGET_RESERVED   cores left to the gateway and the OS (default 1 on hosts with
+                          more than 4 cores, else 0)
+    CPU_BUDGET_SERVICES   services sharing the host (default: unset, no budget)
+    CPU_BUDGET_WEIGHTS    relative share per service (default audio=3,face=2,text=1,
+                          roughly the models' relative cost per request)
+    CPU_AFFINITY          1 pins each service, and each of its workers, to its own cores
+    CPU_PLAN_FILE         plan chosen by benchmarks/cpu_autotune.py; its weights,
+                          workers and affinity replace the settings above
+    <NAME>_WORKERS        pre-forked workers for one service (default: one per 2 cores
+                          of its share)
+    <NAME>_THREADS        intra-op threads per worker for one service, overriding the plan
+
+Usage:
+    python cpu_budget.py            # print the plan for this host
+"""
+
+import json
+import os
+
+SERVICES = ('audio', 'text', 'face')
+DEFAULT_WEIGHTS = {'audio': 3, 'face': 2, 'text': 1}
+
+
+def _truthy(value):
+    return (value or '').lower() in ('1', 'true', 'yes')
+
+
+def host_cpus():
+    """Core ids this process may run on"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def parse_weights(text):
+    """'audio=3,text=1' -> {'audio': 3.0, 'text': 1.0}"""
+    weights = {}
+    for part in (text or '').split(','):
+        if not part.strip():
+            continue
+        name, _, value = part.partition('=')
+        weights[name.strip()] = float(value)
+    return weights
+
+
+def describe_cpus(cpus):
+    """[0, 1, 2, 5] -> '0-2,5'"""
+    ranges, start, previous = [], None, None
+    for cpu in sorted(cpus):
+        if start is None:
+            start = previous = cpu
+        elif cpu == previous + 1:
+            previous = cpu
+        else:
+            ranges.append(f"{start}-{previous}" if previous > start else str(start))
+            start = previous = cpu
+    if start is not None:
+        ranges.append(f"{start}-{previous}" if previous > start else str(start))
+    return ','.join(ranges)
+
+
+class Allocation:
+    """One service's share of the host: its cores, workers and per-worker threads"""
+
+    def __init__(self, service, cpus, workers, threads, interop=1, affinity=False):
+        self.service = service
+        self.cpus = cpus
+        self.workers = workers
+        self.threads = threads
+        self.interop = interop
+        self.affinity = affinity
+
+    def worker_cpus(self, worker_id):
+        """The slice of the service's cores a worker is pinned to (None without affinity)"""
+        if not self.affinity:
+            return None
+        per_worker = max(1, len(self.cpus) // self.workers)
+        start = (worker_id * per_worker) % len(self.cpus)
+        return self.cpus[start:start + per_worker]
+
+    def to_dict(self):
+        return {
+            'cpus': describe_cpus(self.cpus),
+            'workers': self.workers,
+            'threads': self.threads,
+            'interop': self.interop,
+            'affinity': self.affinity,
+        }
+
+
+def split_cores(count, weights):
+    """Divide `count` cores by weight (largest remainder), at least one core each"""
+    total = sum(weights.values())
+    exact = {name: count * weight / total for name, weight in weights.items()}
+    shares = {name: max(1, int(value)) for name, value in exact.items()}
+    # The one-core minimum can overshoot; take the excess back from the largest shares
+    while sum(shares.values()) > count and max(shares.values()) > 1:
+        shares[max(shares, key=shares.get)] -= 1
+    # Hand out what rounding down left over, largest remainders first
+    for name in sorted(exact, key=lambda name: exact[name] - shares[name], reverse=True):
+        if sum(shares.values()) >= count:
+            break
+        shares[name] += 1
+    return shares
+
+
+def plan(services=SERVICES, cpus=None, weights=None, workers=None, reserved=None, affinity=False):
+    """
+    Allocate cores to services; returns {service: Allocation}
+
+    `workers` maps service -> worker count; missing services get one worker per two
+    cores of their share. With fewer cores than services, services share cores.
+    """
+    cpus = list(cpus if cpus is not None else host_cpus())
+    if reserved is None:
+        reserved = 1 if len(cpus) > 4 else 0
+    usable = cpus[:max(len(services), len(cpus) - reserved)] if len(cpus) > len(services) else cpus
+    weights = {name: (weights or DEFAULT_WEIGHTS).get(name, 1.0) for name in services}
+    shares = split_cores(max(len(usable), len(services)), weights)
+
+    allocations = {}
+    offset = 0
+    for name in services:
+        share = [usable[(offset + i) % len(usable)] for i in range(shares[name])]
+        offset += shares[name]
+        count = (workers or {}).get(name) or max(1, len(share) // 2)
+        allocations[name] = Allocation(name, share, count, max(1, len(share) // count), affinity=affinity)
+    return allocations
+
+
+def load_plan_file(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def budget_services():
+    """The services in CPU_BUDGET_SERVICES; empty when no budget is configured"""
+    return tuple(s.strip() for s in os.getenv('CPU_BUDGET_SERVICES', '').split(',') if s.strip())
+
+
+def plan_from_env(workers=None):
+    """
+    The plan described by the CPU_BUDGET_* settings (or CPU_PLAN_FILE), over all
+    three services when CPU_BUDGET_SERVICES is unset
+    """
+    services = budget_services() or SERVICES
+    weights = parse_weights(os.getenv('CPU_BUDGET_WEIGHTS')) or DEFAULT_WEIGHTS
+    affinity = _truthy(os.getenv('CPU_AFFINITY'))
+    planned_workers = {}
+
+    plan_path = os.getenv('CPU_PLAN_FILE')
+    if plan_path and os.path.exists(plan_path):
+        tuned = load_plan_file(plan_path)
+        weights = tuned.get('weights', weights)
+        affinity = tuned.get('affinity', affinity)
+        planned_workers.update(tuned.get('workers', {}))
+
+    for name in services:
+        configured = os.getenv(f"{name.upper()}_WORKERS")
+        if configured:
+            planned_workers[name] = int(configured)
+    planned_workers.update(workers or {})
+
+    cores = os.getenv('CPU_BUDGET_CORES')
+    cpus = host_cpus()[:int(cores)] if cores else None
+    reserved = os.getenv('CPU_BUDGET_RESERVED')
+    allocations = plan(services, cpus=cpus, weights=weights, workers=planned_workers,
+                       reserved=int(reserved) if reserved else None, affinity=affinity)
+
+    for name, allocation in allocations.items():
+        threads = os.getenv(f"{name.upper()}_THREADS")
+        if threads:
+            allocation.threads = int(threads)
+    return allocations
+
+
+def apply_threads(threads, interop=1, cpus=None):
+    """Set this process's torch thread pools (and core affinity when cpus is given)"""
+    import torch
+
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(interop)
+    except RuntimeError:
+        # Fixed once the inter-op pool has started; the intra-op setting is what matters
+        pass
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+
+
+def apply_service_budget(service, worker_id=0, workers=None, threads=None):
+    """
+    Apply a service's share of the plan to this process (a standalone service, or one
+    pre-forked worker); returns the Allocation, or None (nothing applied) for a service
+    outside CPU_BUDGET_SERVICES
+    """
+    if service not in budget_services():
+        return None
+    allocations = plan_from_env(workers={service: workers} if workers else None)
+    allocation = allocations.get(service)
+    if allocation is None:
+        return None
+    if threads:
+        allocation.threads = threads
+    cpus = allocation.worker_cpus(worker_id)
+    apply_threads(allocation.threads, allocation.interop, cpus)
+    pinned = f" on cores {describe_cpus(cpus)}" if cpus else ''
+    print(f"🧮 {service}: {allocation.threads} intra-op / {allocation.interop} inter-op thread(s){pinned}", flush=True)
+    return allocation
+
+
+def print_plan(allocations):
+    print(f"{'service':8s} {'cores':>12s} {'workers':>8s} {'threads':>8s}")
+    for name, allocation in allocations.items():
+        print(f"{name:8s} {describe_cpus(allocation.cpus):>12s} {allocation.workers:>8d} {allocation.threads:>8d}"
+              f"{'  (pinned)' if allocation.affinity else ''}")
+
+
+if __name__ == '__main__':
+    print(f"Host cores: {describe_cpus(host_cpus())}")
+    print_plan(plan_from_env())
@@ -0,0 +1,159 @@
+"""
+Per-request deadlines, propagated from the gateway to the model services
+
+The frontend stops waiting long before a model service would give up on its own, and
+without a deadline a service still computes answers nobody will read, which under
+overload is CPU taken from the requests that can still make it. The gateway gives
+every request a time budget (GATEWAY_REQUEST_BUDGET seconds, default 20, or less when
+the client sends its own) and passes what is left of it to the services as
+
+    X-Request-Budget-Ms: 1840
+
+a relative budget in milliseconds, so the hosts' clocks do not need to agree. Each
+process turns the budget into a local deadline held in a context variable, and work
+is dropped as soon as the deadline has passed:
+
+    dispatch   the gateway, before calling a model service
+    arrival    a model service, before the request is handled: drops requests whose
+               budget had already run out at the gateway. The budget is relative and
+               its clock starts here, so time the request spent in the service's
+               listen backlog is not counted against it
+    inference  ModelRunner, before the first forward pass of a request (and after
+               waiting for the model behind other requests)
+    chunk      ModelRunner, between the chunks of a large batch
+
+Dropped requests get a 504 from the services and are counted in
+neuropulse_deadline_dropped_total{service, point} on /metrics. Requests without the
+header have no deadline, so direct calls to a service behave as before.
+"""
+
+import contextvars
+import os
+import time
+
+from instrumentation import REGISTRY
+
+BUDGET_HEADER = 'X-Request-Budget-Ms'
+
+# Budget the gateway gives a request when the client does not ask for less
+DEFAULT_GATEWAY_BUDGET = 20.0
+
+# Deadline of the current request: {'at': time.monotonic() deadline, 'dropped': point or None}
+_deadline = contextvars.ContextVar('neuropulse_deadline', default=None)
+
+DROPPED_TOTAL = REGISTRY.counter(
+    'neuropulse_deadline_dropped_total', 'Requests dropped because their deadline had passed',
+    ('service', 'point'))
+
+
+class DeadlineExceeded(RuntimeError):
+    """Raised where expired work is dropped"""
+
+    def __init__(self, point):
+        super().__init__(f"Deadline exceeded at {point}")
+        self.point = point
+
+
+def parse_budget(value):
+    """Header value in milliseconds -> seconds, or None when missing or malformed"""
+    try:
+        return max(0.0, float(value) / 1000) if value else None
+    except ValueError:
+        return None
+
+
+def format_budget(seconds):
+    return str(max(0, int(seconds * 1000)))
+
+
+def set_deadline(seconds):
+    """Give the current request `seconds` from now (None: no deadline)"""
+    _deadline.set({'at': time.monotonic() + seconds, 'dropped': None} if seconds is not None else None)
+
+
+def remaining():
+    """Seconds left for the current request (negative once expired), or None without a deadline"""
+    state = _deadline.get()
+    return state['at'] - time.monotonic() if state else None
+
+
+def dropped():
+    """Where the current request was dropped, or None"""
+    state = _deadline.get()
+    return state['dropped'] if state else None
+
+
+def check(service, point):
+    """Drop the current request (raise DeadlineExceeded) if its deadline has passed"""
+    state = _deadline.get()
+    if state is None or time.monotonic() < state['at']:
+        return
+    if state['dropped'] is None:
+        state['dropped'] = point
+        DROPPED_TOTAL.inc(service, point)
+    raise DeadlineExceeded(point)
+
+
+def runner_deadline_hook(service):
+    """ModelRunner checkpoint: drop a request whose deadline passed before (or during) inference"""
+    def hook(point, batch_size):
+        check(service, point)
+    return hook
+
+
+def gateway_budget():
+    return float(os.getenv('GATEWAY_REQUEST_BUDGET', DEFAULT_GATEWAY_BUDGET))
+
+
+# ------------------------------------------------------------------
+# Framework integration
+# ------------------------------------------------------------------
+def enforce_deadlines(app, service, runner=None):
+    """Read the budget header in a Flask service and drop requests that ran out of time"""
+    from flask import request
+
+    from inference import error_response
+
+    if runner is not None:
+        runner.add_checkpoint(runner_deadline_hook(service))
+
+    @app.before_request
+    def _start_deadline():
+        set_deadline(parse_budget(request.headers.get(BUDGET_HEADER)))
+        try:
+            check(service, 'arrival')
+        except DeadlineExceeded as e:
+            return error_response(str(e), 504)
+
+    @app.after_request
+    def _report_dropped(response):
+        # Endpoints turn any prediction error into a 500; a dropped request is a 504
+        point = dropped()
+        if point is not None and response.status_code != 504:
+            return app.make_response(error_response(str(DeadlineExceeded(point)), 504))
+        return response
+
+
+class DeadlineMiddleware:
+    """
+    ASGI middleware giving each gateway request its budget
+
+    The client may ask for a shorter one with the same header (it is pointless to keep
+    working after the client has given up); it never gets a longer one.
+    """
+
+    def __init__(self, app, budget=None):
+        self.app = app
+        self.budget = budget if budget is not None else gateway_budget()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            budget = self.budget
+            for key, value in scope.get('headers', []):
+                if key == BUDGET_HEADER.lower().encode('latin-1'):
+                    requested = parse_budget(value.decode('latin-1'))
+                    if requested is not None:
+                        budget = min(budget, requested)
+                    break
+            set_deadline(budget)
+        await self.app(scope, receive, send)
@@ -2,12 +2,17 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 from transformers import AutoImageProcessor, AutoModelForImageClassification
 from PIL import Image
-import torch
+import hashlib
 import io
 import base64
 from datetime import datetime
 import logging
-import numpy as np
+
+from inference import MODELS, ModelRunner, cache_from_env, error_response, prediction_payload
+from deadlines import enforce_deadlines
+from instrumentation import instrument_flask, stage
+from profiling import register_profiling
+from serving import assign_priorities, respond, run_app
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -16,33 +21,94 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend communication
 
+MODEL_NAME = MODELS['face']
+MAX_BATCH_IMAGES = 20
+
+
+class FaceEmotionRunner(ModelRunner):
+    """Image classifier for facial emotions"""
+
+    name = 'face'
+    stub_labels = ['sad', 'disgust', 'angry', 'neutral', 'fear', 'surprise', 'happy']
+
+    def load_model(self):
+        self.processor = self.pretrained_processor(AutoImageProcessor)
+        model = self.pretrained_model(AutoModelForImageClassification)
+        # Get emotion labels from model config
+        id2label = model.config.id2label
+        self.labels = [id2label.get(i, f'emotion_{i}') for i in range(model.config.num_labels)]
+        return model
+
+    def preprocess(self, images):
+        return self.processor(images=images, return_tensors="pt")
+
+    def cache_key(self, image):
+        # Identical frames (e.g. a paused webcam) hit the cache
+        digest = hashlib.blake2b(image.tobytes(), digest_size=16)
+        digest.update(repr(image.size).encode())
+        return digest.hexdigest()
+
+    def warmup_inputs(self):
+        # A model-sized and a camera-sized frame, so resizing is warmed up too
+        return [
+            Image.new('RGB', (224, 224), color=(128, 128, 128)),
+            Image.new('RGB', (640, 480), color=(96, 96, 96)),
+        ]
+
+
 # Load the face emotion detection model
 print("Loading face emotion recognition model...")
-MODEL_NAME = "dima806/facial_emotions_image_detection"
 
-try:
-    processor = AutoImageProcessor.from_pretrained(MODEL_NAME)
-    model = AutoModelForImageClassification.from_pretrained(MODEL_NAME)
-    model.eval()  # Set to evaluation mode
+runner = FaceEmotionRunner(MODEL_NAME, cache=cache_from_env('face'), max_batch_size=MAX_BATCH_IMAGES)
+instrument_flask(app, 'face', runner)
+enforce_deadlines(app, 'face', runner)
+assign_priorities(app)
+register_profiling(app, runner)
+if runner.load():
+    runner.warmup()
     print("Model loaded successfully!")
     print(f"Model: {MODEL_NAME}")
-    
-    # Get emotion labels from model config
-    EMOTION_LABELS = list(model.config.id2label.values())
-    print(f"Emotions: {EMOTION_LABELS}")
-except Exception as e:
-    print(f"Error loading model: {e}")
-    processor = None
-    model = None
-    EMOTION_LABELS = []
+    print(f"Emotions: {runner.labels}")
+else:
+    print(f"Error loading model: {runner.load_error}")
+
+
+def run_face_analysis(image):
+    """
+    Predict emotion for a PIL image without going through HTTP
+
+    Used by the Flask route below and by the gateway's monolith mode.
+    Returns a (payload, status_code) tuple.
+    """
+    if not runner.available:
+        return {
+            'success': False,
+            'error': 'Model not loaded'
+        }, 500
+
+    # Log image details
+    logger.info(f"Image size: {image.size}, mode: {image.mode}")
+
+    predictions = runner.predict(image)
+    payload = prediction_payload(predictions, image_size=list(image.size))
+
+    logger.info(f"Prediction: {payload['top_emotion']} ({payload['confidence']:.2%})")
+
+    return payload, 200
+
+def load_image_bytes(image_bytes):
+    """Decode raw image bytes into an RGB PIL image"""
+    with stage('decode'):
+        return Image.open(io.BytesIO(image_bytes)).convert('RGB')
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
-        'status': 'healthy' if model is not None else 'model_not_loaded',
+        'status': runner.status,
+        'model_state': runner.load_state(),
         'model': MODEL_NAME,
-        'emotions': EMOTION_LABELS,
+        'emotions': runner.labels,
         'timestamp': datetime.now().isoformat(),
         'type': 'face-emotion-detection'
     })
@@ -54,21 +120,19 @@ def analyze_face():
     Accepts: multipart/form-data with 'image' field
     Or: JSON with 'image' field containing base64 encoded image
     """
-    if model is None or processor is None:
-        return jsonify({
-            'success': False,
-            'error': 'Model not loaded'
-        }), 500
-    
+    if not runner.available:
+        return error_response('Model not loaded', 500)
+
     try:
         image = None
-        
+
         # Try to get image from multipart form data
         if 'image' in request.files:
             image_file = request.files['image']
-            image = Image.open(image_file.stream).convert('RGB')
+            with stage('decode'):
+                image = Image.open(image_file.stream).convert('RGB')
             logger.info(f"Received image file: {image_file.filename}")
-        
+
         # Try to get image from JSON (base64)
         elif request.is_json:
             data = request.get_json()
@@ -77,64 +141,24 @@ def analyze_face():
                 image_data = data['image']
                 if ',' in image_data:
                     image_data = image_data.split(',')[1]
-                
+
                 # Decode base64
                 image_bytes = base64.b64decode(image_data)
-                image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+                image = load_image_bytes(image_bytes)
                 logger.info("Received base64 image")
-        
+
         if image is None:
-            return jsonify({
-                'success': False,
-                'error': 'No image provided. Send as multipart form-data or base64 in JSON.'
-            }), 400
-        
-        # Log image details
-        logger.info(f"Image size: {image.size}, mode: {image.mode}")
-        
-        # Process image
-        inputs = processor(images=image, return_tensors="pt")
-        
-        # Make prediction
-        with torch.no_grad():
-            outputs = model(**inputs)
-            logits = outputs.logits
-        
-        # Get probabilities
-        probabilities = torch.nn.functional.softmax(logits, dim=-1)
-        probabilities = probabilities[0].tolist()
-        
-        # Create results
-        predictions = []
-        for idx, prob in enumerate(probabilities):
-            label = model.config.id2label.get(idx, f'emotion_{idx}')
-            predictions.append({
-                'label': label,
-                'score': float(prob)
-            })
-        
-        # Sort by score
-        predictions.sort(key=lambda x: x['score'], reverse=True)
-        
-        top_emotion = predictions[0]['label']
-        confidence = predictions[0]['score']
-        
-        logger.info(f"Prediction: {top_emotion} ({confidence:.2%})")
-        
-        return jsonify({
-            'success': True,
-            'predictions': predictions,
-            'top_emotion': top_emotion,
-            'confidence': confidence,
-            'image_size': list(image.size)
-        })
-        
+            return error_response('No image provided. Send as multipart form-data or base64 in JSON.', 400)
+
+        payload, status = run_face_analysis(image)
+        if status != 200:
+            return jsonify(payload), status
+
+        return respond(payload, runner.label_index)
+
     except Exception as e:
         logger.error(f"Error: {str(e)}")
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
+        return error_response(str(e), 500)
 
 @app.route('/api/analyze-batch', methods=['POST'])
 def analyze_batch():
@@ -142,87 +166,50 @@ def analyze_batch():
     Analyze multiple face images in batch
     Accepts: multipart/form-data with multiple 'images' fields
     """
-    if model is None or processor is None:
-        return jsonify({
-            'success': False,
-            'error': 'Model not loaded'
-        }), 500
-    
+    if not runner.available:
+        return error_response('Model not loaded', 500)
+
     try:
         files = request.files.getlist('images')
-        
+
         if not files or len(files) == 0:
-            return jsonify({
-                'success': False,
-                'error': 'No images provided'
-            }), 400
-        
-        if len(files) > 20:
-            return jsonify({
-                'success': False,
-                'error': 'Maximum 20 images per batch'
-            }), 400
-        
+            return error_response('No images provided', 400)
+
+        if len(files) > MAX_BATCH_IMAGES:
+            return error_response(f'Maximum {MAX_BATCH_IMAGES} images per batch', 400)
+
         logger.info(f"Analyzing batch of {len(files)} images...")
-        
-        # Analyze all images
-        batch_results = []
+
+        # Decode every image first; undecodable files fail individually
+        batch_results = [None] * len(files)
+        images = []
+        image_indices = []
         for idx, file in enumerate(files):
             try:
-                image = Image.open(file.stream).convert('RGB')
-                
-                # Process image
-                inputs = processor(images=image, return_tensors="pt")
-                
-                # Make prediction
-                with torch.no_grad():
-                    outputs = model(**inputs)
-                    logits = outputs.logits
-                
-                # Get probabilities
-                probabilities = torch.nn.functional.softmax(logits, dim=-1)
-                probabilities = probabilities[0].tolist()
-                
-                # Create results
-                predictions = []
-                for pred_idx, prob in enumerate(probabilities):
-                    label = model.config.id2label.get(pred_idx, f'emotion_{pred_idx}')
-                    predictions.append({
-                        'label': label,
-                        'score': float(prob)
-                    })
-                
-                predictions.sort(key=lambda x: x['score'], reverse=True)
-                
-                batch_results.append({
-                    'success': True,
-                    'predictions': predictions,
-                    'top_emotion': predictions[0]['label'],
-                    'confidence': predictions[0]['score'],
-                    'index': idx,
-                    'filename': file.filename
-                })
-                
+                images.append(Image.open(file.stream).convert('RGB'))
+                image_indices.append(idx)
             except Exception as e:
-                batch_results.append({
+                batch_results[idx] = {
                     'success': False,
                     'error': str(e),
                     'index': idx,
                     'filename': file.filename
-                })
-        
-        return jsonify({
+                }
+
+        # Analyze all decoded images in batched forward passes
+        if images:
+            for idx, predictions in zip(image_indices, runner.predict_batch(images)):
+                batch_results[idx] = prediction_payload(predictions, index=idx, filename=files[idx].filename)
+
+        return respond({
             'success': True,
             'results': batch_results,
             'total': len(files)
-        })
-        
+        }, runner.label_index)
+
     except Exception as e:
         logger.error(f"Batch error: {str(e)}")
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
+        return error_response(str(e), 500)
 
 @app.route('/api/emotions', methods=['GET'])
 def get_emotions():
@@ -231,8 +218,8 @@ def get_emotions():
     """
     return jsonify({
         'success': True,
-        'emotions': EMOTION_LABELS,
-        'count': len(EMOTION_LABELS)
+        'emotions': runner.labels,
+        'count': len(runner.labels)
     })
 
 @app.route('/api/model-info', methods=['GET'])
@@ -244,9 +231,10 @@ def model_info():
         'success': True,
         'model_name': MODEL_NAME,
         'model_type': 'image-classification',
-        'emotions': EMOTION_LABELS,
-        'input_size': processor.size if processor else None,
-        'description': 'Facial emotion detection from images'
+        'emotions': runner.labels,
+        'input_size': runner.processor.size if runner.is_loaded and not runner.stubbed else None,
+        'description': 'Facial emotion detection from images',
+        'runner': runner.stats()
     })
 
 @app.route('/api/test-image', methods=['GET'])
@@ -283,7 +271,7 @@ if __name__ == '__main__':
     print("\nStarting Face Emotion Detection Server...")
     print("=" * 60)
     print(f"Model: {MODEL_NAME}")
-    print(f"Emotions: {', '.join(EMOTION_LABELS) if EMOTION_LABELS else 'Loading...'}")
+    print(f"Emotions: {', '.join(runner.labels) if runner.labels else 'Loading...'}")
     print("=" * 60)
     print("\nAvailable endpoints:")
     print("  - GET  /api/health           - Health check")
@@ -293,7 +281,6 @@ if __name__ == '__main__':
     print("  - POST /api/analyze-face     - Analyze single face")
     print("  - POST /api/analyze-batch    - Analyze multiple faces")
     print("=" * 60)
-    print("\nServer starting on http://127.0.0.1:5002")
     print("Press CTRL+C to quit\n")
-    
-    app.run(debug=True, host='0.0.0.0', port=5002)
\ No newline at end of file
+
+    run_app(app, 'face')
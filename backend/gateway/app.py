@@ -1,12 +1,46 @@
-from fastapi import FastAPI, File, UploadFile, Form, Request
+from fastapi import FastAPI, File, UploadFile, Form, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-import requests
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 import uvicorn
+import asyncio
+import json
+import time
+import uuid
 from typing import Optional, Dict, Any
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), 'services'))
-from services.llm_service import generate_emotion_summary, generate_mental_health_tips
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# .env must be loaded before llm_service reads LLM_PROVIDER, LLM_BASE_URL and its limits;
+# python-dotenv is optional, and a missing API key only disables the LLM calls
+try:
+    from dotenv import load_dotenv
+except ImportError:
+    pass
+else:
+    load_dotenv()
+
+from services.llm_service import (
+    agenerate_emotion_summary, agenerate_mental_health_tips, astream_emotion_summary, local_tips
+)
+from services import llm_service
+from services import local_models
+from capture import TrafficCaptureMiddleware, recorder_from_env
+from deadlines import BUDGET_HEADER, DeadlineMiddleware, check as check_deadline, format_budget, remaining
+import profiling
+from instrumentation import (
+    PROMETHEUS_MIMETYPE, REGISTRY, REQUEST_ID_HEADER, SERVER_TIMING_HEADER, TimingMiddleware,
+    current_request_id, parse_server_timing, record_stage, stage
+)
+from priorities import BULK, INTERACTIVE, PRIORITY_HEADER
+from jobs import FINISHED, SUCCEEDED, accepted, sse_event
+from transport import create_session, service_base_url
+from wire_format import (
+    MSGPACK_MIMETYPE, build_label_index, compact_payload, expand_payload,
+    is_msgpack, msgpack_available, packb, unpackb, wants_msgpack
+)
 
 # ---------------------------------------------------
 # ✅ FastAPI App Initialization
@@ -26,26 +60,136 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[SERVER_TIMING_HEADER, REQUEST_ID_HEADER],
 )
 
+# Stage timings as Server-Timing headers and /metrics histograms; X-Request-ID is
+# taken from the client (or generated) and passed on to the model services
+app.add_middleware(TimingMiddleware, service="gateway")
+
+# Each request gets GATEWAY_REQUEST_BUDGET seconds (or less if the client sends
+# X-Request-Budget-Ms); what is left goes to the model services, which drop expired
+# work instead of computing answers nobody reads (see deadlines.py)
+app.add_middleware(DeadlineMiddleware)
+
+# TRAFFIC_CAPTURE_PATH samples requests into a log for benchmarks/replay.py (see capture.py)
+traffic_recorder = recorder_from_env()
+if traffic_recorder is not None:
+    app.add_middleware(TrafficCaptureMiddleware, recorder=traffic_recorder)
+    print(f"📼 Capturing {traffic_recorder.rate:.0%} of requests to {traffic_recorder.path} ({traffic_recorder.mode} mode)")
+
+# ---------------------------------------------------
+# ✅ Gateway Mode
+# ---------------------------------------------------
+# GATEWAY_MODE=monolith loads the text, face and audio models inside the gateway
+# process for single-node deployments. The default "services" mode calls the
+# model services over HTTP so they can be scaled out separately.
+GATEWAY_MODE = os.getenv("GATEWAY_MODE", "services").lower()
+MONOLITH_MODE = GATEWAY_MODE == "monolith"
+
+@app.on_event("startup")
+def load_local_models():
+    if MONOLITH_MODE:
+        local_models.load_models()
+
 # ---------------------------------------------------
 # ✅ Model Service URLs
 # ---------------------------------------------------
-TEXT_SERVICE_URL = "http://127.0.0.1:5001"
-AUDIO_SERVICE_URL = "http://127.0.0.1:5000"
-FACE_SERVICE_URL = "http://127.0.0.1:5002"
+# Set TEXT_SERVICE_SOCKET / AUDIO_SERVICE_SOCKET / FACE_SERVICE_SOCKET to reach
+# co-located services over Unix domain sockets instead of loopback TCP
+TEXT_SERVICE_URL = service_base_url("text")
+AUDIO_SERVICE_URL = service_base_url("audio")
+FACE_SERVICE_URL = service_base_url("face")
+
+SERVICE_URLS = {
+    "text": TEXT_SERVICE_URL,
+    "audio": AUDIO_SERVICE_URL,
+    "face": FACE_SERVICE_URL,
+}
+
+# Shared session that reaches the services over TCP or Unix sockets (see transport.py)
+http_session = create_session()
+
+# Upper bound on one model service call; the request's remaining budget usually is lower
+SERVICE_TIMEOUT = 20
+
+# ---------------------------------------------------
+# ✅ Wire Format
+# ---------------------------------------------------
+# SERVICE_WIRE_FORMAT=msgpack asks the services for compact msgpack responses
+# (label indices + float32 scores). JSON stays the default.
+SERVICE_WIRE_FORMAT = os.getenv("SERVICE_WIRE_FORMAT", "json").lower()
+
+# Label lists fetched once per service from /api/emotions
+_service_labels = {}
+
+def get_service_labels(service_name):
+    if MONOLITH_MODE:
+        return local_models.get_labels(service_name)
+    labels = _service_labels.get(service_name)
+    if labels is None:
+        response = http_session.get(f"{SERVICE_URLS[service_name]}/api/emotions", timeout=5)
+        response.raise_for_status()
+        labels = response.json().get("emotions", [])
+        if labels:
+            _service_labels[service_name] = labels
+    return labels
+
+def negotiated(request: Request, content):
+    """Return content as msgpack if the client asked for it, otherwise as JSON"""
+    if wants_msgpack(request.headers.get("accept")):
+        return Response(content=packb(content), media_type=MSGPACK_MIMETYPE)
+    return content
 
 # ---------------------------------------------------
 # ✅ Helper: Safe POST Wrapper
 # ---------------------------------------------------
-def safe_post(url, service_name="", **kwargs):
+def safe_post(url, service_name="", compact=False, priority=INTERACTIVE, **kwargs):
+    """
+    POST to a model service and wrap the outcome
+
+    With compact=True the service data is returned in compact wire form
+    (label_idx/scores) so it can be passed through to msgpack clients. `priority`
+    is the request's class in the service's model scheduler: live endpoints are
+    interactive, batch work is bulk.
+    """
     try:
-        response = requests.post(url, **kwargs, timeout=20)
+        headers = dict(kwargs.pop("headers", None) or {})
+        if SERVICE_WIRE_FORMAT == "msgpack" and msgpack_available():
+            headers["Accept"] = MSGPACK_MIMETYPE
+        request_id = current_request_id()
+        if request_id:
+            headers[REQUEST_ID_HEADER] = request_id
+        headers[PRIORITY_HEADER] = priority
+        timeout = SERVICE_TIMEOUT
+        budget = remaining()
+        if budget is not None:
+            check_deadline("gateway", "dispatch")
+            headers[BUDGET_HEADER] = format_budget(budget)
+            timeout = min(timeout, budget)
+
+        with stage(service_name):
+            response = http_session.post(url, headers=headers, **kwargs, timeout=timeout)
+        # The service's own stages, e.g. text-inference; "<service>" minus
+        # "<service>-total" is the network and queueing overhead
+        for name, seconds in parse_server_timing(response.headers.get(SERVER_TIMING_HEADER)):
+            record_stage(f"{service_name}-{name}", seconds)
         response.raise_for_status()
+
+        if is_msgpack(response.headers.get("Content-Type")):
+            data = unpackb(response.content)
+            if not compact:
+                data = expand_payload(data, get_service_labels(service_name))
+        else:
+            data = response.json()
+            if compact:
+                label_index = build_label_index(get_service_labels(service_name))
+                data = compact_payload(data, label_index) or data
+
         return {
             "status": "success",
             "service": service_name,
-            "data": response.json()
+            "data": data
         }
     except Exception as e:
         return {
@@ -54,12 +198,36 @@ def safe_post(url, service_name="", **kwargs):
             "error": str(e)
         }
 
+# ---------------------------------------------------
+# ✅ Helper: Cancel on Client Disconnect
+# ---------------------------------------------------
+async def cancel_on_disconnect(request: Request, coro, poll_interval=0.25):
+    """
+    Await coro, cancelling it if the HTTP client disconnects first
+
+    Keeps abandoned requests from holding an LLM concurrency slot. Returns None when
+    the client went away (nobody is left to read the response).
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                print("🔌 Client disconnected, cancelling LLM call")
+                task.cancel()
+                return None
+    finally:
+        if not task.done():
+            task.cancel()
+
 # ---------------------------------------------------
 # ✅ Health Check Helper
 # ---------------------------------------------------
 def check_health(url):
     try:
-        r = requests.get(url, timeout=0.5)
+        r = http_session.get(url, timeout=0.5)
         return r.status_code == 200
     except Exception:
         return False
@@ -69,15 +237,41 @@ def check_health(url):
 # ---------------------------------------------------
 @app.get("/api/health")
 def health():
-    services = {
-        "text_service": check_health(f"{TEXT_SERVICE_URL}/api/health"),
-        "audio_service": check_health(f"{AUDIO_SERVICE_URL}/api/health"),
-        "face_service": check_health(f"{FACE_SERVICE_URL}/api/health"),
-    }
-    return {
+    if MONOLITH_MODE:
+        services = {
+            f"{name}_service": local_models.is_available(name)
+            for name in ("text", "audio", "face")
+        }
+    else:
+        services = {
+            "text_service": check_health(f"{TEXT_SERVICE_URL}/api/health"),
+            "audio_service": check_health(f"{AUDIO_SERVICE_URL}/api/health"),
+            "face_service": check_health(f"{FACE_SERVICE_URL}/api/health"),
+        }
+    health = {
         "status": "OK",
+        "mode": GATEWAY_MODE,
         "services": services
     }
+    if MONOLITH_MODE:
+        # Which models are resident, idle or unloaded (see inference/manager.py)
+        health["models"] = local_models.load_states()
+        if local_models.manager is not None:
+            health["memory"] = local_models.manager.state()
+    return health
+
+# ---------------------------------------------------
+# ✅ Emotion Labels (for decoding compact msgpack responses)
+# ---------------------------------------------------
+@app.get("/api/emotions")
+def emotions():
+    labels = {}
+    for service_name in SERVICE_URLS:
+        try:
+            labels[service_name] = get_service_labels(service_name)
+        except Exception:
+            labels[service_name] = []
+    return {"success": True, "emotions": labels}
 
 # ---------------------------------------------------
 # ✅ Text Emotion Analysis
@@ -93,166 +287,372 @@ async def analyze_text(request: Request):
         form = await request.form()
         text = form.get("text", "")
     
-    result = safe_post(
-        f"{TEXT_SERVICE_URL}/api/analyze-text",
-        service_name="text",
-        json={"text": text}
-    )
-    return {"type": "text", "input": text, "result": result}
+    compact = wants_msgpack(request.headers.get("accept"))
+    if MONOLITH_MODE:
+        result = await run_in_threadpool(local_models.analyze, "text", compact=compact, text=text)
+    else:
+        result = safe_post(
+            f"{TEXT_SERVICE_URL}/api/analyze-text",
+            service_name="text",
+            compact=compact,
+            json={"text": text}
+        )
+    return negotiated(request, {"type": "text", "input": text, "result": result})
 
 # ---------------------------------------------------
 # ✅ Audio Emotion Analysis
 # ---------------------------------------------------
 @app.post("/api/audio")
-async def analyze_audio(file: UploadFile = File(...)):
+async def analyze_audio(request: Request, file: UploadFile = File(...)):
     audio_bytes = await file.read()
 
-    result = safe_post(
-        f"{AUDIO_SERVICE_URL}/api/upload-and-predict",
-        service_name="audio",
-        files={"audio": (file.filename, audio_bytes, file.content_type)}
-    )
+    compact = wants_msgpack(request.headers.get("accept"))
+    if MONOLITH_MODE:
+        result = await run_in_threadpool(
+            local_models.analyze, "audio", compact=compact,
+            audio_bytes=audio_bytes, filename=file.filename
+        )
+    else:
+        result = safe_post(
+            f"{AUDIO_SERVICE_URL}/api/upload-and-predict",
+            service_name="audio",
+            compact=compact,
+            files={"audio": (file.filename, audio_bytes, file.content_type)}
+        )
 
-    return {"type": "audio", "filename": file.filename, "result": result}
+    return negotiated(request, {"type": "audio", "filename": file.filename, "result": result})
 
 # ---------------------------------------------------
 # ✅ Face Emotion Analysis
 # ---------------------------------------------------
 @app.post("/api/face")
-async def analyze_face(file: UploadFile = File(...)):
+async def analyze_face(request: Request, file: UploadFile = File(...)):
     img_bytes = await file.read()
 
-    result = safe_post(
-        f"{FACE_SERVICE_URL}/api/analyze-face",
-        service_name="face",
-        files={"image": ("image.jpg", img_bytes, file.content_type)}
-    )
+    compact = wants_msgpack(request.headers.get("accept"))
+    if MONOLITH_MODE:
+        result = await run_in_threadpool(local_models.analyze, "face", compact=compact, image_bytes=img_bytes)
+    else:
+        result = safe_post(
+            f"{FACE_SERVICE_URL}/api/analyze-face",
+            service_name="face",
+            compact=compact,
+            files={"image": ("image.jpg", img_bytes, file.content_type)}
+        )
 
-    return {"type": "face", "filename": file.filename, "result": result}
+    return negotiated(request, {"type": "face", "filename": file.filename, "result": result})
+
+# ---------------------------------------------------
+# ✅ Asynchronous Audio Jobs
+# ---------------------------------------------------
+# Long recordings are analyzed as jobs on the audio service's worker pool (see
+# jobs.py): submitting answers 202 with a job ID, then clients poll the job or
+# stream its progress as Server-Sent Events instead of holding a request open.
+JOB_SERVICES = ("audio",)
+
+# Seconds between job status reads while streaming events
+JOB_POLL_INTERVAL = 0.5
+
+def service_json(method, service_name, path, priority=INTERACTIVE, **kwargs):
+    """Call a model service and return its (JSON body, status code) as they are"""
+    headers = {PRIORITY_HEADER: priority}
+    request_id = current_request_id()
+    if request_id:
+        headers[REQUEST_ID_HEADER] = request_id
+    try:
+        response = http_session.request(
+            method, f"{SERVICE_URLS[service_name]}{path}", headers=headers, timeout=SERVICE_TIMEOUT, **kwargs
+        )
+        return response.json(), response.status_code
+    except Exception as e:
+        return {"success": False, "error": f"{service_name} service unavailable: {e}"}, 502
+
+def job_status(service_name, job_id):
+    """(job, status code) from the service that runs the job"""
+    if service_name not in JOB_SERVICES:
+        return {"success": False, "error": f"{service_name} has no asynchronous jobs"}, 404
+    if MONOLITH_MODE:
+        job = local_models.get_job(service_name, job_id)
+        if job is None:
+            return {"success": False, "error": "Unknown or expired job"}, 404
+        return job, 200
+    return service_json("GET", service_name, f"/api/jobs/{job_id}")
+
+@app.post("/api/audio/jobs")
+async def submit_audio_job(file: UploadFile = File(...)):
+    """Queue analysis of an audio file of any length; answers 202 with status and events URLs"""
+    audio_bytes = await file.read()
+    if MONOLITH_MODE:
+        payload, status = await run_in_threadpool(
+            local_models.submit_job, "audio", audio_bytes=audio_bytes, filename=file.filename
+        )
+    else:
+        payload, status = await run_in_threadpool(
+            service_json, "POST", "audio", "/api/jobs/upload-and-predict", priority=BULK,
+            files={"audio": (file.filename, audio_bytes, file.content_type)}
+        )
+    if status == 202:
+        payload = accepted(payload["job_id"], prefix="/api/jobs/audio")
+    return JSONResponse(payload, status_code=status)
+
+@app.get("/api/jobs/{service_name}/{job_id}")
+async def get_job(service_name: str, job_id: str):
+    """Status, progress and (when finished) result of a job"""
+    payload, status = await run_in_threadpool(job_status, service_name, job_id)
+    return JSONResponse(payload, status_code=status)
+
+@app.get("/api/jobs/{service_name}/{job_id}/events")
+async def job_events(service_name: str, job_id: str):
+    """
+    A job's progress as Server-Sent Events
+
+    Events: "progress" (the job, on every change), then "done" (the finished job with
+    its result) or "failed" (the job with its error).
+    """
+    payload, status = await run_in_threadpool(job_status, service_name, job_id)
+    if status != 200:
+        return JSONResponse(payload, status_code=status)
+
+    async def events():
+        job, code, last = payload, status, None
+        while True:
+            if code != 200:
+                yield sse_event("failed", job)
+                return
+            if job["status"] in FINISHED:
+                yield sse_event("done" if job["status"] == SUCCEEDED else "failed", job)
+                return
+            state = (job["status"], job["progress"], job["message"])
+            if state != last:
+                last = state
+                yield sse_event("progress", job)
+            # Starlette stops iterating when the client disconnects
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+            job, code = await run_in_threadpool(job_status, service_name, job_id)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # ---------------------------------------------------
 # ✅ Fusion Analysis
 # ---------------------------------------------------
+def combine_results(text_result, face_result, audio_result):
+    """
+    Weighted fusion of the per-modality results
+
+    Returns the fusion response without its llm_summary, or None when no modality
+    succeeded.
+    """
+    # Calculate weights (adjust as needed)
+    text_weight = 0.4 if text_result and text_result.get("success") else 0
+    face_weight = 0.4 if face_result and face_result.get("success") else 0
+    audio_weight = 0.2 if audio_result and audio_result.get("success") else 0
+
+    total_weight = text_weight + face_weight + audio_weight
+
+    # Handle case where no sources are available
+    if total_weight == 0:
+        return None
+
+    # Normalize weights
+    normalized_text_weight = text_weight / total_weight
+    normalized_face_weight = face_weight / total_weight
+    normalized_audio_weight = audio_weight / total_weight
+
+    # Combine predictions
+    emotion_map = {}
+
+    if text_result and text_result.get("success"):
+        for pred in text_result.get("predictions", []):
+            label = pred.get("label")
+            score = pred.get("score", 0)
+            current_score = emotion_map.get(label, 0)
+            emotion_map[label] = current_score + score * normalized_text_weight
+
+    if face_result and face_result.get("success"):
+        for pred in face_result.get("predictions", []):
+            label = pred.get("label")
+            score = pred.get("score", 0)
+            current_score = emotion_map.get(label, 0)
+            emotion_map[label] = current_score + score * normalized_face_weight
+
+    if audio_result and audio_result.get("success"):
+        for pred in audio_result.get("predictions", []):
+            label = pred.get("label")
+            score = pred.get("score", 0)
+            current_score = emotion_map.get(label, 0)
+            emotion_map[label] = current_score + score * normalized_audio_weight
+
+    # Convert to sorted list
+    predictions_list = sorted(
+        [{"label": label, "score": score} for label, score in emotion_map.items()],
+        key=lambda x: x["score"],
+        reverse=True
+    )
+
+    # Create predictions object for compatibility
+    predictions_obj = {item["label"]: item["score"] for item in predictions_list}
+
+    # Calculate stress score based on negative emotions
+    negative_emotions = ["sadness", "fear", "anger", "disgust"]
+    stress_score = 0
+    for pred in predictions_list:
+        if pred["label"].lower() in negative_emotions:
+            stress_score += pred["score"]
+    stress_score = min(1.0, max(0.0, stress_score))
+
+    print(f"📊 Calculated stress score: {stress_score:.2f}")
+
+    return {
+        "success": True,
+        "combined_emotion": predictions_list[0]["label"] if predictions_list else "neutral",
+        "confidence": predictions_list[0]["score"] if predictions_list else 0.5,
+        "predictions": predictions_obj,
+        "sources": {
+            "text": text_result,
+            "face": face_result,
+            "audio": audio_result
+        },
+        "weights": {
+            "text": normalized_text_weight,
+            "face": normalized_face_weight,
+            "audio": normalized_audio_weight
+        },
+        "stress": stress_score
+    }
+
+NO_SOURCES_RESULT = {
+    "success": True,
+    "combined_emotion": "neutral",
+    "confidence": 0.5,
+    "predictions": {"neutral": 1.0},
+    "sources": {},
+    "weights": {"text": 0, "face": 0, "audio": 0}
+}
+
+def fusion_error(e):
+    return {
+        "success": False,
+        "combined_emotion": "neutral",
+        "confidence": 0,
+        "predictions": {},
+        "sources": {},
+        "weights": {"text": 0, "face": 0, "audio": 0},
+        "error": str(e)
+    }
+
+def summary_input(result):
+    """What the LLM summary is generated from"""
+    sources = result["sources"]
+    return {
+        "text": sources["text"],
+        "audio": sources["audio"],
+        "face": sources["face"],
+        "stress": result["stress"]
+    }
+
 @app.post("/api/fusion")
 async def analyze_fusion(
+    request: Request,
     text_result: Optional[dict] = None,
     face_result: Optional[dict] = None,
     audio_result: Optional[dict] = None
 ):
     try:
-        # Calculate weights (adjust as needed)
-        text_weight = 0.4 if text_result and text_result.get("success") else 0
-        face_weight = 0.4 if face_result and face_result.get("success") else 0
-        audio_weight = 0.2 if audio_result and audio_result.get("success") else 0
-        
-        total_weight = text_weight + face_weight + audio_weight
-        
-        # Handle case where no sources are available
-        if total_weight == 0:
-            return {
-                "success": True,
-                "combined_emotion": "neutral",
-                "confidence": 0.5,
-                "predictions": {"neutral": 1.0},
-                "sources": {},
-                "weights": {"text": 0, "face": 0, "audio": 0}
-            }
-
-        # Normalize weights
-        normalized_text_weight = text_weight / total_weight
-        normalized_face_weight = face_weight / total_weight
-        normalized_audio_weight = audio_weight / total_weight
-
-        # Combine predictions
-        emotion_map = {}
-
-        if text_result and text_result.get("success"):
-            for pred in text_result.get("predictions", []):
-                label = pred.get("label")
-                score = pred.get("score", 0)
-                current_score = emotion_map.get(label, 0)
-                emotion_map[label] = current_score + score * normalized_text_weight
-
-        if face_result and face_result.get("success"):
-            for pred in face_result.get("predictions", []):
-                label = pred.get("label")
-                score = pred.get("score", 0)
-                current_score = emotion_map.get(label, 0)
-                emotion_map[label] = current_score + score * normalized_face_weight
-
-        if audio_result and audio_result.get("success"):
-            for pred in audio_result.get("predictions", []):
-                label = pred.get("label")
-                score = pred.get("score", 0)
-                current_score = emotion_map.get(label, 0)
-                emotion_map[label] = current_score + score * normalized_audio_weight
-
-        # Convert to sorted list
-        predictions_list = sorted(
-            [{"label": label, "score": score} for label, score in emotion_map.items()],
-            key=lambda x: x["score"],
-            reverse=True
-        )
-
-        # Create predictions object for compatibility
-        predictions_obj = {item["label"]: item["score"] for item in predictions_list}
-
-        # Calculate stress score based on negative emotions
-        negative_emotions = ["sadness", "fear", "anger", "disgust"]
-        stress_score = 0
-        for pred in predictions_list:
-            if pred["label"].lower() in negative_emotions:
-                stress_score += pred["score"]
-        stress_score = min(1.0, max(0.0, stress_score))
-
-        print(f"📊 Calculated stress score: {stress_score:.2f}")
+        with stage("fusion"):
+            result = combine_results(text_result, face_result, audio_result)
+        if result is None:
+            return dict(NO_SOURCES_RESULT)
 
         # Generate LLM summary
-        llm_input = {
-            "text": text_result,
-            "audio": audio_result,
-            "face": face_result,
-            "stress": stress_score
-        }
         print("🤖 Generating LLM summary...")
-        llm_summary = generate_emotion_summary(llm_input)
+        with stage("llm"):
+            llm_summary = await cancel_on_disconnect(request, agenerate_emotion_summary(summary_input(result)))
+        if llm_summary is None:
+            return Response(status_code=499)
         print(f"📝 LLM summary generated ({len(llm_summary)} chars)")
 
-        result = {
-            "success": True,
-            "combined_emotion": predictions_list[0]["label"] if predictions_list else "neutral",
-            "confidence": predictions_list[0]["score"] if predictions_list else 0.5,
-            "predictions": predictions_obj,
-            "sources": {
-                "text": text_result,
-                "face": face_result,
-                "audio": audio_result
-            },
-            "weights": {
-                "text": normalized_text_weight,
-                "face": normalized_face_weight,
-                "audio": normalized_audio_weight
-            },
-            "stress": stress_score,
-            "llm_summary": llm_summary
-        }
-        
+        result["llm_summary"] = llm_summary
+
         print(f"✅ Fusion endpoint response prepared with llm_summary: {len(result.get('llm_summary', '')) > 0}")
         return result
     except Exception as e:
-        return {
-            "success": False,
-            "combined_emotion": "neutral",
-            "confidence": 0,
-            "predictions": {},
-            "sources": {},
-            "weights": {"text": 0, "face": 0, "audio": 0},
-            "error": str(e)
-        }
+        return fusion_error(e)
+
+@app.post("/api/fusion/stream")
+async def analyze_fusion_stream(
+    text_result: Optional[dict] = None,
+    face_result: Optional[dict] = None,
+    audio_result: Optional[dict] = None
+):
+    """
+    Fusion with the LLM summary streamed as Server-Sent Events
+
+    Events: "fusion" (the fused result, sent immediately), "token" ({"text": chunk},
+    repeated as the summary is generated), then "done" ({"llm_summary": full text}).
+    """
+    async def events():
+        try:
+            result = combine_results(text_result, face_result, audio_result)
+        except Exception as e:
+            yield sse_event("fusion", fusion_error(e))
+            return
+        if result is None:
+            yield sse_event("fusion", NO_SOURCES_RESULT)
+            return
+
+        yield sse_event("fusion", result)
+
+        # Starlette stops iterating (cancelling the LLM stream) if the client disconnects
+        parts = []
+        async for text in astream_emotion_summary(summary_input(result)):
+            parts.append(text)
+            yield sse_event("token", {"text": text})
+        yield sse_event("done", {"llm_summary": "".join(parts).strip()})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # ---------------------------------------------------
 # ✅ Mental Health Tips Generation
 # ---------------------------------------------------
+# TIPS_MODE=llm waits for the LLM (local tips if it fails), local never calls it, and
+# local_first answers instantly from the local library and upgrades in the background:
+# the response carries an upgrade_id to poll on GET /api/generate-tips/{upgrade_id}.
+TIPS_MODE = os.getenv("TIPS_MODE", "").lower()
+TIPS_UPGRADE_TTL = 600
+
+# upgrade_id -> {"status": "pending" | "ready", "tips": ..., "created": ...}
+tips_upgrades = {}
+
+def prune_tips_upgrades():
+    cutoff = time.time() - TIPS_UPGRADE_TTL
+    for upgrade_id in [key for key, entry in tips_upgrades.items() if entry["created"] < cutoff]:
+        entry = tips_upgrades.pop(upgrade_id)
+        if entry["task"] is not None and not entry["task"].done():
+            entry["task"].cancel()
+
+def tips_mode():
+    """TIPS_MODE, defaulting to llm when the LLM provider is usable (resolved on first request)"""
+    global TIPS_MODE
+    if not TIPS_MODE:
+        TIPS_MODE = "llm" if llm_service.llm_available() else "local"
+    return TIPS_MODE
+
+async def upgrade_tips(upgrade_id, tips_args, local):
+    entry = tips_upgrades.get(upgrade_id)
+    tips = await agenerate_mental_health_tips(**tips_args)
+    if entry is not None:
+        # An LLM failure falls back to the same local tips the client already has
+        entry["tips"] = dict(tips, source="local" if tips == local else "llm")
+        entry["status"] = "ready"
+
 @app.post("/api/generate-tips")
 async def generate_mental_health_tips_endpoint(request: Request):
     try:
@@ -260,46 +660,124 @@ async def generate_mental_health_tips_endpoint(request: Request):
         body = await request.json()
         
         # Extract parameters
-        stress_score = body.get("stressScore", 0)
-        primary_emotion = body.get("primaryEmotion", "neutral")
-        emotion_breakdown = body.get("emotionBreakdown", [])
-        has_text_analysis = body.get("hasTextAnalysis", False)
-        has_face_analysis = body.get("hasFaceAnalysis", False)
-        text_stress = body.get("textStress", 0)
-        face_stress = body.get("faceStress", 0)
-        
-        print(f"🤖 Generating mental health tips for {primary_emotion} with stress {stress_score:.2f}")
-        
-        # Call LLM service
-        tips_response = generate_mental_health_tips(
-            stress_score=stress_score,
-            primary_emotion=primary_emotion,
-            emotion_breakdown=emotion_breakdown,
-            has_text_analysis=has_text_analysis,
-            has_face_analysis=has_face_analysis,
-            text_stress=text_stress,
-            face_stress=face_stress
+        tips_args = {
+            "stress_score": body.get("stressScore", 0),
+            "primary_emotion": body.get("primaryEmotion", "neutral"),
+            "emotion_breakdown": body.get("emotionBreakdown", []),
+            "has_text_analysis": body.get("hasTextAnalysis", False),
+            "has_face_analysis": body.get("hasFaceAnalysis", False),
+            "text_stress": body.get("textStress", 0),
+            "face_stress": body.get("faceStress", 0)
+        }
+        local = local_tips(
+            tips_args["stress_score"], tips_args["primary_emotion"],
+            tips_args["has_text_analysis"], tips_args["has_face_analysis"]
         )
-        
+
+        print(f"🤖 Generating mental health tips for {tips_args['primary_emotion']} with stress {tips_args['stress_score']:.2f} ({tips_mode()})")
+
+        if tips_mode() == "local":
+            return dict(local, source="local")
+
+        if tips_mode() == "local_first":
+            _, cached = llm_service.cached_tips(
+                tips_args["stress_score"], tips_args["primary_emotion"], tips_args["emotion_breakdown"],
+                tips_args["has_text_analysis"], tips_args["has_face_analysis"]
+            )
+            if cached is not None:
+                return dict(cached, source="llm")
+
+            prune_tips_upgrades()
+            upgrade_id = uuid.uuid4().hex
+            tips_upgrades[upgrade_id] = {"status": "pending", "tips": None, "created": time.time(), "task": None}
+            tips_upgrades[upgrade_id]["task"] = asyncio.ensure_future(upgrade_tips(upgrade_id, tips_args, local))
+            return dict(local, source="local", upgrade_id=upgrade_id)
+
+        # Call LLM service
+        tips_response = await cancel_on_disconnect(request, agenerate_mental_health_tips(**tips_args))
+        if tips_response is None:
+            return Response(status_code=499)
+
         print(f"✅ Mental health tips generated")
         return tips_response
     except Exception as e:
         print(f"🔥 Error generating mental health tips: {str(e)}")
         # Return fallback response
-        return {
-            "summary": "We've analyzed your emotional state and provided personalized suggestions to support your wellbeing.",
-            "tips": [
-                "Practice deep breathing exercises for 5 minutes daily",
-                "Engage in physical activity or stretching",
-                "Connect with friends or family members",
-                "Maintain a regular sleep schedule",
-                "Try mindfulness or meditation techniques"
-            ],
-            "resources": [
-                {"title": "Crisis Text Line", "description": "Text HOME to 741741 for free, 24/7 crisis support"},
-                {"title": "National Suicide Prevention Lifeline", "description": "Call 988 for 24/7 support"}
-            ]
-        }
+        return local_tips()
+
+@app.get("/api/generate-tips/{upgrade_id}")
+def get_tips_upgrade(upgrade_id: str):
+    """Poll for the LLM version of tips returned in local_first mode"""
+    entry = tips_upgrades.get(upgrade_id)
+    if entry is None:
+        return JSONResponse({"status": "unknown", "error": "Unknown or expired upgrade_id"}, status_code=404)
+    return {"status": entry["status"], "tips": entry["tips"]}
+
+# ---------------------------------------------------
+# ✅ LLM Metrics
+# ---------------------------------------------------
+@app.get("/api/llm-metrics")
+def llm_metrics():
+    """Upstream vs coalesced LLM calls, timeouts and cache hit rate"""
+    return llm_service.metrics()
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Request and stage latency histograms in the Prometheus text format"""
+    return Response(content=REGISTRY.render(), media_type=PROMETHEUS_MIMETYPE)
+
+# ---------------------------------------------------
+# ✅ Admin Profiling (needs ADMIN_TOKEN, see profiling.py)
+# ---------------------------------------------------
+def admin_rejection(request: Request):
+    if profiling.admin_token() is None:
+        return JSONResponse({"success": False, "error": "Profiling is disabled (ADMIN_TOKEN is not set)"}, status_code=404)
+    if not profiling.authorized(request.headers.get("authorization"), request.headers.get("x-admin-token")):
+        return JSONResponse({"success": False, "error": "Unauthorized"}, status_code=401)
+    return None
+
+PROFILE_BUSY = {"success": False, "error": "A profile is already running"}
+
+@app.post("/admin/profile")
+async def admin_profile(request: Request, seconds: float = 10.0, interval: float = 0.01, idle: bool = False):
+    """Time-boxed sampling profile of the gateway process, as collapsed stacks"""
+    rejection = admin_rejection(request)
+    if rejection is not None:
+        return rejection
+    seconds = profiling.clamp(seconds, 0.1, profiling.PROFILE_MAX_SECONDS, 10.0)
+    interval = profiling.clamp(interval, profiling.PROFILE_MIN_INTERVAL, 1.0, 0.01)
+    try:
+        # Sampled from a worker thread, so the event loop keeps serving (and shows up in the profile)
+        stacks, samples = await run_in_threadpool(profiling.sample_stacks, seconds, interval, idle)
+    except profiling.ProfilerBusy:
+        return JSONResponse(PROFILE_BUSY, status_code=409)
+    return Response(content=profiling.collapsed(stacks), media_type="text/plain", headers={
+        "Content-Disposition": f'attachment; filename="profile-gateway-{os.getpid()}.collapsed"',
+        "X-Profile-Samples": str(samples),
+    })
+
+@app.post("/admin/profile/torch")
+async def admin_profile_torch(request: Request, inferences: int = 5, timeout: float = 60.0):
+    """Torch profiler trace of the next N forward passes (monolith mode only)"""
+    rejection = admin_rejection(request)
+    if rejection is not None:
+        return rejection
+    runners = local_models.runners() if MONOLITH_MODE else []
+    if not runners:
+        return JSONResponse({
+            "success": False,
+            "error": "No models run in the gateway; profile the model services' /admin/profile/torch instead"
+        }, status_code=400)
+    count = int(profiling.clamp(inferences, 1, profiling.TORCH_MAX_INFERENCES, 5))
+    timeout = profiling.clamp(timeout, 1, profiling.PROFILE_MAX_SECONDS, 60.0)
+    try:
+        trace, captured = await run_in_threadpool(profiling.trace_inferences, runners, count, timeout)
+    except profiling.ProfilerBusy:
+        return JSONResponse(PROFILE_BUSY, status_code=409)
+    return Response(content=json.dumps(trace), media_type="application/json", headers={
+        "Content-Disposition": f'attachment; filename="torch-trace-gateway-{os.getpid()}.json"',
+        "X-Profile-Inferences": str(captured),
+    })
 
 # ---------------------------------------------------
 # ✅ Start Gateway Server
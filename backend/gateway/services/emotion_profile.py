@@ -0,0 +1,117 @@
+"""
+Quantized emotional profiles
+
+Two analyses that differ by a few percent should get the same LLM summary or tips,
+so cache keys are built from a coarse profile instead of the raw scores: the primary
+emotion, stress bucketed to LLM_CACHE_STRESS_STEP, and the top emotions with rounded
+scores. The same canonical top-k view is what the LLM prompts are built from.
+"""
+
+import os
+
+# The three models use different label sets; map them onto one vocabulary
+CANONICAL_EMOTIONS = {
+    "angry": "anger",
+    "happy": "joy",
+    "happiness": "joy",
+    "fearful": "fear",
+    "sad": "sadness",
+    "surprised": "surprise",
+    "disgusted": "disgust",
+}
+
+STRESS_STEP = float(os.getenv("LLM_CACHE_STRESS_STEP", "0.1"))
+SCORE_STEP = float(os.getenv("LLM_CACHE_SCORE_STEP", "0.1"))
+TOP_EMOTIONS = 3
+
+
+def bucket(value, step):
+    """Round value to the nearest multiple of step"""
+    try:
+        value = float(value or 0)
+    except (TypeError, ValueError):
+        value = 0.0
+    return round(round(value / step) * step, 2)
+
+
+def canonical_emotion(label):
+    label = str(label or "neutral").strip().lower()
+    return CANONICAL_EMOTIONS.get(label, label)
+
+
+def normalize_breakdown(breakdown):
+    """
+    Turn an emotion breakdown into [(canonical label, score), ...] sorted by score
+
+    Accepts a {label: score} dict or a list of {"label", "score"} items (the
+    frontend and the model services both send the list form). Scores of labels
+    that map to the same canonical emotion are added together.
+    """
+    if isinstance(breakdown, dict):
+        items = breakdown.items()
+    elif isinstance(breakdown, list):
+        items = [
+            (item.get("label") or item.get("emotion"), item.get("score", item.get("value", 0)))
+            for item in breakdown
+            if isinstance(item, dict)
+        ]
+    else:
+        items = []
+
+    scores = {}
+    for label, score in items:
+        if not label:
+            continue
+        try:
+            score = float(score or 0)
+        except (TypeError, ValueError):
+            continue
+        label = canonical_emotion(label)
+        scores[label] = scores.get(label, 0.0) + score
+    return sorted(scores.items(), key=lambda pair: pair[1], reverse=True)
+
+
+def top_emotions(breakdown, k=TOP_EMOTIONS):
+    """The k strongest emotions with scores rounded to SCORE_STEP"""
+    return [(label, bucket(score, SCORE_STEP)) for label, score in normalize_breakdown(breakdown)[:k]]
+
+
+def format_top(top):
+    return ",".join(f"{label}:{score:g}" for label, score in top)
+
+
+def describe_emotions(breakdown, k=TOP_EMOTIONS):
+    """Prompt-ready "sadness 72%, fear 12%" for the k strongest emotions"""
+    top = normalize_breakdown(breakdown)[:k]
+    return ", ".join(f"{label} {score * 100:.0f}%" for label, score in top) or "none"
+
+
+def describe_result(result, k=TOP_EMOTIONS):
+    """Prompt-ready summary of one modality's service result"""
+    if not isinstance(result, dict):
+        return "not analyzed"
+    if not result.get("success"):
+        return "unavailable"
+    return describe_emotions(result.get("predictions", []), k)
+
+
+def tips_profile(stress_score, primary_emotion, emotion_breakdown,
+                 has_text_analysis=False, has_face_analysis=False):
+    """Cache key for generate_mental_health_tips"""
+    return "|".join([
+        "tips",
+        canonical_emotion(primary_emotion),
+        f"s{bucket(stress_score, STRESS_STEP):g}",
+        format_top(top_emotions(emotion_breakdown)),
+        f"t{int(bool(has_text_analysis))}f{int(bool(has_face_analysis))}",
+    ])
+
+
+def summary_profile(predictions):
+    """Cache key for generate_emotion_summary: stress plus each modality's top emotions"""
+    parts = ["summary", f"s{bucket(predictions.get('stress'), STRESS_STEP):g}"]
+    for modality in ("text", "audio", "face"):
+        result = predictions.get(modality)
+        if isinstance(result, dict) and result.get("success"):
+            parts.append(f"{modality}={format_top(top_emotions(result.get('predictions', [])))}")
+    return "|".join(parts)
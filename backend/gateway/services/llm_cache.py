@@ -0,0 +1,166 @@
+"""
+Cache for LLM summaries and tips keyed by quantized emotional profile
+
+Each key holds a small pool of variants so users in the same state do not all see
+identical text: until the pool is full a lookup is a miss (the caller generates
+another variant and stores it), after that lookups pick a random variant. Entries
+expire after a TTL and the least recently used keys are evicted. With a path set,
+entries are also written to SQLite and survive restarts.
+"""
+
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class NullLLMCache:
+    """Cache that never stores anything (LLM_CACHE_SIZE=0)"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {"type": "none"}
+
+
+class LLMCache:
+    """Thread-safe TTL + LRU cache of variant pools, optionally backed by SQLite"""
+
+    def __init__(self, maxsize=512, ttl=86400, variety=3, path=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.variety = max(1, variety)
+        self.path = path
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self._open_db(path)
+
+    # ------------------------------------------------------------------
+    # SQLite store
+    # ------------------------------------------------------------------
+    def _open_db(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT NOT NULL, created REAL NOT NULL, value TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_key ON llm_cache (key)")
+        self._db.execute("DELETE FROM llm_cache WHERE created < ?", (time.time() - self.ttl,))
+        self._db.commit()
+
+    def _load_from_db(self, key):
+        rows = self._db.execute(
+            "SELECT created, value FROM llm_cache WHERE key = ? AND created >= ? ORDER BY created DESC LIMIT ?",
+            (key, time.time() - self.ttl, self.variety),
+        ).fetchall()
+        # The newest variants, kept oldest first like the in-memory pools
+        return [(created, json.loads(value)) for created, value in reversed(rows)]
+
+    # ------------------------------------------------------------------
+    # Cache API
+    # ------------------------------------------------------------------
+    def _variants(self, key):
+        """Live variants for key (expired ones dropped), loading from disk on a memory miss"""
+        variants = self._data.get(key)
+        if variants is None and self._db is not None:
+            variants = self._load_from_db(key)
+            if variants:
+                self._data[key] = variants
+        if not variants:
+            return []
+        cutoff = time.time() - self.ttl
+        live = [(created, value) for created, value in variants if created >= cutoff]
+        if len(live) != len(variants):
+            if live:
+                self._data[key] = live
+            else:
+                self._data.pop(key, None)
+        return live
+
+    def get(self, key):
+        """A random cached variant, or None while the key's variety pool is still filling"""
+        with self._lock:
+            variants = self._variants(key)
+            if len(variants) < self.variety:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return random.choice(variants)[1]
+
+    def set(self, key, value):
+        created = time.time()
+        with self._lock:
+            variants = self._variants(key)
+            if len(variants) >= self.variety:
+                # Pool already full (concurrent misses); keep the newest variants
+                variants = variants[1:]
+            self._data[key] = variants + [(created, value)]
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT INTO llm_cache (key, created, value) VALUES (?, ?, ?)",
+                    (key, created, json.dumps(value)),
+                )
+                # Keep the table to the pool size per key, like memory
+                self._db.execute(
+                    "DELETE FROM llm_cache WHERE key = ? AND rowid NOT IN "
+                    "(SELECT rowid FROM llm_cache WHERE key = ? ORDER BY created DESC LIMIT ?)",
+                    (key, key, self.variety),
+                )
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "type": "sqlite" if self._db is not None else "memory",
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "variety": self.variety,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+def cache_from_env():
+    """
+    Build the LLM cache from LLM_CACHE_SIZE (profiles kept in memory, 0 disables),
+    LLM_CACHE_TTL (seconds), LLM_CACHE_VARIETY (variants per profile) and
+    LLM_CACHE_PATH (optional SQLite file)
+    """
+    size = int(os.getenv("LLM_CACHE_SIZE", "512"))
+    if size <= 0:
+        return NullLLMCache()
+    return LLMCache(
+        maxsize=size,
+        ttl=float(os.getenv("LLM_CACHE_TTL", "86400")),
+        variety=int(os.getenv("LLM_CACHE_VARIETY", "3")),
+        path=os.getenv("LLM_CACHE_PATH") or None,
+    )
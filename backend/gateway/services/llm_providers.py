@@ -0,0 +1,227 @@
+"""
+LLM providers behind llm_service
+
+Nothing here does work at import time: the OpenAI SDK is imported and clients are
+built on the first call (the gateway loads .env at startup, before any of the settings
+below are read). LLM_PROVIDER picks the provider:
+
+    openai  OpenAI chat completions (default). LLM_BASE_URL points it at any
+            OpenAI-compatible server, e.g. benchmarks/mock_llm_server.py
+    fake    Deterministic local stand-in with configurable latency, for tests and
+            benchmarks (LLM_FAKE_LATENCY seconds per completion, default 0.5)
+
+A provider takes the chat completion arguments built by llm_service (model,
+messages, temperature, max_tokens) and returns a Completion, or yields text chunks
+when streaming.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+# completion_tokens is None when the provider does not report usage; coalesced is set
+# by llm_service for callers that shared another caller's upstream completion
+Completion = namedtuple("Completion", ["text", "completion_tokens", "coalesced"], defaults=[False])
+
+
+class LLMProvider:
+    """Interface every provider implements"""
+
+    name = "base"
+
+    @property
+    def available(self):
+        """Whether calls can succeed at all (e.g. an API key is configured)"""
+        return True
+
+    def complete(self, request_kwargs):
+        """Blocking completion"""
+        raise NotImplementedError
+
+    async def acomplete(self, request_kwargs):
+        """Completion without blocking the event loop"""
+        raise NotImplementedError
+
+    async def astream(self, request_kwargs):
+        """Async generator of text chunks as they are generated"""
+        completion = await self.acomplete(request_kwargs)
+        if completion.text:
+            yield completion.text
+
+    def describe(self):
+        return {"provider": self.name, "available": self.available}
+
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI chat completions; the SDK and clients are created on first use"""
+
+    name = "openai"
+
+    def __init__(self, max_retries=1, base_url=None):
+        self.max_retries = max_retries
+        self.base_url = base_url
+        self._client = None
+        self._async_client = None
+        self._lock = threading.Lock()
+        self._key_reported = False
+
+    def _report_key(self):
+        if not self._key_reported:
+            self._key_reported = True
+            if os.getenv("OPENAI_API_KEY"):
+                print("✅ OPENAI_API_KEY loaded successfully")
+            else:
+                print("⚠️  OPENAI_API_KEY not found in environment")
+
+    @property
+    def available(self):
+        self._report_key()
+        return bool(os.getenv("OPENAI_API_KEY") or self.base_url)
+
+    def _client_kwargs(self):
+        kwargs = {"max_retries": self.max_retries}
+        if self.base_url:
+            kwargs["base_url"] = self.base_url
+            # Local OpenAI-compatible servers usually ignore the key, but the SDK requires one
+            kwargs["api_key"] = os.getenv("OPENAI_API_KEY") or "not-needed"
+        return kwargs
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._report_key()
+                from openai import OpenAI
+                # Uses the OPENAI_API_KEY environment variable automatically
+                self._client = OpenAI(**self._client_kwargs())
+            return self._client
+
+    @property
+    def async_client(self):
+        with self._lock:
+            if self._async_client is None:
+                self._report_key()
+                from openai import AsyncOpenAI
+                # One pooled HTTP connection set shared by every request
+                self._async_client = AsyncOpenAI(**self._client_kwargs())
+            return self._async_client
+
+    def describe(self):
+        return dict(super().describe(), base_url=self.base_url or "https://api.openai.com/v1")
+
+    @staticmethod
+    def _to_completion(response):
+        usage = getattr(response, "usage", None)
+        return Completion(response.choices[0].message.content, usage.completion_tokens if usage else None)
+
+    def complete(self, request_kwargs):
+        return self._to_completion(self.client.chat.completions.create(**request_kwargs))
+
+    async def acomplete(self, request_kwargs):
+        return self._to_completion(await self.async_client.chat.completions.create(**request_kwargs))
+
+    async def astream(self, request_kwargs):
+        stream = await self.async_client.chat.completions.create(**request_kwargs, stream=True)
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # Release the upstream connection even when the consumer stops early
+            await stream.response.aclose()
+
+
+class FakeProvider(LLMProvider):
+    """
+    Deterministic stand-in: the same prompt always gets the same answer after
+    `latency` seconds. Prompts asking for JSON get a tips-shaped JSON object.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency=0.5):
+        self.latency = latency
+        self.calls = 0
+
+    def _text(self, request_kwargs):
+        prompt = request_kwargs["messages"][-1]["content"]
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        if "JSON" in prompt:
+            return json.dumps({
+                "summary": f"Here are some suggestions for how you are feeling ({digest}).",
+                "tips": [
+                    "Take a few slow, deep breaths",
+                    "Go for a short walk",
+                    "Talk to someone you trust",
+                    "Keep a regular sleep schedule",
+                ],
+                "resources": []
+            })
+        return (
+            f"You seem to be managing a mix of emotions right now ({digest}). "
+            "Your stress level suggests taking a little time for yourself would help. "
+            "Try a short walk, a few slow breaths, and reaching out to a friend."
+        )
+
+    def complete(self, request_kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        text = self._text(request_kwargs)
+        return Completion(text, len(text.split()))
+
+    async def acomplete(self, request_kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        text = self._text(request_kwargs)
+        return Completion(text, len(text.split()))
+
+    async def astream(self, request_kwargs):
+        self.calls += 1
+        words = self._text(request_kwargs).split(" ")
+        # A fifth of the latency before the first token, the rest spread over the tokens
+        await asyncio.sleep(self.latency * 0.2)
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(self.latency * 0.8 / len(words))
+            yield word if i == len(words) - 1 else word + " "
+
+    def describe(self):
+        return dict(super().describe(), latency=self.latency, calls=self.calls)
+
+
+PROVIDERS = {
+    "openai": OpenAIProvider,
+    "fake": FakeProvider,
+}
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def provider_from_env():
+    name = os.getenv("LLM_PROVIDER", "openai").lower()
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown LLM_PROVIDER {name!r}; expected one of {', '.join(PROVIDERS)}")
+    if name == "fake":
+        return FakeProvider(latency=float(os.getenv("LLM_FAKE_LATENCY", "0.5")))
+    return OpenAIProvider(base_url=os.getenv("LLM_BASE_URL") or None)
+
+
+def get_provider():
+    """The process-wide provider, created on first use"""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = provider_from_env()
+        return _provider
+
+
+def set_provider(provider):
+    """Swap the provider (tests and benchmarks)"""
+    global _provider
+    with _provider_lock:
+        _provider = provider
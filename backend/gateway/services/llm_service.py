@@ -1,25 +1,235 @@
 import os
-from dotenv import load_dotenv
-from openai import OpenAI
+import json
+import asyncio
+import copy
+import hashlib
 import traceback
 
-# Load environment variables
-load_dotenv()
+from emotion_profile import canonical_emotion, describe_emotions, describe_result, summary_profile, tips_profile
+from llm_cache import cache_from_env
+from llm_providers import get_provider
+from tips_engine import local_tips
 
-# Debug: Print environment loading status
-api_key = os.getenv("OPENAI_API_KEY")
-if api_key:
-    print("✅ OPENAI_API_KEY loaded successfully")
-else:
-    print("⚠️  OPENAI_API_KEY not found in environment")
+LLM_MODEL = "gpt-3.5-turbo"  # Using gpt-3.5-turbo as it's more cost-effective and sufficient for this task
 
-# Initialize OpenAI client (uses OPENAI_API_KEY environment variable automatically)
-client = OpenAI()
+# Maximum LLM calls in flight at once across the gateway; extra callers wait their turn
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Per-call deadline in seconds, including time spent waiting for a concurrency slot
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))
 
+# The provider (OpenAI by default, see llm_providers.py) is created on first use, so
+# importing this module does no LLM setup and works without an API key.
+_semaphore = None
+
+# tiktoken encoding, looked up on first count (False: tiktoken not available)
+_encoding = None
+
+# In-flight upstream completions by request_key(), shared by identical concurrent calls
+_inflight = {}
+llm_metrics = {
+    "callers": 0,         # calls to complete()
+    "upstream_calls": 0,  # completions actually sent to the LLM
+    "coalesced": 0,       # callers that joined an identical in-flight completion
+    "timeouts": 0,
+    "cancelled": 0,
+    "errors": 0,
+    "streams": 0,         # streamed summaries (not coalesced)
+    "prompt_tokens": 0,   # prompt tokens of upstream calls (estimated without tiktoken)
+    "completion_tokens": 0,
+    "last_prompt_tokens": {},
+}
+
+# Summaries and tips cached by quantized emotional profile (see llm_cache.py)
+llm_cache = cache_from_env()
+
+DEFAULT_SUMMARY = "We've analyzed your emotions and stress levels. Taking deep breaths, practicing mindfulness, and engaging in activities you enjoy can help improve your emotional wellbeing. If you're feeling overwhelmed, consider talking to a friend or mental health professional."
+
+
+def get_semaphore():
+    """Created lazily so it belongs to the running event loop"""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _semaphore
+
+
+# ---------------------------------------------------
+# Prompts
+# ---------------------------------------------------
+# Only the information the model needs: the canonical top emotions with whole-percent
+# scores and the stress figure. Raw service payloads (every label, float scores,
+# metadata) multiply the prompt size without improving the answer.
+SUMMARY_SYSTEM_PROMPT = "You are a supportive emotional wellbeing assistant. Give practical advice in a friendly, positive tone, without jargon."
+
+TIPS_SYSTEM_PROMPT = "You are a mental health wellbeing expert providing practical, supportive, non-clinical advice focused on self-care."
+
+
+def build_summary_request(predictions):
+    """Chat completion arguments for the fusion emotion summary"""
+    prompt = (
+        "Emotion analysis of the user (top emotions per source):\n"
+        f"- Stress: {predictions.get('stress', 0) * 100:.0f}%\n"
+        f"- Text: {describe_result(predictions.get('text'))}\n"
+        f"- Voice: {describe_result(predictions.get('audio'))}\n"
+        f"- Face: {describe_result(predictions.get('face'))}\n"
+        "In plain text without markdown, give:\n"
+        "1. A 2-3 sentence summary of their overall emotional state\n"
+        "2. What this stress level means for their wellbeing\n"
+        "3. 3 personalized, actionable suggestions"
+    )
+    return {
+        "model": LLM_MODEL,
+        "messages": [
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.7,  # Balanced creativity and consistency
+        "max_tokens": 300  # Limit response length
+    }
+
+
+def build_tips_request(stress_score, primary_emotion, emotion_breakdown,
+                       has_text_analysis=False, has_face_analysis=False,
+                       text_stress=0, face_stress=0):
+    """Chat completion arguments for the mental health tips"""
+    sources = []
+    if has_text_analysis:
+        sources.append(f"text (stress {text_stress * 100:.0f}%)")
+    if has_face_analysis:
+        sources.append(f"face (stress {face_stress * 100:.0f}%)")
+
+    prompt = (
+        f"Primary emotion: {canonical_emotion(primary_emotion)}\n"
+        f"Stress: {stress_score * 100:.0f}%\n"
+        f"Top emotions: {describe_emotions(emotion_breakdown)}\n"
+        f"Analyzed: {', '.join(sources) or 'none'}\n"
+        "Reply with JSON only: "
+        '{"summary": "1-2 encouraging sentences", "tips": ["4-5 practical tips"], '
+        '"resources": [{"title": "...", "description": "..."}]}\n'
+        "Stress <30%: focus on maintaining positive habits. 30-70%: coping strategies. "
+        ">70%: include 2-3 crisis resources or helplines, otherwise resources may be empty."
+    )
+    return {
+        "model": LLM_MODEL,
+        "messages": [
+            {"role": "system", "content": TIPS_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.6,
+        "max_tokens": 500
+    }
+
+
+def get_encoding():
+    """tiktoken encoding for LLM_MODEL, or None when tiktoken is not installed"""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.encoding_for_model(LLM_MODEL)
+        except Exception:
+            # Optional: exact token counts; without it prompt sizes are estimated
+            _encoding = False
+    return _encoding or None
+
+
+def llm_available():
+    """Whether the configured provider can be called (e.g. an API key is set)"""
+    return get_provider().available
+
+
+def count_prompt_tokens(request_kwargs):
+    """
+    Prompt tokens for a chat request: exact with tiktoken installed, otherwise the
+    usual ~4 characters per token estimate
+    """
+    text = "".join(message["content"] for message in request_kwargs["messages"])
+    # Each chat message carries a few tokens of framing
+    overhead = 4 * len(request_kwargs["messages"])
+    encoding = get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text)) + overhead
+    return len(text) // 4 + overhead
+
+
+def record_prompt(kind, request_kwargs):
+    """Log and count the prompt size of one LLM call"""
+    tokens = count_prompt_tokens(request_kwargs)
+    llm_metrics["prompt_tokens"] += tokens
+    llm_metrics["last_prompt_tokens"][kind] = tokens
+    print(f"🧾 {kind} prompt: {tokens} tokens{'' if get_encoding() is not None else ' (estimated)'}")
+
+
+def record_usage(completion):
+    """Count the completion tokens the provider reports, when it reports them"""
+    llm_metrics["completion_tokens"] += completion.completion_tokens or 0
+
+
+def parse_summary(completion):
+    """Summary text from a completion, or None if it came back empty"""
+    content = completion.text
+    return content.strip() if content and content.strip() else None
+
+
+def parse_tips(completion):
+    """Parse the JSON tips payload out of a completion, or None if it is unusable"""
+    content = completion.text
+    if not content:
+        return None
+    try:
+        result = json.loads(content.strip())
+    except json.JSONDecodeError:
+        print("⚠️  Failed to parse LLM response as JSON, using fallback")
+        return None
+    if not isinstance(result, dict):
+        print("⚠️  LLM response is not a JSON object, using fallback")
+        return None
+    return result
+
+
+def cached_summary(predictions):
+    """(cache_key, cached summary or None)"""
+    key = summary_profile(predictions)
+    summary = llm_cache.get(key)
+    if summary is not None:
+        print(f"⚡ LLM summary cache hit ({key})")
+    return key, summary
+
+
+def cached_tips(stress_score, primary_emotion, emotion_breakdown, has_text_analysis, has_face_analysis):
+    """(cache_key, copy of cached tips or None)"""
+    key = tips_profile(stress_score, primary_emotion, emotion_breakdown, has_text_analysis, has_face_analysis)
+    tips = llm_cache.get(key)
+    if tips is not None:
+        print(f"⚡ Mental health tips cache hit ({key})")
+        tips = copy.deepcopy(tips)
+    return key, tips
+
+
+def store(key, value, completion=None):
+    """
+    Cache a successful LLM result; fallbacks are never cached, and callers that
+    shared a coalesced completion leave storing it to the caller that started it
+    """
+    if value is not None and not (completion is not None and completion.coalesced):
+        llm_cache.set(key, copy.deepcopy(value))
+
+
+def log_summary_input(predictions):
+    # Debug: Print input data
+    print(f"🔍 LLM Service Input - Stress: {predictions.get('stress', 0) * 100:.0f}%")
+    print(f"   Text Analysis: {predictions.get('text') is not None}")
+    print(f"   Face Analysis: {predictions.get('face') is not None}")
+    print(f"   Audio Analysis: {predictions.get('audio') is not None}")
+
+
+# ---------------------------------------------------
+# Synchronous API (scripts and tests; blocks the calling thread)
+# ---------------------------------------------------
 def generate_emotion_summary(predictions):
     """
     Generate an emotional summary using OpenAI based on emotion predictions
-    
+
     Args:
         predictions (dict): Dictionary containing emotion analysis results
         Format:
@@ -29,58 +239,25 @@ def generate_emotion_summary(predictions):
             "face": {...},
             "stress": 0.68
         }
-    
+
     Returns:
         str: AI-generated emotional summary
     """
-    
-    # Debug: Print input data
-    print(f"🔍 LLM Service Input - Stress: {predictions.get('stress', 0) * 100:.0f}%")
-    print(f"   Text Analysis: {predictions.get('text') is not None}")
-    print(f"   Face Analysis: {predictions.get('face') is not None}")
-    print(f"   Audio Analysis: {predictions.get('audio') is not None}")
-    
-    # Create a more detailed prompt with specific instructions
-    prompt = f"""
-    You are an emotion-analysis specialist and mental health wellbeing assistant.
-    
-    Here are the user's emotion analysis results:
-    - Overall Stress Level: {predictions.get('stress', 0) * 100:.0f}%
-    - Text Analysis: {predictions.get('text', {})}
-    - Audio Analysis: {predictions.get('audio', {})}
-    - Face Analysis: {predictions.get('face', {})}
-    
-    Please provide:
-    1. A short emotional summary (2-3 sentences) that explains the user's overall emotional state
-    2. Stress level interpretation (what this stress level means for their wellbeing)
-    3. 3 personalized, actionable suggestions to improve their emotional state
-    4. Keep the tone supportive, friendly, and positive
-    5. Do not use technical terms or jargon
-    6. Focus on practical advice
-    
-    Format your response as plain text without markdown or special formatting.
-    """
+    log_summary_input(predictions)
+
+    key, cached = cached_summary(predictions)
+    if cached is not None:
+        return cached
 
     try:
-        print("🚀 Calling OpenAI API...")
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",  # Using gpt-3.5-turbo as it's more cost-effective and sufficient for this task
-            messages=[
-                {"role": "system", "content": "You are a helpful emotional wellbeing assistant that provides supportive and practical advice."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,  # Balanced creativity and consistency
-            max_tokens=300  # Limit response length
-        )
-        
-        # Debug: Print response structure
-        print("✅ OpenAI API call successful")
-        print(f"   Response type: {type(response)}")
-        print(f"   Choices count: {len(response.choices) if hasattr(response, 'choices') else 'N/A'}")
-        
-        content = response.choices[0].message.content
-        result = content.strip() if content else "We've analyzed your emotions and stress levels. Taking deep breaths, practicing mindfulness, and engaging in activities you enjoy can help improve your emotional wellbeing. If you're feeling overwhelmed, consider talking to a friend or mental health professional."
-        
+        print("🚀 Calling LLM API...")
+        request_kwargs = build_summary_request(predictions)
+        record_prompt("summary", request_kwargs)
+        response = get_provider().complete(request_kwargs)
+        record_usage(response)
+        result = parse_summary(response)
+        store(key, result)
+        result = result or DEFAULT_SUMMARY
         print(f"✅ LLM Summary generated ({len(result)} chars)")
         return result
     except Exception as e:
@@ -88,14 +265,14 @@ def generate_emotion_summary(predictions):
         print("📋 Full traceback:")
         traceback.print_exc()
         # Return a default message if LLM fails
-        return "We've analyzed your emotions and stress levels. Taking deep breaths, practicing mindfulness, and engaging in activities you enjoy can help improve your emotional wellbeing. If you're feeling overwhelmed, consider talking to a friend or mental health professional."
+        return DEFAULT_SUMMARY
 
-def generate_mental_health_tips(stress_score, primary_emotion, emotion_breakdown, 
-                              has_text_analysis=False, has_face_analysis=False, 
+def generate_mental_health_tips(stress_score, primary_emotion, emotion_breakdown,
+                              has_text_analysis=False, has_face_analysis=False,
                               text_stress=0, face_stress=0):
     """
     Generate personalized mental health tips based on emotion analysis
-    
+
     Args:
         stress_score (float): Overall stress score (0-1)
         primary_emotion (str): Primary detected emotion
@@ -104,97 +281,28 @@ def generate_mental_health_tips(stress_score, primary_emotion, emotion_breakdown
         has_face_analysis (bool): Whether face analysis was performed
         text_stress (float): Stress from text analysis (0-1)
         face_stress (float): Stress from face analysis (0-1)
-    
+
     Returns:
         dict: Structured mental health tips with summary, tips list, and resources
     """
-    
     print(f"🔍 LLM Service - Generating mental health tips for {primary_emotion} with stress {stress_score:.2f}")
-    
-    prompt = f"""
-    You are a mental health wellbeing expert. Based on the following emotional analysis:
-    
-    OVERALL RESULTS:
-    - Primary Emotion: {primary_emotion}
-    - Overall Stress Level: {stress_score * 100:.0f}%
-    
-    DETAILED BREAKDOWN:
-    - Emotion Distribution: {emotion_breakdown}
-    - Text Analysis Performed: {"Yes" if has_text_analysis else "No"} (Stress: {text_stress * 100:.0f}%)
-    - Face Analysis Performed: {"Yes" if has_face_analysis else "No"} (Stress: {face_stress * 100:.0f}%)
-    
-    Please provide:
-    1. A brief, encouraging summary (1-2 sentences) about their emotional state
-    2. 4-5 personalized, practical tips for managing their emotions and stress
-    3. 2-3 professional resources or helplines if stress is high (>70%)
-    
-    Format your response as JSON with this exact structure:
-    {{
-        "summary": "string",
-        "tips": ["string", "string", ...],
-        "resources": [
-            {{"title": "string", "description": "string"}},
-            ...
-        ]
-    }}
-    
-    Keep the tone supportive, non-clinical, and focused on self-care.
-    If stress is low (<30%), focus on maintaining positive habits.
-    If stress is moderate (30-70%), provide coping strategies.
-    If stress is high (>70%), include crisis resources.
-    """
+
+    key, cached = cached_tips(stress_score, primary_emotion, emotion_breakdown, has_text_analysis, has_face_analysis)
+    if cached is not None:
+        return cached
 
     try:
-        print("🚀 Calling OpenAI API for mental health tips...")
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a mental health wellbeing expert providing practical, supportive advice."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.6,
-            max_tokens=500
+        print("🚀 Calling LLM API for mental health tips...")
+        request_kwargs = build_tips_request(
+            stress_score, primary_emotion, emotion_breakdown,
+            has_text_analysis, has_face_analysis, text_stress, face_stress
         )
-        
-        print("✅ OpenAI API call successful for mental health tips")
-        content = response.choices[0].message.content
-        result = content.strip() if content else {
-            "summary": "We've analyzed your emotional state and provided personalized suggestions to support your wellbeing.",
-            "tips": [
-                "Practice deep breathing exercises for 5 minutes daily",
-                "Engage in physical activity or stretching",
-                "Connect with friends or family members",
-                "Maintain a regular sleep schedule",
-                "Try mindfulness or meditation techniques"
-            ],
-            "resources": [
-                {"title": "Crisis Text Line", "description": "Text HOME to 741741 for free, 24/7 crisis support"},
-                {"title": "National Suicide Prevention Lifeline", "description": "Call 988 for 24/7 support"}
-            ]
-        }
-        
-        # If we got a string response, try to parse it as JSON
-        if isinstance(result, str):
-            import json
-            try:
-                result = json.loads(result)
-            except json.JSONDecodeError:
-                print("⚠️  Failed to parse LLM response as JSON, using fallback")
-                result = {
-                    "summary": "We've analyzed your emotional state and provided personalized suggestions to support your wellbeing.",
-                    "tips": [
-                        "Practice deep breathing exercises for 5 minutes daily",
-                        "Engage in physical activity or stretching",
-                        "Connect with friends or family members",
-                        "Maintain a regular sleep schedule",
-                        "Try mindfulness or meditation techniques"
-                    ],
-                    "resources": [
-                        {"title": "Crisis Text Line", "description": "Text HOME to 741741 for free, 24/7 crisis support"},
-                        {"title": "National Suicide Prevention Lifeline", "description": "Call 988 for 24/7 support"}
-                    ]
-                }
-        
+        record_prompt("tips", request_kwargs)
+        response = get_provider().complete(request_kwargs)
+        record_usage(response)
+        result = parse_tips(response)
+        store(key, result)
+        result = result or local_tips(stress_score, primary_emotion, has_text_analysis, has_face_analysis)
         print(f"✅ Mental health tips generated ({len(result.get('tips', []))} tips)")
         return result
     except Exception as e:
@@ -202,17 +310,240 @@ def generate_mental_health_tips(stress_score, primary_emotion, emotion_breakdown
         print("📋 Full traceback:")
         traceback.print_exc()
         # Return default structured response if LLM fails
-        return {
-            "summary": "We've analyzed your emotional state and provided personalized suggestions to support your wellbeing.",
-            "tips": [
-                "Practice deep breathing exercises for 5 minutes daily",
-                "Engage in physical activity or stretching",
-                "Connect with friends or family members",
-                "Maintain a regular sleep schedule",
-                "Try mindfulness or meditation techniques"
-            ],
-            "resources": [
-                {"title": "Crisis Text Line", "description": "Text HOME to 741741 for free, 24/7 crisis support"},
-                {"title": "National Suicide Prevention Lifeline", "description": "Call 988 for 24/7 support"}
-            ]
-        }
+        return local_tips(stress_score, primary_emotion, has_text_analysis, has_face_analysis)
+
+
+# ---------------------------------------------------
+# Async API (used by the gateway; never blocks the event loop)
+# ---------------------------------------------------
+def request_key(request_kwargs):
+    """Identity of a completion request: same model, parameters and whitespace-normalized prompt"""
+    normalized = dict(request_kwargs)
+    normalized["messages"] = [
+        {"role": message["role"], "content": " ".join(message["content"].split())}
+        for message in request_kwargs.get("messages", [])
+    ]
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    """One upstream completion and the number of callers currently waiting on it"""
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+async def _call_upstream(request_kwargs):
+    async with get_semaphore():
+        response = await get_provider().acomplete(request_kwargs)
+    record_usage(response)
+    return response
+
+
+async def complete(request_kwargs, timeout=None, kind="llm"):
+    """
+    Run one chat completion on the configured provider
+
+    Concurrent calls with the same normalized request share a single upstream
+    completion (single-flight). The upstream call waits for a concurrency slot and
+    each caller waits at most its own deadline, raising asyncio.TimeoutError past
+    it. A caller that is cancelled (e.g. the HTTP client went away) or times out
+    stops waiting; the upstream call is cancelled once no callers are left.
+    """
+    key = request_key(request_kwargs)
+    llm_metrics["callers"] += 1
+
+    flight = _inflight.get(key)
+    leader = flight is None
+    if leader:
+        llm_metrics["upstream_calls"] += 1
+        record_prompt(kind, request_kwargs)
+        flight = _Flight(asyncio.ensure_future(_call_upstream(request_kwargs)))
+        _inflight[key] = flight
+
+        def forget(_, key=key, flight=flight):
+            if _inflight.get(key) is flight:
+                del _inflight[key]
+
+        flight.task.add_done_callback(forget)
+    else:
+        llm_metrics["coalesced"] += 1
+
+    flight.waiters += 1
+    try:
+        # shield: one caller giving up must not cancel the completion for the others
+        completion = await asyncio.wait_for(asyncio.shield(flight.task), timeout=timeout or LLM_TIMEOUT)
+        return completion if leader else completion._replace(coalesced=True)
+    except asyncio.TimeoutError:
+        llm_metrics["timeouts"] += 1
+        raise
+    except asyncio.CancelledError:
+        llm_metrics["cancelled"] += 1
+        raise
+    except Exception:
+        llm_metrics["errors"] += 1
+        raise
+    finally:
+        flight.waiters -= 1
+        if flight.waiters == 0 and not flight.task.done():
+            flight.task.cancel()
+
+
+def metrics():
+    """LLM call counters, in-flight state and cache statistics"""
+    return {
+        **llm_metrics,
+        "in_flight": len(_inflight),
+        "max_concurrency": LLM_MAX_CONCURRENCY,
+        "timeout": LLM_TIMEOUT,
+        "cache": llm_cache.stats(),
+        "provider": get_provider().describe(),
+    }
+
+
+async def agenerate_emotion_summary(predictions, timeout=None):
+    """Async generate_emotion_summary: same input and fallback behaviour"""
+    log_summary_input(predictions)
+
+    key, cached = cached_summary(predictions)
+    if cached is not None:
+        return cached
+
+    try:
+        print("🚀 Calling LLM API...")
+        response = await complete(build_summary_request(predictions), timeout, kind="summary")
+        result = parse_summary(response)
+        store(key, result, response)
+        result = result or DEFAULT_SUMMARY
+        print(f"✅ LLM Summary generated ({len(result)} chars)")
+        return result
+    except asyncio.TimeoutError:
+        print(f"⏱️  LLM summary exceeded {timeout or LLM_TIMEOUT:.0f}s deadline, using fallback")
+        return DEFAULT_SUMMARY
+    except Exception as e:
+        print("🔥 LLM_SERVICE ERROR:", str(e))
+        traceback.print_exc()
+        return DEFAULT_SUMMARY
+
+
+async def astream_emotion_summary(predictions, timeout=None):
+    """
+    Stream the emotion summary as text chunks while the completion is generated
+
+    A cached summary is yielded in one chunk. Otherwise tokens are forwarded as they
+    arrive and the assembled text is cached at the end. If the LLM fails or misses
+    the deadline before the first token, the default summary is yielded instead; a
+    failure mid-stream just ends the stream.
+
+    The upstream stream is read by a separate task into a queue, so the concurrency
+    slot is released as soon as the completion ends, however slowly the client
+    reads the tokens.
+    """
+    log_summary_input(predictions)
+
+    key, cached = cached_summary(predictions)
+    if cached is not None:
+        yield cached
+        return
+
+    llm_metrics["callers"] += 1
+    llm_metrics["streams"] += 1
+    chunks = asyncio.Queue()
+    reader = asyncio.ensure_future(_read_summary_stream(predictions, timeout, chunks))
+    parts = []
+
+    try:
+        while True:
+            text = await chunks.get()
+            if text is None:
+                break
+            parts.append(text)
+            yield text
+        completed = await reader
+    finally:
+        # The client went away: stop reading upstream too
+        if not reader.done():
+            reader.cancel()
+
+    if not parts:
+        yield DEFAULT_SUMMARY
+        return
+
+    result = "".join(parts).strip()
+    if completed:
+        # Partial (timed out) summaries are sent but never cached
+        store(key, result or None)
+    print(f"✅ Streamed LLM summary ({len(result)} chars)")
+
+
+async def _read_summary_stream(predictions, timeout, chunks):
+    """
+    Put the streamed summary's chunks on `chunks`, then None; returns whether the
+    completion finished (rather than failing or missing its deadline)
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + (timeout or LLM_TIMEOUT)
+    completed = False
+    stream = None
+
+    try:
+        async with get_semaphore():
+            print("🚀 Streaming LLM API summary...")
+            llm_metrics["upstream_calls"] += 1
+            request_kwargs = build_summary_request(predictions)
+            record_prompt("summary", request_kwargs)
+            stream = get_provider().astream(request_kwargs)
+            while True:
+                try:
+                    text = await asyncio.wait_for(stream.__anext__(), timeout=deadline - loop.time())
+                except StopAsyncIteration:
+                    completed = True
+                    break
+                chunks.put_nowait(text)
+    except asyncio.TimeoutError:
+        llm_metrics["timeouts"] += 1
+        print(f"⏱️  Streaming summary exceeded {timeout or LLM_TIMEOUT:.0f}s deadline")
+    except asyncio.CancelledError:
+        llm_metrics["cancelled"] += 1
+        raise
+    except Exception as e:
+        llm_metrics["errors"] += 1
+        print("🔥 LLM_SERVICE ERROR while streaming:", str(e))
+        traceback.print_exc()
+    finally:
+        # Let the provider release its upstream connection when we stop early
+        if stream is not None and not completed:
+            await stream.aclose()
+        chunks.put_nowait(None)
+    return completed
+
+
+async def agenerate_mental_health_tips(stress_score, primary_emotion, emotion_breakdown,
+                                       has_text_analysis=False, has_face_analysis=False,
+                                       text_stress=0, face_stress=0, timeout=None):
+    """Async generate_mental_health_tips: same input and fallback behaviour"""
+    print(f"🔍 LLM Service - Generating mental health tips for {primary_emotion} with stress {stress_score:.2f}")
+
+    key, cached = cached_tips(stress_score, primary_emotion, emotion_breakdown, has_text_analysis, has_face_analysis)
+    if cached is not None:
+        return cached
+
+    try:
+        print("🚀 Calling LLM API for mental health tips...")
+        response = await complete(build_tips_request(
+            stress_score, primary_emotion, emotion_breakdown,
+            has_text_analysis, has_face_analysis, text_stress, face_stress
+        ), timeout, kind="tips")
+        result = parse_tips(response)
+        store(key, result, response)
+        result = result or local_tips(stress_score, primary_emotion, has_text_analysis, has_face_analysis)
+        print(f"✅ Mental health tips generated ({len(result.get('tips', []))} tips)")
+        return result
+    except asyncio.TimeoutError:
+        print(f"⏱️  Mental health tips exceeded {timeout or LLM_TIMEOUT:.0f}s deadline, using fallback")
+        return local_tips(stress_score, primary_emotion, has_text_analysis, has_face_analysis)
+    except Exception as e:
+        print("🔥 LLM_SERVICE ERROR in mental health tips:", str(e))
+        traceback.print_exc()
+        return local_tips(stress_score, primary_emotion, has_text_analysis, has_face_analysis)
@@ -0,0 +1,129 @@
+"""
+In-process model hosting for the gateway's monolith mode
+Imports the text, face and audio services as libraries so inference runs inside the
+gateway process: no extra HTTP hop, and one shared torch runtime instead of four.
+
+With MODEL_MEMORY_BUDGET_MB set, a ModelManager unloads models that sit idle while
+the process is over budget and they reload on their next request (see
+inference/manager.py).
+"""
+
+import importlib
+
+from priorities import INTERACTIVE, set_priority
+from wire_format import compact_payload
+
+# Service name -> module implementing it (the same modules the HTTP services run)
+SERVICE_MODULES = {
+    "text": "text_model",
+    "face": "face_model",
+    "audio": "audio_model",
+}
+
+_modules = {}
+_load_errors = {}
+manager = None
+
+
+def load_models():
+    """Import every model module, loading its weights into this process"""
+    global manager
+    # Imported here so services mode never loads torch
+    from inference.manager import manager_from_env
+
+    if manager is None:
+        manager = manager_from_env()
+    for service_name, module_name in SERVICE_MODULES.items():
+        if service_name in _modules:
+            continue
+        try:
+            print(f"📦 Loading {service_name} model in-process ({module_name})...")
+            _modules[service_name] = importlib.import_module(module_name)
+            if manager is not None:
+                manager.register(_modules[service_name].runner)
+        except Exception as e:
+            print(f"❌ Failed to load {service_name} model in-process: {e}")
+            _load_errors[service_name] = str(e)
+
+
+def is_available(service_name):
+    """Whether the model can serve: loaded, or unloaded while idle and reloadable"""
+    module = _modules.get(service_name)
+    return module is not None and module.runner.available
+
+
+def load_states():
+    """Residency of every in-process model, for /api/health"""
+    return {service_name: module.runner.load_state() for service_name, module in _modules.items()}
+
+
+def runners():
+    """ModelRunners of the models available in-process"""
+    return [module.runner for module in _modules.values() if module.runner.available]
+
+
+def get_labels(service_name):
+    module = _modules.get(service_name)
+    return list(module.runner.labels) if module is not None else []
+
+
+def analyze(service_name, compact=False, priority=INTERACTIVE, **inputs):
+    """
+    Run one prediction in-process
+
+    Returns the same {"status", "service", "data"} wrapper as the gateway's safe_post,
+    so endpoints do not care which mode they run in.
+    """
+    module = _modules.get(service_name)
+    # Runs in a worker thread with a copy of the request's context
+    set_priority(priority)
+    try:
+        if module is None:
+            raise RuntimeError(_load_errors.get(service_name, f"{service_name} model not loaded"))
+
+        if service_name == "text":
+            payload, status = module.run_text_analysis(inputs["text"])
+        elif service_name == "face":
+            image = module.load_image_bytes(inputs["image_bytes"])
+            payload, status = module.run_face_analysis(image)
+        elif service_name == "audio":
+            payload, status = module.run_audio_analysis(inputs["audio_bytes"], inputs.get("filename"))
+        else:
+            raise ValueError(f"Unknown service: {service_name}")
+
+        if status >= 400:
+            raise RuntimeError(f"{status} Error: {payload.get('error')}")
+
+        if compact:
+            payload = compact_payload(payload, module.runner.label_index) or payload
+
+        return {
+            "status": "success",
+            "service": service_name,
+            "data": payload
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "service": service_name,
+            "error": str(e)
+        }
+
+
+def submit_job(service_name, **inputs):
+    """
+    Queue an asynchronous analysis job in-process (only audio has jobs)
+
+    Returns the service's (payload, status_code), as the job endpoint would answer.
+    """
+    module = _modules.get(service_name)
+    if module is None or not hasattr(module, "submit_audio_job"):
+        error = _load_errors.get(service_name, f"{service_name} has no asynchronous jobs")
+        return {"success": False, "error": error}, 404
+    return module.submit_audio_job("upload", module.upload_job, inputs["audio_bytes"], inputs.get("filename"))
+
+
+def get_job(service_name, job_id):
+    """A job's JSON view, or None when it is unknown or expired"""
+    jobs = getattr(_modules.get(service_name), "jobs", None)
+    return jobs.get(job_id) if jobs is not None else None
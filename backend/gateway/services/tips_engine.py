@@ -0,0 +1,176 @@
+"""
+Local mental health tips engine
+
+Every (canonical emotion, stress band, analyzed modalities) combination is composed
+once at import into an index, so a lookup is a dict access: no network, no API key.
+Used as the instant answer in TIPS_MODE=local / local_first and as the fallback
+whenever the LLM is unavailable.
+"""
+
+import copy
+
+from emotion_profile import canonical_emotion
+
+# Stress bands match the prompt guidance and the dashboard's Low / Moderate / High
+STRESS_BANDS = ("low", "moderate", "high")
+
+MODALITIES = ("none", "text", "face", "text+face")
+
+EMOTION_CONTENT = {
+    "joy": {
+        "summary": "You're showing a lot of positive energy right now.",
+        "tips": [
+            "Write down one thing that went well today to anchor the feeling",
+            "Share the good mood with someone you care about",
+            "Use this energy for a task you have been putting off",
+        ],
+    },
+    "sadness": {
+        "summary": "You seem to be carrying some sadness at the moment, and that's okay.",
+        "tips": [
+            "Reach out to a friend or family member, even for a short chat",
+            "Step outside for a 10-minute walk in daylight",
+            "Be gentle with yourself and lower the bar for today",
+        ],
+    },
+    "anger": {
+        "summary": "There are signs of frustration or anger in how you're feeling.",
+        "tips": [
+            "Pause and take five slow breaths before responding to anything",
+            "Release the tension physically with a brisk walk or some stretching",
+            "Write down what is bothering you, then set it aside for an hour",
+        ],
+    },
+    "fear": {
+        "summary": "You seem to be feeling some worry or anxiety right now.",
+        "tips": [
+            "Try box breathing: in for 4, hold for 4, out for 4, hold for 4",
+            "Name five things you can see to ground yourself in the present",
+            "Break what worries you into one small next step you can take",
+        ],
+    },
+    "disgust": {
+        "summary": "Something seems to be bothering you or feeling off.",
+        "tips": [
+            "Take a short break from whatever is causing discomfort",
+            "Change your surroundings, even just moving to another room",
+            "Talk it through with someone you trust to get perspective",
+        ],
+    },
+    "surprise": {
+        "summary": "You appear to be reacting to something unexpected.",
+        "tips": [
+            "Give yourself a moment to process before making decisions",
+            "Jot down your thoughts to make sense of what happened",
+            "Check in with how your body feels and breathe slowly",
+        ],
+    },
+    "calm": {
+        "summary": "You come across as calm and settled.",
+        "tips": [
+            "Notice what is helping you feel this way so you can return to it",
+            "Use this steady moment for some light planning or reflection",
+            "Keep up the routines that support your balance",
+        ],
+    },
+    "neutral": {
+        "summary": "Your emotional state looks fairly balanced right now.",
+        "tips": [
+            "Check in with yourself a few times a day to notice how you feel",
+            "Plan a small activity you enjoy for later today",
+            "Keep a steady rhythm of meals, movement and breaks",
+        ],
+    },
+}
+
+BAND_CONTENT = {
+    "low": {
+        "summary": "Your stress level is low, so this is a good time to maintain healthy habits.",
+        "tips": [
+            "Maintain a regular sleep schedule",
+            "Stay active with movement you enjoy",
+        ],
+        "resources": [],
+    },
+    "moderate": {
+        "summary": "Your stress level is moderate, so a few coping strategies can help.",
+        "tips": [
+            "Practice deep breathing exercises for 5 minutes daily",
+            "Try mindfulness or meditation techniques",
+        ],
+        "resources": [
+            {"title": "Headspace / Calm", "description": "Guided meditation and breathing exercises for everyday stress"},
+        ],
+    },
+    "high": {
+        "summary": "Your stress level is high, so please prioritise rest and support.",
+        "tips": [
+            "Reduce your commitments for today where you can",
+            "Talk to someone you trust about how you are feeling",
+        ],
+        "resources": [
+            {"title": "Crisis Text Line", "description": "Text HOME to 741741 for free, 24/7 crisis support"},
+            {"title": "National Suicide Prevention Lifeline", "description": "Call 988 for 24/7 support"},
+        ],
+    },
+}
+
+MODALITY_TIPS = {
+    "none": None,
+    "text": "Keep journaling: putting feelings into words is a proven way to process them",
+    "face": "Notice your facial tension and relax your jaw and shoulders",
+    "text+face": "Your words and expression tell a similar story, so trust what you are noticing",
+}
+
+
+def stress_band(stress_score):
+    try:
+        stress_score = float(stress_score or 0)
+    except (TypeError, ValueError):
+        stress_score = 0.0
+    if stress_score < 0.3:
+        return "low"
+    if stress_score <= 0.7:
+        return "moderate"
+    return "high"
+
+
+def modality_key(has_text_analysis=False, has_face_analysis=False):
+    if has_text_analysis and has_face_analysis:
+        return "text+face"
+    if has_text_analysis:
+        return "text"
+    if has_face_analysis:
+        return "face"
+    return "none"
+
+
+def _compose(emotion, band, modality):
+    emotion_content = EMOTION_CONTENT[emotion]
+    band_content = BAND_CONTENT[band]
+    tips = list(emotion_content["tips"]) + list(band_content["tips"])
+    if MODALITY_TIPS[modality]:
+        tips.append(MODALITY_TIPS[modality])
+    return {
+        "summary": f"{emotion_content['summary']} {band_content['summary']}",
+        "tips": tips,
+        "resources": list(band_content["resources"]),
+    }
+
+
+# Precomputed library: (emotion, band, modalities) -> tips response
+TIPS_INDEX = {
+    (emotion, band, modality): _compose(emotion, band, modality)
+    for emotion in EMOTION_CONTENT
+    for band in STRESS_BANDS
+    for modality in MODALITIES
+}
+
+
+def local_tips(stress_score=0, primary_emotion="neutral", has_text_analysis=False, has_face_analysis=False):
+    """Tips for this state from the local library (same shape as the LLM response)"""
+    emotion = canonical_emotion(primary_emotion)
+    if emotion not in EMOTION_CONTENT:
+        emotion = "neutral"
+    key = (emotion, stress_band(stress_score), modality_key(has_text_analysis, has_face_analysis))
+    return copy.deepcopy(TIPS_INDEX[key])
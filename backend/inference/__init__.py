@@ -0,0 +1,21 @@
+"""
+Shared inference engine for the NeuroPulse model services
+
+Each service subclasses ModelRunner for its modality; loading, warmup, batching,
+top-k postprocessing, caching and timing hooks live here so they apply to all of them.
+"""
+
+from .cache import LRUCache, NullCache, cache_from_env
+from .model_store import MODELS
+from .responses import error_response, prediction_payload
+from .runner import ModelRunner
+
+__all__ = [
+    'ModelRunner',
+    'MODELS',
+    'LRUCache',
+    'NullCache',
+    'cache_from_env',
+    'error_response',
+    'prediction_payload',
+]
@@ -0,0 +1,73 @@
+"""
+Pluggable prediction caches for ModelRunner
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+
+class NullCache:
+    """Cache that never stores anything (the default when caching is disabled)"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {'type': 'none'}
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache with a fixed number of entries"""
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'type': 'lru',
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+def cache_from_env(service_name, default_size=0):
+    """
+    Build the cache for a service from <NAME>_CACHE_SIZE (number of entries, 0 disables)
+    """
+    size = int(os.getenv(f"{service_name.upper()}_CACHE_SIZE", default_size))
+    return LRUCache(size) if size > 0 else NullCache()
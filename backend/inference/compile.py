@@ -0,0 +1,145 @@
+"""
+Optional compiled forward passes with an on-disk artifact cache
+
+INFERENCE_COMPILE selects the mode (per service with <NAME>_COMPILE):
+
+    (unset)      eager PyTorch, the default
+    torchscript  trace the model once and save it; later starts load the saved graph
+                 and skip tracing
+    compile      torch.compile (inductor); its FX graph and kernel caches live in the
+                 cache directory, so later starts skip code generation
+
+Artifacts go to INFERENCE_COMPILE_CACHE_DIR (default ~/.cache/neuropulse/compiled),
+keyed by model, weights revision, torch version, device and input signature, so
+changing any of them compiles afresh instead of loading a stale graph. Any failure
+falls back to eager.
+"""
+
+import hashlib
+import os
+
+import torch
+
+COMPILE_MODES = ('torchscript', 'compile')
+
+
+def compile_mode(service_name):
+    mode = os.getenv(f"{service_name.upper()}_COMPILE", os.getenv('INFERENCE_COMPILE', '')).lower()
+    if mode and mode not in COMPILE_MODES:
+        print(f"⚠️  Unknown compile mode {mode!r} (expected one of {', '.join(COMPILE_MODES)}); running eager")
+        return None
+    return mode or None
+
+
+def cache_dir():
+    path = os.getenv('INFERENCE_COMPILE_CACHE_DIR') or os.path.join(
+        os.path.expanduser('~'), '.cache', 'neuropulse', 'compiled')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class LogitsModule(torch.nn.Module):
+    """
+    Wraps a model so it returns the logits tensor (traceable, unlike a ModelOutput)
+
+    With input names given, forward() takes the inputs positionally in that order,
+    which is how torch.jit.trace calls it.
+    """
+
+    def __init__(self, model, input_names=None):
+        super().__init__()
+        self.model = model
+        self.input_names = input_names
+
+    def forward(self, *inputs, **batch):
+        if self.input_names is not None:
+            batch = dict(zip(self.input_names, inputs))
+        return self.model(**batch).logits
+
+
+class PositionalForward:
+    """Calls a traced module with the keyword batch ModelRunner produces"""
+
+    def __init__(self, module, input_names):
+        self.module = module
+        self.input_names = input_names
+
+    def __call__(self, **batch):
+        return self.module(*(batch[name] for name in self.input_names))
+
+
+WEIGHT_SUFFIXES = ('.safetensors', '.bin')
+
+
+def weights_identity(runner):
+    """
+    Which weights the runner loaded: the store revision (or the hub snapshot's commit
+    hash), plus the size and mtime of the store's weight files, so a re-prefetched or
+    replaced model never reuses a graph traced from the old weights
+    """
+    source = runner.source
+    revision = source.revision if source is not None else None
+    if revision is None:
+        revision = getattr(getattr(runner.model, 'config', None), '_commit_hash', None)
+    files = []
+    if source is not None and source.local and os.path.isdir(source.path):
+        for filename in sorted(os.listdir(source.path)):
+            if filename.endswith(WEIGHT_SUFFIXES):
+                stat = os.stat(os.path.join(source.path, filename))
+                files.append((filename, stat.st_size, stat.st_mtime_ns))
+    return f"{revision}|{files!r}"
+
+
+def artifact_key(runner, example_batch):
+    signature = sorted((name, str(value.dtype), value.dim()) for name, value in example_batch.items())
+    parts = [runner.model_name, 'stub' if runner.stubbed else 'model', weights_identity(runner),
+             torch.__version__, str(runner.device), repr(signature)]
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()[:16]
+
+
+def torchscript_forward(runner, example_batch):
+    """Load the saved TorchScript graph for this model, tracing and saving it on a miss"""
+    path = os.path.join(cache_dir(), f"{runner.name}-{artifact_key(runner, example_batch)}.pt")
+    input_names = sorted(example_batch)
+    if os.path.exists(path):
+        try:
+            module = torch.jit.load(path, map_location=runner.device)
+            module.eval()
+            print(f"⚡ Loaded TorchScript graph from {path}")
+            return PositionalForward(module, input_names)
+        except Exception as e:
+            print(f"⚠️  Could not load {path} ({e}); tracing again")
+
+    example_inputs = tuple(example_batch[name] for name in input_names)
+    with torch.inference_mode(False), torch.no_grad():
+        module = torch.jit.trace(LogitsModule(runner.model, input_names).eval(), example_inputs, strict=False)
+    module = torch.jit.freeze(module.eval())
+
+    # Write then rename, so concurrent workers never load a half-written file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    torch.jit.save(module, tmp_path)
+    os.replace(tmp_path, path)
+    print(f"⚡ Traced {runner.name} model to TorchScript and saved {path}")
+    return PositionalForward(module, input_names)
+
+
+def inductor_forward(runner):
+    """torch.compile with inductor's on-disk caches pointed at the compile cache directory"""
+    inductor_dir = os.path.join(cache_dir(), 'inductor')
+    os.environ.setdefault('TORCHINDUCTOR_CACHE_DIR', inductor_dir)
+    os.environ.setdefault('TORCHINDUCTOR_FX_GRAPH_CACHE', '1')
+    os.environ.setdefault('TORCHINDUCTOR_AUTOGRAD_CACHE', '1')
+    # dynamic=True: one graph for every batch size and sequence length
+    return torch.compile(LogitsModule(runner.model), dynamic=True)
+
+
+def compiled_forward(runner, mode, example_batch):
+    """A callable taking the preprocessed batch as keywords and returning logits, or None for eager"""
+    try:
+        if mode == 'torchscript':
+            return torchscript_forward(runner, example_batch)
+        if mode == 'compile':
+            return inductor_forward(runner)
+    except Exception as e:
+        print(f"⚠️  {mode} failed for the {runner.name} model ({e}); running eager")
+    return None
@@ -0,0 +1,154 @@
+"""
+Idle-model eviction under a memory budget
+
+When several models share a process (the gateway's monolith mode), a modality that
+sees no traffic still pins its weights. A ModelManager watches the runners registered
+with it and, while the process RSS is over MODEL_MEMORY_BUDGET_MB, unloads the least
+recently used models that have been idle for MODEL_IDLE_SECONDS. An unloaded runner
+reloads itself on its next request; with the model in the local store (see
+model_store.py) that is a memory-mapped read, mostly from the page cache.
+
+    MODEL_MEMORY_BUDGET_MB   RSS budget; unset disables the manager, 0 unloads every
+                             idle model
+    MODEL_IDLE_SECONDS       how long a model must go unused before it may be unloaded
+                             (default 600)
+    MODEL_MANAGER_INTERVAL   seconds between budget checks (default 30)
+
+The budget is soft: a reload that needs a model back goes ahead even when nothing
+idle can make room for it.
+"""
+
+import ctypes
+import ctypes.util
+import gc
+import os
+import threading
+import time
+
+import torch
+
+MB = 1024 * 1024
+
+
+def process_rss():
+    """Resident set size of this process in bytes, or None where it cannot be read"""
+    try:
+        with open('/proc/self/statm', encoding='ascii') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+
+def _load_libc():
+    name = ctypes.util.find_library('c')
+    try:
+        return ctypes.CDLL(name) if name else None
+    except OSError:
+        return None
+
+
+_libc = _load_libc()
+
+
+def release_memory():
+    """Return freed model memory to the OS instead of leaving it in the allocator"""
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+    # glibc keeps freed heap pages mapped; without this RSS barely moves on unload
+    if _libc is not None and hasattr(_libc, 'malloc_trim'):
+        _libc.malloc_trim(0)
+
+
+class ModelManager:
+    """Unloads idle ModelRunners, least recently used first, while over the memory budget"""
+
+    def __init__(self, budget_bytes, idle_seconds=600.0, interval=30.0):
+        self.budget_bytes = budget_bytes
+        self.idle_seconds = idle_seconds
+        self.interval = interval
+        self.runners = []
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def register(self, runner):
+        runner.manager = self
+        self.runners.append(runner)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='model-manager', daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.enforce()
+            except Exception as e:
+                print(f"⚠️  Model manager check failed: {e}")
+
+    def resident_bytes(self):
+        """Process RSS, or the weights of the loaded models where RSS is unavailable"""
+        rss = process_rss()
+        if rss is not None:
+            return rss
+        return sum(runner.memory_bytes for runner in self.runners if runner.is_loaded)
+
+    def over_budget(self, extra=0):
+        return self.resident_bytes() + extra > self.budget_bytes
+
+    def idle_runners(self, exclude=None):
+        """Loaded runners unused for at least idle_seconds, least recently used first"""
+        now = time.monotonic()
+        idle = [runner for runner in self.runners
+                if runner is not exclude and runner.is_loaded
+                and now - (runner.last_used or 0) >= self.idle_seconds]
+        return sorted(idle, key=lambda runner: runner.last_used or 0)
+
+    def enforce(self):
+        """Unload idle models until the process is back under budget"""
+        with self._lock:
+            self._evict(self.idle_runners(), extra=0)
+
+    def make_room(self, runner):
+        """Called by a runner about to reload: unload idle models so its weights fit"""
+        with self._lock:
+            self._evict(self.idle_runners(exclude=runner), extra=runner.memory_bytes)
+
+    def _evict(self, candidates, extra):
+        for candidate in candidates:
+            if not self.over_budget(extra):
+                return
+            # unload() refuses (returns False) while the runner has requests in flight
+            if candidate.unload():
+                self.evictions += 1
+
+    def state(self):
+        rss = process_rss()
+        return {
+            'budget_mb': round(self.budget_bytes / MB, 1),
+            'rss_mb': round(rss / MB, 1) if rss is not None else None,
+            'idle_seconds': self.idle_seconds,
+            'evictions': self.evictions,
+        }
+
+
+def manager_from_env():
+    """A started ModelManager configured from MODEL_* variables, or None when no budget is set"""
+    budget = os.getenv('MODEL_MEMORY_BUDGET_MB')
+    if budget is None or budget == '':
+        return None
+    manager = ModelManager(
+        budget_bytes=float(budget) * MB,
+        idle_seconds=float(os.getenv('MODEL_IDLE_SECONDS', '600')),
+        interval=float(os.getenv('MODEL_MANAGER_INTERVAL', '30')),
+    )
+    manager.start()
+    return manager
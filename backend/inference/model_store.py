@@ -0,0 +1,207 @@
+"""
+Local model store: prefetched model snapshots loaded without touching the network
+
+Without it every service start calls from_pretrained(<hub id>), which looks up hub
+metadata (and downloads on a fresh host) before loading. With the store populated,
+services load straight from disk with local_files_only=True:
+
+    python prefetch_models.py             # every service's model
+    python prefetch_models.py text face   # or some of them / hub ids
+    python prefetch_models.py --list
+
+Each model lands in MODEL_STORE_DIR (default ~/.cache/neuropulse/models) as one
+directory holding config, processor files and safetensors weights; checkpoints only
+published as pytorch_model.bin are converted at prefetch time, so every load is a
+memory-mapped safetensors read. Several processes loading the same files share the
+page cache, so restarts and scale-out replicas read weights from memory, not disk.
+
+INFERENCE_OFFLINE=1 makes a model missing from the store a load error instead of a
+download, for hosts that must never reach the hub. Hugging Face's own HF_HUB_OFFLINE=1
+and TRANSFORMERS_OFFLINE=1 still allow loading a model from the standard HF cache.
+"""
+
+import json
+import os
+import shutil
+import time
+
+# Service name -> hub id of the model it serves
+MODELS = {
+    'text': 'j-hartmann/emotion-english-distilroberta-base',
+    'face': 'dima806/facial_emotions_image_detection',
+    'audio': 'ehcalabres/wav2vec2-lg-xlsr-en-speech-emotion-recognition',
+}
+
+# Everything a PyTorch load needs; TF, Flax and ONNX exports are skipped
+ALLOW_PATTERNS = ['*.json', '*.txt', '*.model', '*.safetensors', 'pytorch_model*.bin']
+
+MANIFEST = 'neuropulse-manifest.json'
+
+
+def store_dir():
+    return os.getenv('MODEL_STORE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'neuropulse', 'models')
+
+
+def _truthy(name):
+    return os.getenv(name, '').lower() in ('1', 'true', 'yes')
+
+
+def offline_mode():
+    """Only the store may be used: a model missing from it is an error"""
+    return _truthy('INFERENCE_OFFLINE')
+
+
+def hub_offline():
+    """The hub may not be contacted, but models in the HF cache can still be loaded"""
+    return _truthy('HF_HUB_OFFLINE') or _truthy('TRANSFORMERS_OFFLINE')
+
+
+def model_dir(model_name):
+    return os.path.join(store_dir(), model_name.replace('/', '--'))
+
+
+class ModelSource:
+    """
+    Where a model is loaded from: a store directory, or the hub id as a fallback
+    (only from the HF cache when cache_only is set)
+    """
+
+    def __init__(self, model_name, path, local, safetensors=False, revision=None, cache_only=False):
+        self.model_name = model_name
+        self.path = path
+        self.local = local
+        self.safetensors = safetensors
+        self.revision = revision
+        self.cache_only = cache_only
+
+    def kwargs(self, weights=False):
+        """from_pretrained keyword arguments for this source"""
+        if not self.local:
+            return {'local_files_only': True} if self.cache_only else {}
+        kwargs = {'local_files_only': True}
+        if weights and self.safetensors:
+            kwargs['use_safetensors'] = True
+            if _accelerate_available():
+                # Build the model on the meta device and fill it from the mapped file,
+                # instead of random-initialising it and copying the weights over
+                kwargs['low_cpu_mem_usage'] = True
+        return kwargs
+
+    def describe(self):
+        if not self.local:
+            return f"hub:{self.model_name}" + (' (HF cache only)' if self.cache_only else '')
+        return f"store:{self.path}" + (f"@{self.revision[:12]}" if self.revision else '')
+
+
+def _accelerate_available():
+    try:
+        import accelerate  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def read_manifest(path):
+    try:
+        with open(os.path.join(path, MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def resolve(model_name):
+    """
+    The store copy of model_name if it was prefetched, else the hub id
+
+    Raises FileNotFoundError under INFERENCE_OFFLINE when the model is not in the
+    store. Under the Hugging Face offline flags the hub id is still returned, loading
+    from the HF cache only.
+    """
+    path = model_dir(model_name)
+    manifest = read_manifest(path)
+    if manifest is not None:
+        return ModelSource(model_name, path, local=True, safetensors=manifest.get('safetensors', False),
+                           revision=manifest.get('revision'))
+    if offline_mode():
+        raise FileNotFoundError(
+            f"{model_name} is not in the model store ({store_dir()}) and offline mode is on; "
+            f"run: python prefetch_models.py {model_name}")
+    return ModelSource(model_name, model_name, local=False, cache_only=hub_offline())
+
+
+# ------------------------------------------------------------------
+# Prefetch
+# ------------------------------------------------------------------
+def convert_to_safetensors(path):
+    """Rewrite pytorch_model*.bin checkpoints in path as safetensors; returns whether any were"""
+    import torch
+    from safetensors.torch import save_file
+
+    converted = False
+    for filename in sorted(os.listdir(path)):
+        if not (filename.startswith('pytorch_model') and filename.endswith('.bin')):
+            continue
+        state_dict = torch.load(os.path.join(path, filename), map_location='cpu', weights_only=True)
+        # safetensors refuses tensors sharing storage; classifier checkpoints rarely tie any
+        state_dict = {key: value.contiguous().clone() for key, value in state_dict.items()}
+        target = filename.replace('pytorch_model', 'model').replace('.bin', '.safetensors')
+        save_file(state_dict, os.path.join(path, target), metadata={'format': 'pt'})
+        os.remove(os.path.join(path, filename))
+        converted = True
+
+    index = os.path.join(path, 'pytorch_model.bin.index.json')
+    if os.path.exists(index):
+        with open(index, encoding='utf-8') as f:
+            data = json.load(f)
+        data['weight_map'] = {key: value.replace('pytorch_model', 'model').replace('.bin', '.safetensors')
+                              for key, value in data['weight_map'].items()}
+        with open(os.path.join(path, 'model.safetensors.index.json'), 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.remove(index)
+    return converted
+
+
+def prefetch(model_name, revision=None, force=False):
+    """Download model_name into the store (safetensors only); returns its manifest"""
+    from huggingface_hub import HfApi, snapshot_download
+
+    path = model_dir(model_name)
+    manifest = read_manifest(path)
+    if manifest is not None and not force and (revision is None or manifest.get('revision') == revision):
+        print(f"✅ {model_name} already in the store ({path})")
+        return manifest
+
+    start = time.perf_counter()
+    info = HfApi().model_info(model_name, revision=revision)
+    files = [sibling.rfilename for sibling in info.siblings]
+    has_safetensors = any(name.endswith('.safetensors') for name in files)
+    patterns = [p for p in ALLOW_PATTERNS if not (has_safetensors and p.endswith('.bin'))]
+
+    # Download next to the final directory and swap it in, so a service never sees a
+    # half-written snapshot
+    partial = f"{path}.partial-{os.getpid()}"
+    shutil.rmtree(partial, ignore_errors=True)
+    print(f"⬇️  Fetching {model_name}@{info.sha[:12]} into {path}...")
+    snapshot_download(model_name, revision=info.sha, local_dir=partial, allow_patterns=patterns)
+    shutil.rmtree(os.path.join(partial, '.cache'), ignore_errors=True)
+    converted = False if has_safetensors else convert_to_safetensors(partial)
+
+    manifest = {
+        'model': model_name,
+        'revision': info.sha,
+        'safetensors': any(name.endswith('.safetensors') for name in os.listdir(partial)),
+        'converted': converted,
+        'bytes': sum(os.path.getsize(os.path.join(partial, name)) for name in os.listdir(partial)),
+        'fetched_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    }
+    with open(os.path.join(partial, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    old = f"{path}.old-{os.getpid()}"
+    if os.path.exists(path):
+        os.replace(path, old)
+    os.replace(partial, path)
+    shutil.rmtree(old, ignore_errors=True)
+    print(f"✅ {model_name}: {manifest['bytes'] / 1e6:.0f} MB in {time.perf_counter() - start:.1f}s"
+          f"{' (converted to safetensors)' if converted else ''}")
+    return manifest
@@ -0,0 +1,24 @@
+"""
+Response builders shared by the model services
+"""
+
+from flask import jsonify
+
+
+def error_response(message, status=500):
+    """Standard {"success": false, "error": ...} JSON error response"""
+    return jsonify({
+        'success': False,
+        'error': message
+    }), status
+
+
+def prediction_payload(predictions, **extra):
+    """Standard success payload for one sorted predictions list"""
+    return {
+        'success': True,
+        'predictions': predictions,
+        'top_emotion': predictions[0]['label'],
+        'confidence': predictions[0]['score'],
+        **extra
+    }
@@ -0,0 +1,450 @@
+"""
+ModelRunner: the common load / warmup / batched predict / postprocess loop used by every model service
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import torch
+
+from priorities import current_priority
+
+from .cache import NullCache
+from .compile import compile_mode, compiled_forward
+from .manager import MB, release_memory
+from .model_store import resolve
+from .scheduler import scheduler_from_env
+from .stub import StubClassifier, stub_features, stub_models_enabled
+
+# Passes per warm-up batch size: the first pays for lazy init, the second settles the allocator
+WARMUP_ROUNDS = 2
+
+
+class ModelRunner:
+    """
+    Base class for an emotion classification model
+
+    Subclasses implement load_model() and preprocess(), and override forward() or
+    cache_key() when the defaults do not fit. The runner takes care of device
+    placement, chunked batching, softmax + top-k postprocessing, caching and timing.
+    load_model() should load through pretrained_processor() / pretrained_model(), which
+    read from the local model store when the model was prefetched (see model_store.py)
+    and time each phase of startup.
+
+    Timing hooks are called as hook(stage, seconds, batch_size) for the stages
+    "load", "warmup", "preprocess", "queue", "inference" and "postprocess". Checkpoints are
+    called as hook(point, batch_size) before the first chunk of a prediction
+    ("inference") and before each later one ("chunk"), and again after any wait for
+    the model; a checkpoint that raises drops the rest of the prediction (see
+    deadlines.py). Forward passes are admitted by priority class (see scheduler.py).
+
+    With a compile mode configured (see compile.py) the compiled model replaces
+    forward(); subclasses overriding forward() should leave compilation off.
+    """
+
+    # Short service name ("text", "face", "audio")
+    name = 'model'
+
+    # Labels the stub model uses when labels normally come from the real model's config
+    stub_labels = []
+
+    def __init__(self, model_name, labels=None, cache=None, top_k=None, max_batch_size=8, device=None):
+        self.model_name = model_name
+        self.labels = list(labels or [])
+        self.label_index = {}
+        self.cache = cache or NullCache()
+        self.top_k = top_k
+        self.max_batch_size = max_batch_size
+        self.device = device or ('cuda' if torch.cuda.is_available() else 'cpu')
+        self.model = None
+        self.load_error = None
+        self.stubbed = False
+        self.source = None
+        # Startup phase -> seconds, in the order the phases ran
+        self.startup = {}
+        # Set by a ModelManager that may unload this model when idle (see manager.py)
+        self.manager = None
+        self.evicted = False
+        self.last_used = None
+        self.memory_bytes = 0
+        self.reloads = 0
+        self.last_reload = None
+        self._lifecycle = threading.Lock()
+        self._in_flight = 0
+        # A profiling.TorchTrace while an admin torch profile is armed
+        self.trace = None
+        self.compile_mode = compile_mode(self.name)
+        self.compiled = None
+        self.warmed_up = False
+        self.warmup_seconds = None
+        self._timing_hooks = []
+        self._checkpoints = []
+        # Admits forward passes by priority class (see scheduler.py); None runs them unqueued
+        self.scheduler = scheduler_from_env(self.name)
+        self._stats_lock = threading.Lock()
+        self._stats = {'requests': 0, 'batches': 0, 'items': 0, 'cache_hits': 0}
+
+    # ------------------------------------------------------------------
+    # Subclass hooks
+    # ------------------------------------------------------------------
+    def load_model(self):
+        """Load and return the torch model (and any processor) for this runner"""
+        raise NotImplementedError
+
+    def preprocess(self, inputs):
+        """Turn a list of raw inputs into model keyword arguments"""
+        raise NotImplementedError
+
+    def forward(self, batch):
+        """Run the model on a preprocessed batch and return logits of shape [batch, classes]"""
+        return self.model(**batch).logits
+
+    def cache_key(self, item):
+        """Return a hashable cache key for an input, or None to skip caching it"""
+        return None
+
+    def warmup_inputs(self):
+        """Representative inputs used by warmup()"""
+        return []
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+    @property
+    def is_loaded(self):
+        """Whether the weights are in memory right now"""
+        return self.model is not None
+
+    @property
+    def available(self):
+        """Whether the runner can serve: loaded, or unloaded while idle and reloadable"""
+        return self.model is not None or self.evicted
+
+    @property
+    def status(self):
+        """Health status: healthy only once the model is loaded and warmed up"""
+        if not self.available:
+            return 'model_not_loaded'
+        return 'healthy' if self.warmed_up else 'warming_up'
+
+    def load_state(self):
+        """Residency details for /api/health"""
+        state = 'loaded' if self.is_loaded else 'unloaded' if self.evicted else 'failed'
+        idle = time.monotonic() - self.last_used if self.last_used is not None else None
+        return {
+            'state': state,
+            'memory_mb': round(self.memory_bytes / MB, 1),
+            'idle_seconds': round(idle, 1) if idle is not None else None,
+            'reloads': self.reloads,
+            'last_reload_seconds': round(self.last_reload, 3) if self.last_reload is not None else None,
+        }
+
+    def warmup_batch_sizes(self):
+        """Batch sizes to warm up: <NAME>_WARMUP_BATCH_SIZES, INFERENCE_WARMUP_BATCH_SIZES or 1 and the max"""
+        configured = os.getenv(f"{self.name.upper()}_WARMUP_BATCH_SIZES", os.getenv('INFERENCE_WARMUP_BATCH_SIZES', ''))
+        sizes = [int(size) for size in configured.split(',') if size.strip()] or [1, self.max_batch_size]
+        return sorted({min(max(1, size), self.max_batch_size) for size in sizes})
+
+    @contextmanager
+    def timed(self, phase):
+        """Add the time spent in the block to the startup breakdown"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.startup[phase] = self.startup.get(phase, 0.0) + time.perf_counter() - start
+
+    def pretrained_processor(self, loader, **kwargs):
+        """loader.from_pretrained() for a tokenizer / processor, from the model store if present"""
+        with self.timed('processor'):
+            return loader.from_pretrained(self.source.path, **self.source.kwargs(), **kwargs)
+
+    def pretrained_model(self, loader, **kwargs):
+        """loader.from_pretrained() for the weights, memory-mapped from the model store if present"""
+        with self.timed('weights'):
+            return loader.from_pretrained(self.source.path, **self.source.kwargs(weights=True), **kwargs)
+
+    def startup_summary(self):
+        phases = ', '.join(f"{phase} {seconds:.2f}s" for phase, seconds in self.startup.items())
+        return f"⏱️  {self.name} startup {sum(self.startup.values()):.2f}s: {phases}"
+
+    def load(self):
+        """
+        Load the model, recording (not raising) any error so the service can still
+        start and report model_not_loaded from /api/health
+        """
+        start = time.perf_counter()
+        try:
+            if stub_models_enabled():
+                # Offline load tests: tiny stand-in model, no download (see stub.py)
+                self.labels = self.labels or list(self.stub_labels)
+                model = StubClassifier(len(self.labels))
+                self.stubbed = True
+            else:
+                with self.timed('resolve'):
+                    self.source = resolve(self.model_name)
+                print(f"📦 Loading {self.name} model from {self.source.describe()}")
+                model = self.load_model()
+            with self.timed('device'):
+                model.to(self.device)
+                model.eval()
+            self.model = model
+            self.label_index = {label: idx for idx, label in enumerate(self.labels)}
+            self.load_error = None
+            self.evicted = False
+            self.memory_bytes = sum(t.numel() * t.element_size()
+                                    for t in list(model.parameters()) + list(model.buffers()))
+            self.last_used = time.monotonic()
+        except Exception as e:
+            self.model = None
+            self.load_error = str(e)
+        self._emit('load', time.perf_counter() - start, 0)
+        return self.is_loaded
+
+    def warmup(self):
+        """
+        Run representative inputs at every warm-up batch size before the service reports
+        healthy, so the first real requests do not pay for lazy kernel init, allocator
+        growth, tokenizer setup or compilation
+        """
+        if os.getenv('INFERENCE_SKIP_WARMUP'):
+            # Set by prefork.py: the master must not run torch before forking workers
+            return
+        inputs = self.warmup_inputs()
+        if not self.is_loaded or not inputs:
+            self.warmed_up = self.is_loaded
+            return
+
+        start = time.perf_counter()
+        self._prepare_compiled(inputs)
+
+        warmup_start = time.perf_counter()
+        sizes = self.warmup_batch_sizes()
+        for batch_size in sizes:
+            batch = [inputs[i % len(inputs)] for i in range(batch_size)]
+            for _ in range(WARMUP_ROUNDS):
+                try:
+                    self._predict_uncached(batch)
+                except Exception as e:
+                    if self.compiled is None:
+                        raise
+                    # torch.compile fails lazily on the first call; serve eager instead
+                    print(f"⚠️  Compiled {self.name} model failed during warm-up ({e}); running eager")
+                    self.compiled = None
+                    self._predict_uncached(batch)
+
+        self.startup['warmup'] = time.perf_counter() - warmup_start
+        self.warmup_seconds = time.perf_counter() - start
+        self.warmed_up = True
+        self._emit('warmup', self.warmup_seconds, max(sizes))
+        print(f"🔥 Warmed up {self.name} model at batch sizes {sizes} in {self.warmup_seconds:.2f}s"
+              f"{f' ({self.compile_mode})' if self.compiled is not None else ''}")
+        print(self.startup_summary())
+
+    def _prepare_compiled(self, inputs):
+        if self.compile_mode and self.compiled is None and inputs:
+            with self.timed('compile'):
+                self.compiled = compiled_forward(self, self.compile_mode, self._prepare(inputs[:1]))
+
+    def unload(self):
+        """
+        Drop the weights, leaving the runner to reload them on its next request
+
+        Returns False without waiting when requests are in flight (or a reload is
+        running), so the manager can simply try again on its next check.
+        """
+        if not self._lifecycle.acquire(blocking=False):
+            return False
+        try:
+            if self.model is None or self._in_flight:
+                return False
+            self.model = None
+            self.compiled = None
+            self.evicted = True
+        finally:
+            self._lifecycle.release()
+        release_memory()
+        print(f"💤 Unloaded idle {self.name} model ({self.memory_bytes / MB:.0f} MB)")
+        return True
+
+    def _reload(self):
+        """Load an unloaded model back for an incoming request (holding _lifecycle)"""
+        start = time.perf_counter()
+        if self.manager is not None:
+            self.manager.make_room(self)
+        # Keep the startup breakdown of the first load; a reload is reported separately
+        startup, self.startup = self.startup, {}
+        try:
+            if self.load():
+                self._prepare_compiled(self.warmup_inputs())
+        finally:
+            self.startup = startup
+        if not self.is_loaded:
+            # Stay reloadable: the next request tries again
+            self.evicted = True
+            raise RuntimeError(f"Model reload failed: {self.load_error}")
+        self.reloads += 1
+        self.last_reload = time.perf_counter() - start
+        print(f"♻️  Reloaded {self.name} model in {self.last_reload:.2f}s")
+
+    @contextmanager
+    def _in_use(self):
+        """Hold the model loaded (reloading it if it was unloaded) for one forward pass"""
+        with self._lifecycle:
+            if self.model is None and self.evicted:
+                self._reload()
+            if self.model is None:
+                raise RuntimeError('Model not loaded')
+            self._in_flight += 1
+            self.last_used = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._lifecycle:
+                self._in_flight -= 1
+
+    # ------------------------------------------------------------------
+    # Timing hooks, checkpoints and stats
+    # ------------------------------------------------------------------
+    def add_timing_hook(self, hook):
+        self._timing_hooks.append(hook)
+
+    def _emit(self, stage, seconds, batch_size):
+        for hook in self._timing_hooks:
+            try:
+                hook(stage, seconds, batch_size)
+            except Exception:
+                pass
+
+    def add_checkpoint(self, hook):
+        self._checkpoints.append(hook)
+
+    def _checkpoint(self, point, batch_size):
+        # Unlike timing hooks, exceptions propagate: they are how work is dropped
+        for hook in self._checkpoints:
+            hook(point, batch_size)
+
+    def _count(self, **increments):
+        with self._stats_lock:
+            for key, value in increments.items():
+                self._stats[key] += value
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['cache'] = self.cache.stats()
+        stats['compile'] = self.compile_mode if self.compiled is not None else None
+        stats['warmup_seconds'] = round(self.warmup_seconds, 3) if self.warmup_seconds is not None else None
+        stats['source'] = self.source.describe() if self.source is not None else ('stub' if self.stubbed else None)
+        stats['scheduler'] = self.scheduler.state() if self.scheduler is not None else None
+        stats['startup'] = {phase: round(seconds, 3) for phase, seconds in self.startup.items()}
+        return stats
+
+    # ------------------------------------------------------------------
+    # Prediction
+    # ------------------------------------------------------------------
+    def postprocess(self, logits):
+        """Softmax over classes, then top-k into sorted label/score lists"""
+        probabilities = torch.nn.functional.softmax(logits.float(), dim=-1)
+        # Models loaded with ignore_mismatched_sizes can have more outputs than known labels
+        probabilities = probabilities[:, :len(self.labels)]
+        k = min(self.top_k or probabilities.shape[-1], probabilities.shape[-1])
+        scores, indices = torch.topk(probabilities, k, dim=-1)
+
+        results = []
+        for row_scores, row_indices in zip(scores.tolist(), indices.tolist()):
+            results.append([
+                {'label': self.labels[idx], 'score': float(score)}
+                for idx, score in zip(row_indices, row_scores)
+            ])
+        return results
+
+    def _prepare(self, chunk):
+        """Preprocess a chunk of inputs and move it to the device"""
+        batch = stub_features(chunk) if self.stubbed else self.preprocess(chunk)
+        if hasattr(batch, 'to'):
+            return batch.to(self.device)
+        if isinstance(batch, dict):
+            return {key: value.to(self.device) for key, value in batch.items()}
+        return batch
+
+    def _forward(self, batch):
+        if self.compiled is not None:
+            return self.compiled(**batch)
+        return self.forward(batch)
+
+    @contextmanager
+    def _scheduled(self):
+        """Wait for a model slot in the current request's priority class"""
+        if self.scheduler is None:
+            yield 0.0
+            return
+        with self.scheduler.slot(current_priority()) as waited:
+            yield waited
+
+    def _predict_uncached(self, inputs):
+        results = []
+        for start in range(0, len(inputs), self.max_batch_size):
+            chunk = inputs[start:start + self.max_batch_size]
+            point = 'chunk' if start else 'inference'
+            self._checkpoint(point, len(chunk))
+
+            t0 = time.perf_counter()
+            batch = self._prepare(chunk)
+            t1 = time.perf_counter()
+            # One slot per chunk: bulk requests yield the model between their chunks
+            with self._scheduled() as waited:
+                if waited:
+                    self._checkpoint(point, len(chunk))
+                t2 = time.perf_counter()
+                with torch.inference_mode():
+                    trace = self.trace
+                    logits = trace.run(lambda: self._forward(batch)) if trace is not None else self._forward(batch)
+            t3 = time.perf_counter()
+            results.extend(self.postprocess(logits))
+            t4 = time.perf_counter()
+
+            self._emit('preprocess', t1 - t0, len(chunk))
+            self._emit('queue', waited, len(chunk))
+            self._emit('inference', t3 - t2, len(chunk))
+            self._emit('postprocess', t4 - t3, len(chunk))
+            self._count(batches=1, items=len(chunk))
+        return results
+
+    def predict_batch(self, inputs):
+        """
+        Predict a list of inputs, serving cached entries directly and batching the rest
+
+        Returns one sorted list of {"label", "score"} dicts per input.
+        """
+        if not self.available:
+            raise RuntimeError('Model not loaded')
+
+        self._count(requests=1)
+        results = [None] * len(inputs)
+        keys = [self.cache_key(item) for item in inputs]
+        pending = []
+
+        for i, key in enumerate(keys):
+            cached = self.cache.get(key) if key is not None else None
+            if cached is not None:
+                results[i] = [dict(p) for p in cached]
+                self._count(cache_hits=1)
+            else:
+                pending.append(i)
+
+        if pending:
+            with self._in_use():
+                predictions = self._predict_uncached([inputs[i] for i in pending])
+            for i, prediction in zip(pending, predictions):
+                results[i] = prediction
+                if keys[i] is not None:
+                    self.cache.set(keys[i], [dict(p) for p in prediction])
+
+        return results
+
+    def predict(self, item):
+        """Predict a single input"""
+        return self.predict_batch([item])[0]
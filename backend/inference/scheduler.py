@@ -0,0 +1,119 @@
+"""
+Scheduling of forward passes by request priority class
+
+Live webcam and text analysis must not wait behind a large scoring job on the same
+model process. Every forward pass goes through the runner's PriorityScheduler, which
+admits `slots` passes at a time and queues the rest in one FIFO queue per priority
+class. When a slot frees up, the next class is picked by smooth weighted round robin,
+so under contention interactive work gets most of the model while bulk still makes
+progress, and bulk gets all of it when nothing interactive is waiting. Slots are taken
+per batch chunk, not per request, so a bulk request is preempted between its chunks.
+
+    INFERENCE_CONCURRENCY      forward passes run at once per process (default 1; the
+                               intra-op threads already use the process's cores, see
+                               cpu_budget.py); 0 turns the scheduler off
+    <NAME>_CONCURRENCY         the same for one service (TEXT_CONCURRENCY etc.)
+    INFERENCE_PRIORITY_WEIGHTS share of slots per class under contention (default
+                               interactive=8,bulk=1)
+
+The class of the current request comes from priorities.py, set from the
+X-Request-Priority header by the services and by the gateway's monolith mode.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from priorities import BULK, INTERACTIVE, PRIORITY_CLASSES
+
+DEFAULT_WEIGHTS = {INTERACTIVE: 8, BULK: 1}
+
+
+def parse_weights(text):
+    """'interactive=8,bulk=1' -> {'interactive': 8.0, 'bulk': 1.0}"""
+    weights = dict(DEFAULT_WEIGHTS)
+    for part in (text or '').split(','):
+        name, _, value = part.partition('=')
+        if name.strip() in PRIORITY_CLASSES and value.strip():
+            weights[name.strip()] = max(float(value), 0.001)
+    return weights
+
+
+class PriorityScheduler:
+    """Admits forward passes `slots` at a time from weighted per-class FIFO queues"""
+
+    def __init__(self, slots=1, weights=None):
+        self.slots = slots
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+        self._queues = {name: deque() for name in self.weights}
+        # Smooth weighted round robin state (as in nginx's upstream balancing)
+        self._current = {name: 0.0 for name in self.weights}
+        self._busy = 0
+        self._lock = threading.Lock()
+        self._admitted = {name: 0 for name in self.weights}
+        self._waited = {name: 0.0 for name in self.weights}
+
+    @contextmanager
+    def slot(self, priority=INTERACTIVE):
+        """Hold one model slot; yields the seconds spent queued for it"""
+        priority = priority if priority in self._queues else INTERACTIVE
+        started = time.perf_counter()
+        waiter = None
+        with self._lock:
+            if self._busy < self.slots and not any(self._queues.values()):
+                self._busy += 1
+            else:
+                waiter = threading.Event()
+                self._queues[priority].append(waiter)
+        if waiter is not None:
+            # release() hands its slot straight to us, so _busy already counts it
+            waiter.wait()
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._admitted[priority] += 1
+            self._waited[priority] += waited
+        try:
+            yield waited
+        finally:
+            self._release()
+
+    def _release(self):
+        with self._lock:
+            priority = self._next_class()
+            if priority is None:
+                self._busy -= 1
+            else:
+                self._queues[priority].popleft().set()
+
+    def _next_class(self):
+        """The class the next free slot goes to, or None when nothing is queued"""
+        waiting = [name for name, queue in self._queues.items() if queue]
+        if not waiting:
+            return None
+        total = sum(self.weights[name] for name in waiting)
+        for name in waiting:
+            self._current[name] += self.weights[name]
+        chosen = max(waiting, key=lambda name: self._current[name])
+        self._current[chosen] -= total
+        return chosen
+
+    def state(self):
+        with self._lock:
+            return {
+                'slots': self.slots,
+                'busy': self._busy,
+                'weights': dict(self.weights),
+                'queued': {name: len(queue) for name, queue in self._queues.items()},
+                'admitted': dict(self._admitted),
+                'waited_seconds': {name: round(seconds, 3) for name, seconds in self._waited.items()},
+            }
+
+
+def scheduler_from_env(name):
+    """The scheduler for one service's runner, or None when its concurrency is 0"""
+    slots = int(os.getenv(f"{name.upper()}_CONCURRENCY") or os.getenv('INFERENCE_CONCURRENCY') or 1)
+    if slots <= 0:
+        return None
+    return PriorityScheduler(slots, parse_weights(os.getenv('INFERENCE_PRIORITY_WEIGHTS')))
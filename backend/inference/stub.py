@@ -0,0 +1,59 @@
+"""
+Tiny stand-in models for offline load tests
+
+With INFERENCE_STUB_MODELS=1 every ModelRunner skips downloading its real model and
+serves a small random MLP instead. Inputs are hashed into features, so preprocessing
+still scales with input size (text length, image pixels, audio samples) and the
+serving path, batching and caching behave as usual, but services start in seconds
+without network access. Predictions are deterministic per input and meaningless.
+"""
+
+import hashlib
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import torch
+from torch import nn
+
+STUB_FEATURES = 64
+
+
+def stub_models_enabled():
+    return os.getenv('INFERENCE_STUB_MODELS', '').lower() in ('1', 'true', 'yes')
+
+
+class StubClassifier(nn.Module):
+    """Two-layer MLP returning an object with .logits like a transformers model"""
+
+    def __init__(self, num_labels, hidden=256):
+        super().__init__()
+        generator = torch.Generator().manual_seed(0)
+        self.layers = nn.Sequential(nn.Linear(STUB_FEATURES, hidden), nn.ReLU(), nn.Linear(hidden, num_labels))
+        with torch.no_grad():
+            for parameter in self.parameters():
+                parameter.copy_(torch.randn(parameter.shape, generator=generator) * 0.5)
+
+    def forward(self, features):
+        return SimpleNamespace(logits=self.layers(features))
+
+
+def input_bytes(item):
+    """Raw bytes of a text, PIL image or numpy waveform"""
+    if isinstance(item, str):
+        return item.encode('utf-8')
+    if isinstance(item, np.ndarray):
+        return np.ascontiguousarray(item).tobytes()
+    if hasattr(item, 'tobytes'):
+        return item.tobytes()
+    return repr(item).encode('utf-8')
+
+
+def stub_features(items):
+    """Hash each input into STUB_FEATURES floats in [-1, 1]"""
+    rows = []
+    for item in items:
+        digest = hashlib.blake2b(input_bytes(item), digest_size=STUB_FEATURES).digest()
+        rows.append(np.frombuffer(digest, dtype=np.uint8))
+    features = np.stack(rows).astype(np.float32) / 127.5 - 1.0
+    return {'features': torch.from_numpy(features)}
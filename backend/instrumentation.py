@@ -0,0 +1,305 @@
+"""
+Per-request stage timing and Prometheus metrics shared by the services and the gateway
+
+Each request gets an ID (taken from X-Request-ID or generated) and a set of stage
+timers held in a context variable, so code anywhere on the request path can record
+how long a stage took with `with stage("decode"):` without passing anything around.
+ModelRunner's timing hooks feed the preprocess / inference / postprocess stages.
+
+When the response goes out the stages are sent as a Server-Timing header, e.g.
+
+    Server-Timing: decode;dur=0.41, preprocess;dur=3.2, inference;dur=11.8, total;dur=16.1
+
+and observed into latency histograms served in the Prometheus text format on /metrics.
+Metrics are per process: with prefork.py each worker reports its own, so scrape them
+through the service's load balancer or sum them in the query.
+"""
+
+import contextvars
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+SERVER_TIMING_HEADER = 'Server-Timing'
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; tuned for model serving (sub-millisecond cache hits up to slow LLM calls)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Stage timings of the current request: {'id': request_id, 'stages': {name: seconds}}
+_request = contextvars.ContextVar('neuropulse_request', default=None)
+
+_SAFE_REQUEST_ID = re.compile(r'^[A-Za-z0-9._:-]{1,128}$')
+
+
+# ------------------------------------------------------------------
+# Request context and stage timers
+# ------------------------------------------------------------------
+def begin_request(request_id=None):
+    """Start timing a request; returns its ID (the incoming one if it looks sane)"""
+    if not request_id or not _SAFE_REQUEST_ID.match(request_id):
+        request_id = uuid.uuid4().hex
+    _request.set({'id': request_id, 'stages': {}})
+    return request_id
+
+
+def current_request_id():
+    state = _request.get()
+    return state['id'] if state else None
+
+
+def record_stage(name, seconds):
+    """Add time to a stage of the current request (repeated stages accumulate)"""
+    state = _request.get()
+    if state is not None:
+        state['stages'][name] = state['stages'].get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def stage_timings():
+    """[(stage, seconds), ...] recorded so far for the current request, in order"""
+    state = _request.get()
+    return list(state['stages'].items()) if state else []
+
+
+def server_timing_header(timings, total=None):
+    entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings]
+    if total is not None:
+        entries.append(f"total;dur={total * 1000:.2f}")
+    return ', '.join(entries)
+
+
+def parse_server_timing(header):
+    """'a;dur=1.5, b;dur=2' -> [('a', 0.0015), ('b', 0.002)]; entries without dur are skipped"""
+    timings = []
+    for entry in (header or '').split(','):
+        name, _, params = entry.strip().partition(';')
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if name and key == 'dur':
+                try:
+                    timings.append((name, float(value) / 1000))
+                except ValueError:
+                    pass
+    return timings
+
+
+# ------------------------------------------------------------------
+# Metrics registry (Prometheus text exposition format 0.0.4)
+# ------------------------------------------------------------------
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + list(extra or [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, *labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), series):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, [('le', le)])} {cumulative}")
+                label_text = _format_labels(self.labelnames, labels)
+                lines.append(f"{self.name}_sum{label_text} {series[-1]:.6f}")
+                lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+REQUESTS_TOTAL = REGISTRY.counter(
+    'neuropulse_requests_total', 'HTTP requests handled', ('service', 'endpoint', 'status'))
+REQUEST_SECONDS = REGISTRY.histogram(
+    'neuropulse_request_duration_seconds', 'HTTP request latency', ('service', 'endpoint'))
+STAGE_SECONDS = REGISTRY.histogram(
+    'neuropulse_stage_duration_seconds', 'Time spent in each request stage', ('service', 'stage'))
+INFERENCE_ITEMS = REGISTRY.counter(
+    'neuropulse_inference_items_total', 'Inputs run through the model', ('service',))
+
+
+def observe_request(service, endpoint, status, seconds, timings):
+    """Record a finished request and its stages"""
+    REQUESTS_TOTAL.inc(service, endpoint, str(status))
+    REQUEST_SECONDS.observe(service, endpoint, value=seconds)
+    for name, stage_seconds in timings:
+        STAGE_SECONDS.observe(service, name, value=stage_seconds)
+
+
+def runner_timing_hook(service):
+    """
+    ModelRunner timing hook: request-path stages go to the current request (and reach
+    the histograms with it); load and warmup are observed directly
+    """
+    def hook(stage_name, seconds, batch_size):
+        if stage_name in ('load', 'warmup'):
+            STAGE_SECONDS.observe(service, stage_name, value=seconds)
+            return
+        if stage_name == 'inference':
+            INFERENCE_ITEMS.inc(service, amount=batch_size)
+        if _request.get() is not None:
+            record_stage(stage_name, seconds)
+        else:
+            STAGE_SECONDS.observe(service, stage_name, value=seconds)
+    return hook
+
+
+# ------------------------------------------------------------------
+# Framework integration
+# ------------------------------------------------------------------
+def instrument_flask(app, service, runner=None):
+    """Time every request of a Flask service, add the response headers and serve /metrics"""
+    from flask import Response, g, request
+
+    if runner is not None:
+        runner.add_timing_hook(runner_timing_hook(service))
+
+    @app.before_request
+    def _begin_timing():
+        g.request_started = time.perf_counter()
+        g.request_id = begin_request(request.headers.get(REQUEST_ID_HEADER))
+
+    @app.after_request
+    def _finish_timing(response):
+        started = g.pop('request_started', None)
+        if started is None:
+            return response
+        total = time.perf_counter() - started
+        timings = stage_timings()
+        response.headers[SERVER_TIMING_HEADER] = server_timing_header(timings, total)
+        response.headers[REQUEST_ID_HEADER] = g.request_id
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        if endpoint != '/metrics':
+            observe_request(service, endpoint, response.status_code, total, timings)
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(REGISTRY.render(), mimetype=PROMETHEUS_MIMETYPE)
+
+
+class TimingMiddleware:
+    """
+    ASGI middleware doing the same for the gateway
+
+    Headers go out with the response start, so a streamed response reports the stages
+    finished before its first byte; the histograms get the full duration.
+    """
+
+    def __init__(self, app, service='gateway'):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        incoming = None
+        for key, value in scope.get('headers', []):
+            if key == b'x-request-id':
+                incoming = value.decode('latin-1')
+                break
+        request_id = begin_request(incoming)
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_with_timing(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+                headers = list(message.get('headers', []))
+                timing = server_timing_header(stage_timings(), time.perf_counter() - started)
+                headers.append((b'server-timing', timing.encode('latin-1')))
+                headers.append((b'x-request-id', request_id.encode('latin-1')))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            route = scope.get('route')
+            endpoint = getattr(route, 'path', None) or 'unmatched'
+            if endpoint != '/metrics':
+                observe_request(self.service, endpoint, status[0], time.perf_counter() - started, stage_timings())
@@ -0,0 +1,284 @@
+"""
+Asynchronous jobs for long-running analysis
+
+Analyzing a long recording (or recording from the microphone first) holds an HTTP
+connection and a server thread for the whole run, so the number of such requests in
+flight, not the model, ends up limiting throughput. A job endpoint instead answers 202
+with a job ID straight away and the work runs on a small worker pool. Its progress and
+result are kept in a local SQLite file, so with prefork.py any worker can answer a
+poll, and they survive until the job's TTL runs out:
+
+    GET /api/jobs/<job_id>          the job: status (queued, running, succeeded,
+                                    failed), progress 0..1, message, result or error
+    GET /api/jobs/<job_id>/events   the same as Server-Sent Events: "progress" on every
+                                    change, then "done" or "failed" with the final job
+
+Jobs run in the bulk priority class (see inference/scheduler.py), so they use the
+model capacity live requests leave over.
+
+    JOBS_DB_PATH       SQLite file (default ~/.cache/neuropulse/jobs/<service>.sqlite)
+    JOBS_TTL_SECONDS   how long a job is kept after it was last updated (default 3600)
+    JOBS_WORKERS       jobs run at once per process (default 2)
+    JOBS_MAX_QUEUED    submissions are refused with 429 beyond this many waiting jobs
+                       per process (default 100)
+
+A job whose process exits before it finishes is reported as failed.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from datetime import datetime
+
+from instrumentation import REGISTRY
+from priorities import BULK, set_priority
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+FINISHED = (SUCCEEDED, FAILED)
+
+# Seconds between store reads while streaming a job's events
+EVENT_INTERVAL = 0.25
+
+JOBS_TOTAL = REGISTRY.counter(
+    'neuropulse_jobs_total', 'Asynchronous jobs finished', ('service', 'kind', 'status'))
+JOB_SECONDS = REGISTRY.histogram(
+    'neuropulse_job_duration_seconds', 'Asynchronous job run time', ('service', 'kind'),
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0))
+
+
+class JobQueueFull(Exception):
+    """Too many jobs are already waiting in this process"""
+
+
+def default_db_path(service):
+    base = os.path.join(os.path.expanduser('~'), '.cache', 'neuropulse', 'jobs')
+    return os.getenv('JOBS_DB_PATH') or os.path.join(base, f"{service}.sqlite")
+
+
+def _isoformat(timestamp):
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """Jobs in a SQLite file, expiring `ttl` seconds after their last update"""
+
+    COLUMNS = ('id', 'kind', 'status', 'progress', 'message', 'result', 'error',
+               'created', 'started', 'finished', 'expires', 'pid')
+
+    def __init__(self, path, ttl=3600.0):
+        self.path = path
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as db:
+            # WAL lets pre-forked workers poll while another one writes
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, "
+                "progress REAL NOT NULL DEFAULT 0, message TEXT, result TEXT, error TEXT, created REAL NOT NULL, "
+                "started REAL, finished REAL, expires REAL NOT NULL, pid INTEGER NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_expires ON jobs (expires)")
+            db.commit()
+
+    def _connect(self):
+        # A connection per call: cheap for SQLite, and safe across threads and fork()
+        return sqlite3.connect(self.path, timeout=10)
+
+    def create(self, kind):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with closing(self._connect()) as db:
+            db.execute(
+                "INSERT INTO jobs (id, kind, status, created, expires, pid) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, now, now + self.ttl, os.getpid()),
+            )
+            db.commit()
+        return job_id
+
+    def update(self, job_id, **fields):
+        if 'result' in fields:
+            fields['result'] = json.dumps(fields['result'])
+        fields['expires'] = time.time() + self.ttl
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        with closing(self._connect()) as db:
+            db.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            db.commit()
+
+    def get(self, job_id):
+        """The job as a dict, or None when it is unknown or expired"""
+        with closing(self._connect()) as db:
+            row = db.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE id = ? AND expires > ?", (job_id, time.time())
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(self.COLUMNS, row))
+        if job['status'] not in FINISHED and not _process_alive(job['pid']):
+            job.update(status=FAILED, error='Job was interrupted: its worker process exited', finished=time.time())
+            self.update(job_id, status=FAILED, error=job['error'], finished=job['finished'])
+        return job
+
+    def purge(self):
+        with closing(self._connect()) as db:
+            db.execute("DELETE FROM jobs WHERE expires <= ?", (time.time(),))
+            db.commit()
+
+
+def job_payload(job):
+    """Public JSON view of a stored job"""
+    return {
+        'success': job['status'] != FAILED,
+        'job_id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'progress': round(job['progress'], 3),
+        'message': job['message'],
+        'result': json.loads(job['result']) if job['result'] else None,
+        'error': job['error'],
+        'created': _isoformat(job['created']),
+        'started': _isoformat(job['started']),
+        'finished': _isoformat(job['finished']),
+    }
+
+
+class JobQueue:
+    """Runs submitted functions on a worker pool, recording their progress in a JobStore"""
+
+    def __init__(self, service, store, workers=2, max_queued=100):
+        self.service = service
+        self.store = store
+        self.workers = workers
+        self.max_queued = max_queued
+        self._executor = None
+        self._waiting = 0
+        self._lock = threading.Lock()
+
+    def submit(self, kind, fn, *args):
+        """
+        Queue fn(progress, *args) and return the job ID
+
+        fn reports progress by calling progress(fraction, message=None); what it returns
+        (JSON-serializable) becomes the job's result, and an exception fails the job.
+        """
+        with self._lock:
+            if self._waiting >= self.max_queued:
+                raise JobQueueFull(f"{self._waiting} jobs already waiting")
+            self._waiting += 1
+            if self._executor is None:
+                # Started on first use, so pre-forked workers each get their own threads
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix=f"{self.service}-job")
+        self.store.purge()
+        job_id = self.store.create(kind)
+        self._executor.submit(self._run, job_id, kind, fn, args)
+        return job_id
+
+    def _run(self, job_id, kind, fn, args):
+        with self._lock:
+            self._waiting -= 1
+        set_priority(BULK)
+        started = time.time()
+        self.store.update(job_id, status=RUNNING, started=started)
+
+        def progress(fraction, message=None):
+            self.store.update(job_id, progress=min(max(fraction, 0.0), 1.0), message=message)
+
+        try:
+            result = fn(progress, *args)
+        except Exception as e:
+            print(f"❌ {self.service} job {job_id} failed: {e}")
+            self.store.update(job_id, status=FAILED, error=str(e), finished=time.time())
+            status = FAILED
+        else:
+            self.store.update(job_id, status=SUCCEEDED, progress=1.0, result=result, finished=time.time())
+            status = SUCCEEDED
+        JOBS_TOTAL.inc(self.service, kind, status)
+        JOB_SECONDS.observe(self.service, kind, value=time.time() - started)
+
+    def get(self, job_id):
+        job = self.store.get(job_id)
+        return job_payload(job) if job is not None else None
+
+    def events(self, job_id, interval=EVENT_INTERVAL):
+        """Yield (event, job payload) as the job changes, ending with "done" or "failed" """
+        last = None
+        while True:
+            job = self.get(job_id)
+            if job is None:
+                yield 'failed', {'success': False, 'job_id': job_id, 'error': 'Unknown or expired job'}
+                return
+            if job['status'] in FINISHED:
+                yield ('done' if job['status'] == SUCCEEDED else 'failed'), job
+                return
+            state = (job['status'], job['progress'], job['message'])
+            if state != last:
+                last = state
+                yield 'progress', job
+            time.sleep(interval)
+
+
+def jobs_from_env(service):
+    return JobQueue(
+        service,
+        JobStore(default_db_path(service), ttl=float(os.getenv('JOBS_TTL_SECONDS', '3600'))),
+        workers=int(os.getenv('JOBS_WORKERS', '2')),
+        max_queued=int(os.getenv('JOBS_MAX_QUEUED', '100')),
+    )
+
+
+def sse_event(event, data):
+    """One Server-Sent Events message with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+# ------------------------------------------------------------------
+# Framework integration
+# ------------------------------------------------------------------
+def accepted(job_id, prefix='/api/jobs'):
+    """202 body for a submitted job"""
+    return {
+        'success': True,
+        'job_id': job_id,
+        'status': QUEUED,
+        'status_url': f"{prefix}/{job_id}",
+        'events_url': f"{prefix}/{job_id}/events",
+    }
+
+
+def register_jobs(app, jobs):
+    """Add the job status and event stream endpoints to a Flask service"""
+    from flask import Response, jsonify, stream_with_context
+
+    from inference import error_response
+
+    @app.route('/api/jobs/<job_id>', methods=['GET'])
+    def get_job(job_id):
+        job = jobs.get(job_id)
+        if job is None:
+            return error_response('Unknown or expired job', 404)
+        return jsonify(job)
+
+    @app.route('/api/jobs/<job_id>/events', methods=['GET'])
+    def job_events(job_id):
+        if jobs.get(job_id) is None:
+            return error_response('Unknown or expired job', 404)
+        events = (sse_event(event, job) for event, job in jobs.events(job_id))
+        return Response(stream_with_context(events), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
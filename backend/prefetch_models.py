@@ -0,0 +1,53 @@
+"""
+Prefetch model weights into the local model store (see inference/model_store.py)
+
+Run once per host (or bake into the image) so services start without the network:
+
+Usage:
+    python prefetch_models.py                 # every service's model
+    python prefetch_models.py text audio      # service names or hub ids
+    python prefetch_models.py --revision <sha> text
+    python prefetch_models.py --list
+"""
+
+import argparse
+import sys
+
+from inference.model_store import MODELS, model_dir, prefetch, read_manifest, store_dir
+
+
+def list_store():
+    print(f"Model store: {store_dir()}")
+    for service, model_name in MODELS.items():
+        manifest = read_manifest(model_dir(model_name))
+        if manifest is None:
+            state = 'missing'
+        else:
+            state = f"{manifest['revision'][:12]}  {manifest['bytes'] / 1e6:.0f} MB  fetched {manifest['fetched_at']}"
+        print(f"  {service:6s} {model_name}: {state}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download models into the local model store")
+    parser.add_argument('models', nargs='*', help=f"Service names ({', '.join(MODELS)}) or hub ids (default: all services)")
+    parser.add_argument('--revision', help="Hub revision to pin (default: latest)")
+    parser.add_argument('--force', action='store_true', help="Fetch again even if already stored")
+    parser.add_argument('--list', action='store_true', help="Show what is in the store and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        list_store()
+        return 0
+
+    failed = 0
+    for name in args.models or list(MODELS):
+        try:
+            prefetch(MODELS.get(name, name), revision=args.revision, force=args.force)
+        except Exception as e:
+            print(f"❌ {name}: {e}")
+            failed += 1
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""
+Pre-fork production launcher for the model services
+
+The master process imports the service module once (loading the model weights), binds
+the listening socket, then forks N workers. Workers share the weights copy-on-write, so
+throughput scales with cores without N copies of the model in RAM. Each worker gets its
+slice of the service's CPU share (see cpu_budget.py; without a budget, an even split
+of the host) so workers, and the other services on the host, do not oversubscribe the CPU.
+
+Usage:
+    python prefork.py text --workers 4
+    python prefork.py face --workers 2 --threads 4
+    CPU_AFFINITY=1 python prefork.py audio   # workers pinned to their own cores
+
+POSIX only (relies on os.fork).
+"""
+
+import argparse
+import gc
+import importlib
+import os
+import signal
+import sys
+import time
+
+import torch
+from werkzeug.serving import make_server
+
+from cpu_budget import apply_service_budget, budget_services, plan_from_env
+from transport import SERVICE_PORTS, service_socket_path
+
+SERVICE_MODULES = {
+    'text': 'text_model',
+    'face': 'face_model',
+    'audio': 'audio_model',
+}
+
+
+def default_workers(service_name):
+    """<NAME>_WORKERS, the tuned plan, or one worker per two cores of the service's share"""
+    allocation = plan_from_env().get(service_name) if service_name in budget_services() else None
+    if allocation is None:
+        return int(os.getenv(f"{service_name.upper()}_WORKERS", max(1, (os.cpu_count() or 1) // 2)))
+    return allocation.workers
+
+
+def load_service(service_name):
+    """
+    Import the service module in the master, loading its model without running it
+
+    The master never runs a forward pass and uses a single torch thread, so no OpenMP
+    thread pool exists at fork time (forking after OpenMP has started can hang workers).
+    Warm-up is deferred to the workers.
+    """
+    torch.set_num_threads(1)
+    os.environ['INFERENCE_SKIP_WARMUP'] = '1'
+    try:
+        module = importlib.import_module(SERVICE_MODULES[service_name])
+    finally:
+        os.environ.pop('INFERENCE_SKIP_WARMUP', None)
+
+    # Move everything allocated so far out of the GC's reach so collections in the
+    # workers do not touch (and copy) the pages holding the model's Python objects
+    gc.collect()
+    gc.freeze()
+    return module
+
+
+def bind_server(service_name, app):
+    """Create the listening server in the master so every worker accepts on the same socket"""
+    socket_path = service_socket_path(service_name)
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        host, port, location = f"unix://{socket_path}", 0, f"unix://{socket_path}"
+    else:
+        host, port = '0.0.0.0', SERVICE_PORTS[service_name]
+        location = f"http://127.0.0.1:{port}"
+    server = make_server(host, port, app, threaded=True)
+    return server, location
+
+
+def run_worker(server, service_name, module, workers, threads, worker_id):
+    """Worker body: apply its CPU budget, warm up, serve until terminated"""
+    signal.signal(signal.SIGTERM, lambda *_: os._exit(0))
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if apply_service_budget(service_name, worker_id, workers=workers, threads=threads) is None:
+        # Not one of CPU_BUDGET_SERVICES: fall back to an even split of the host
+        torch.set_num_threads(threads or max(1, (os.cpu_count() or 1) // workers))
+    module.runner.warmup()
+    print(f"👷 Worker {worker_id} (PID {os.getpid()}) serving with {torch.get_num_threads()} torch thread(s)", flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        os._exit(0)
+
+
+def spawn_worker(server, service_name, module, workers, threads, worker_id):
+    pid = os.fork()
+    if pid == 0:
+        run_worker(server, service_name, module, workers, threads, worker_id)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork launcher for a NeuroPulse model service")
+    parser.add_argument('service', choices=sorted(SERVICE_MODULES), help='Service to run')
+    parser.add_argument('--workers', type=int, help='Number of worker processes (default: from the CPU plan)')
+    parser.add_argument('--threads', type=int, help="Torch intra-op threads per worker (default: the service's cores / workers)")
+    args = parser.parse_args()
+
+    if not hasattr(os, 'fork'):
+        sys.exit("prefork.py needs os.fork(); on Windows run the service directly instead")
+
+    workers = args.workers or default_workers(args.service)
+
+    print(f"Loading {args.service} service once in master (PID {os.getpid()})...")
+    module = load_service(args.service)
+    if not module.runner.is_loaded:
+        print(f"⚠️  Model failed to load: {module.runner.load_error}")
+
+    server, location = bind_server(args.service, module.app)
+    print(f"Server starting on {location} with {workers} worker(s)")
+
+    children = {}
+    for worker_id in range(workers):
+        children[spawn_worker(server, args.service, module, workers, args.threads, worker_id)] = worker_id
+
+    stopping = False
+
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # Reap and replace workers that die; they re-fork from the clean master image
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        worker_id = children.pop(pid, None)
+        if worker_id is None or stopping:
+            continue
+        print(f"💥 Worker {worker_id} (PID {pid}) exited with status {status}; respawning")
+        time.sleep(1)
+        children[spawn_worker(server, args.service, module, workers, args.threads, worker_id)] = worker_id
+
+    server.server_close()
+    print("👋 All workers stopped.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""
+Request priority classes
+
+Requests are "interactive" (live analysis, where a user is waiting) or "bulk" (batch
+and background work). The class travels from the gateway to the model services in
+the X-Request-Priority header and is held in a context variable for the current
+request, where the model scheduler (inference/scheduler.py) reads it. This module has
+no dependencies, so the gateway can tag requests without importing torch.
+"""
+
+import contextvars
+
+PRIORITY_HEADER = 'X-Request-Priority'
+
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+PRIORITY_CLASSES = (INTERACTIVE, BULK)
+
+_priority = contextvars.ContextVar('neuropulse_priority', default=INTERACTIVE)
+
+
+def parse_priority(value, default=INTERACTIVE):
+    """Header value -> priority class; unknown or missing values get the default"""
+    value = (value or '').strip().lower()
+    return value if value in PRIORITY_CLASSES else default
+
+
+def set_priority(priority):
+    """Run the rest of the current request (context) in a priority class"""
+    _priority.set(parse_priority(priority))
+
+
+def current_priority():
+    return _priority.get()
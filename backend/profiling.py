@@ -0,0 +1,239 @@
+"""
+On-demand profiling of a live service
+
+Two admin endpoints, registered on every Flask service by register_profiling() and
+mirrored on the gateway:
+
+    POST /admin/profile?seconds=10&interval=0.01
+        Samples every thread's Python stack for `seconds` and returns them in the
+        collapsed format ("thread;outer;...;inner count" per line) that flamegraph.pl,
+        speedscope and inferno read directly.
+    POST /admin/profile/torch?inferences=5&timeout=60
+        Runs the torch profiler around the next N model forward passes and returns a
+        Chrome trace (open in Perfetto or chrome://tracing).
+
+Both need ADMIN_TOKEN to be set on the service and sent as "Authorization: Bearer
+<token>" (or X-Admin-Token); without ADMIN_TOKEN the endpoints are disabled. Only one
+profile runs per process at a time, others get 409. The sampler is a single thread
+reading sys._current_frames() about 100 times a second, so it is safe under load: the
+service keeps serving while it runs, at a cost of a few percent of one core.
+"""
+
+import hmac
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+PROFILE_MAX_SECONDS = 60.0
+PROFILE_MIN_INTERVAL = 0.001
+TORCH_MAX_INFERENCES = 100
+
+# Leaf functions of a thread that is just waiting (for a request, a lock or a socket)
+IDLE_FUNCTIONS = {
+    'wait', 'select', 'poll', 'accept', 'sleep', 'get', 'readinto', 'recv', 'recv_into',
+    '_wait_for_tstate_lock', 'serve_forever', 'run_forever', '_run_once', 'acquire',
+}
+
+_profile_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """Another profile is already running in this process"""
+
+
+def admin_token():
+    return os.getenv('ADMIN_TOKEN') or None
+
+
+def authorized(authorization=None, admin_header=None):
+    """Whether the request carries the admin token (always False when none is configured)"""
+    token = admin_token()
+    if token is None:
+        return False
+    supplied = admin_header
+    if authorization and authorization.startswith('Bearer '):
+        supplied = authorization[len('Bearer '):]
+    return supplied is not None and hmac.compare_digest(supplied.encode('utf-8'), token.encode('utf-8'))
+
+
+def clamp(value, low, high, default):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return default
+    return min(max(value, low), high)
+
+
+# ------------------------------------------------------------------
+# Sampling profiler
+# ------------------------------------------------------------------
+def _frame_name(frame):
+    code = frame.f_code
+    # Aggregate by function (first line), not by the line executing at sample time
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ',')
+
+
+def sample_stacks(seconds=10.0, interval=0.01, include_idle=False):
+    """
+    Sample the Python stacks of every other thread; returns (Counter of collapsed stacks, samples)
+
+    Raises ProfilerBusy if a profile is already running.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy()
+    try:
+        me = threading.get_ident()
+        stacks = Counter()
+        samples = 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                if not include_idle and frame.f_code.co_name in IDLE_FUNCTIONS:
+                    continue
+                frames = []
+                while frame is not None:
+                    frames.append(_frame_name(frame))
+                    frame = frame.f_back
+                frames.append(names.get(ident, f"thread-{ident}").replace(';', ','))
+                stacks[';'.join(reversed(frames))] += 1
+            samples += 1
+            time.sleep(interval)
+        return stacks, samples
+    finally:
+        _profile_lock.release()
+
+
+def collapsed(stacks):
+    """Counter of stacks -> collapsed text, heaviest first"""
+    return ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+# ------------------------------------------------------------------
+# Torch profiler
+# ------------------------------------------------------------------
+class TorchTrace:
+    """
+    Profiles the next `count` forward passes of a ModelRunner
+
+    While it is set as runner.trace, ModelRunner hands each forward pass to run();
+    passes running concurrently with a profiled one go through unprofiled.
+    """
+
+    def __init__(self, count):
+        self.count = count
+        self.captured = 0
+        self.events = []
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+
+    def run(self, forward):
+        if self.done.is_set() or not self._lock.acquire(blocking=False):
+            return forward()
+        try:
+            import torch
+            activities = [torch.profiler.ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(torch.profiler.ProfilerActivity.CUDA)
+            with torch.profiler.profile(activities=activities, record_shapes=True) as profile:
+                result = forward()
+            self._collect(profile)
+            return result
+        finally:
+            self._lock.release()
+
+    def _collect(self, profile):
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            path = f.name
+        try:
+            profile.export_chrome_trace(path)
+            with open(path, encoding='utf-8') as f:
+                self.events.extend(json.load(f).get('traceEvents', []))
+        finally:
+            os.unlink(path)
+        self.captured += 1
+        if self.captured >= self.count:
+            self.done.set()
+
+    def chrome_trace(self):
+        return {'traceEvents': self.events, 'displayTimeUnit': 'ms'}
+
+
+def trace_inferences(runners, count=5, timeout=60.0):
+    """
+    Profile the next `count` forward passes across `runners`; returns (chrome trace dict,
+    passes captured). Waits at most `timeout` seconds for traffic to arrive.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy()
+    trace = TorchTrace(count)
+    try:
+        for runner in runners:
+            runner.trace = trace
+        trace.done.wait(timeout)
+    finally:
+        for runner in runners:
+            if runner.trace is trace:
+                runner.trace = None
+        _profile_lock.release()
+    # A pass still finishing under the trace lock completes before the events are read
+    with trace._lock:
+        return trace.chrome_trace(), trace.captured
+
+
+# ------------------------------------------------------------------
+# Flask integration
+# ------------------------------------------------------------------
+def register_profiling(app, runner=None):
+    """Add the /admin/profile endpoints to a Flask service"""
+    from flask import Response, request
+
+    from inference import error_response
+
+    def denied():
+        if admin_token() is None:
+            return error_response('Profiling is disabled (ADMIN_TOKEN is not set)', 404)
+        if not authorized(request.headers.get('Authorization'), request.headers.get('X-Admin-Token')):
+            return error_response('Unauthorized', 401)
+        return None
+
+    @app.route('/admin/profile', methods=['POST'])
+    def admin_profile():
+        rejection = denied()
+        if rejection is not None:
+            return rejection
+        seconds = clamp(request.args.get('seconds'), 0.1, PROFILE_MAX_SECONDS, 10.0)
+        interval = clamp(request.args.get('interval'), PROFILE_MIN_INTERVAL, 1.0, 0.01)
+        include_idle = request.args.get('idle', '').lower() in ('1', 'true', 'yes')
+        try:
+            stacks, samples = sample_stacks(seconds, interval, include_idle)
+        except ProfilerBusy:
+            return error_response('A profile is already running', 409)
+        return Response(collapsed(stacks), mimetype='text/plain', headers={
+            'Content-Disposition': f'attachment; filename="profile-{os.getpid()}.collapsed"',
+            'X-Profile-Samples': str(samples),
+        })
+
+    @app.route('/admin/profile/torch', methods=['POST'])
+    def admin_profile_torch():
+        rejection = denied()
+        if rejection is not None:
+            return rejection
+        if runner is None or not runner.is_loaded:
+            return error_response('Model not loaded', 500)
+        count = int(clamp(request.args.get('inferences'), 1, TORCH_MAX_INFERENCES, 5))
+        timeout = clamp(request.args.get('timeout'), 1, PROFILE_MAX_SECONDS, 60.0)
+        try:
+            trace, captured = trace_inferences([runner], count, timeout)
+        except ProfilerBusy:
+            return error_response('A profile is already running', 409)
+        return Response(json.dumps(trace), mimetype='application/json', headers={
+            'Content-Disposition': f'attachment; filename="torch-trace-{os.getpid()}.json"',
+            'X-Profile-Inferences': str(captured),
+        })
@@ -0,0 +1,67 @@
+"""
+Serving helpers shared by the model services
+Lets each Flask service listen on its TCP port or, when configured, on a Unix domain socket,
+negotiates JSON or compact msgpack prediction responses and assigns request priority classes
+"""
+
+import os
+
+from flask import Response, jsonify, request
+
+from cpu_budget import apply_service_budget
+from priorities import BULK, INTERACTIVE, PRIORITY_HEADER, parse_priority, set_priority
+from instrumentation import stage
+from transport import SERVICE_PORTS, service_socket_path
+from wire_format import MSGPACK_MIMETYPE, compact_payload, packb, wants_msgpack
+
+
+def respond(payload, label_index=None, status=200):
+    """
+    Return a prediction payload as JSON, or as compact msgpack when the client asks for it
+
+    JSON stays the default; msgpack is used only for Accept: application/x-msgpack.
+    """
+    with stage('serialize'):
+        if label_index is not None and wants_msgpack(request.headers.get('Accept')):
+            compact = compact_payload(payload, label_index)
+            if compact is not None:
+                return Response(packb(compact), status=status, mimetype=MSGPACK_MIMETYPE)
+        return jsonify(payload), status
+
+
+def assign_priorities(app, bulk_endpoints=('/api/analyze-batch',)):
+    """
+    Put each request in a priority class for the model scheduler
+
+    X-Request-Priority (sent by the gateway) decides; without it batch endpoints run
+    as bulk and everything else as interactive.
+    """
+    @app.before_request
+    def _assign_priority():
+        endpoint = request.url_rule.rule if request.url_rule is not None else None
+        default = BULK if endpoint in bulk_endpoints else INTERACTIVE
+        set_priority(parse_priority(request.headers.get(PRIORITY_HEADER), default))
+
+
+def run_app(app, service_name, debug=None):
+    """
+    Run a Flask service on its Unix socket if one is configured, otherwise on its TCP port
+
+    Debug mode (SERVICE_DEBUG=1) starts Werkzeug's reloader, which loads the model a
+    second time in a child process, so it is off by default.
+    """
+    if debug is None:
+        debug = os.getenv('SERVICE_DEBUG', '').lower() in ('1', 'true', 'yes')
+    apply_service_budget(service_name, workers=1)
+    socket_path = service_socket_path(service_name)
+
+    if socket_path:
+        # Remove a stale socket left by a previous run (the reloader child reuses the parent's fd)
+        if os.environ.get("WERKZEUG_RUN_MAIN") != "true" and os.path.exists(socket_path):
+            os.unlink(socket_path)
+        print(f"Server starting on unix://{socket_path}")
+        app.run(debug=debug, host=f"unix://{socket_path}")
+    else:
+        port = SERVICE_PORTS[service_name]
+        print(f"Server starting on http://127.0.0.1:{port}")
+        app.run(debug=debug, host='0.0.0.0', port=port)
@@ -1,91 +1,312 @@
 """
 Script to start all NeuroPulse services including the gateway
+
+Launches every service in parallel, waits for each one to report its model as loaded on
+/api/health, records per-service time-to-ready, streams each service's output with a
+prefix, and restarts crashed services with exponential backoff.
+
+Usage:
+    python start_all_services.py
+    python start_all_services.py --ready-timeout 600 --log-dir logs
+    python start_all_services.py --workers 4   # pre-forked model services (POSIX)
+    python start_all_services.py --workers auto   # worker counts from the CPU plan
 """
 
-import subprocess
-import time
+import argparse
 import os
+import signal
+import subprocess
 import sys
+import threading
+import time
+
+from cpu_budget import plan_from_env, print_plan
+from transport import create_session, service_base_url
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+GATEWAY_DIR = os.path.join(BACKEND_DIR, "gateway")
+GATEWAY_URL = os.getenv("GATEWAY_URL", "http://127.0.0.1:8000")
+
+SERVICES = [
+    {"key": "audio", "name": "Audio Emotion Service", "script": "audio_model.py", "cwd": BACKEND_DIR, "port": 5000},
+    {"key": "text", "name": "Text Emotion Service", "script": "text_model.py", "cwd": BACKEND_DIR, "port": 5001},
+    {"key": "face", "name": "Face Emotion Service", "script": "face_model.py", "cwd": BACKEND_DIR, "port": 5002},
+    {"key": "gateway", "name": "API Gateway", "script": "app.py", "cwd": GATEWAY_DIR, "port": 8000},
+]
+
+# Restart backoff: 1s, 2s, 4s ... capped, reset after a service stays up this long
+BACKOFF_INITIAL = 1.0
+BACKOFF_MAX = 60.0
+STABLE_AFTER = 60.0
+HEALTH_POLL_INTERVAL = 0.5
+
+print_lock = threading.Lock()
+health_session = create_session()
+
+
+def log(message):
+    with print_lock:
+        print(message, flush=True)
+
+
+class ManagedService:
+    """One supervised service process"""
+
+    def __init__(self, spec, log_dir=None, workers=None, echo=True):
+        self.key = spec["key"]
+        self.name = spec["name"]
+        self.script = spec["script"]
+        self.cwd = spec["cwd"]
+        self.port = spec["port"]
+        self.log_dir = log_dir
+        self.workers = workers
+        # echo=False keeps the output in the log file only (e.g. under a load test)
+        self.echo = echo
+        self.process = None
+        self.started_at = None
+        self.ready_at = None
+        self.ready_status = "starting"
+        self.restarts = 0
+        self.backoff = BACKOFF_INITIAL
+        self.next_restart_at = None
+
+    @property
+    def health_url(self):
+        if self.key == "gateway":
+            return f"{GATEWAY_URL}/api/health"
+        return f"{service_base_url(self.key)}/api/health"
+
+    @property
+    def command(self):
+        if self.workers and self.key != "gateway":
+            # Load the model once and fork workers that share it (see prefork.py)
+            return [sys.executable, "prefork.py", self.key, "--workers", str(self.workers)]
+        return [sys.executable, self.script]
+
+    @property
+    def time_to_ready(self):
+        if self.ready_at is None or self.started_at is None:
+            return None
+        return self.ready_at - self.started_at
+
+    def start(self):
+        """Start the process and the threads that drain its output and wait for readiness"""
+        env = dict(os.environ, PYTHONUNBUFFERED="1")
+        if self.key != "gateway" and "OMP_NUM_THREADS" not in env:
+            # Size torch's thread pool from the start, so loading and warm-up stay in budget too
+            allocation = plan_from_env(workers={self.key: self.workers or 1}).get(self.key)
+            if allocation is not None:
+                env["OMP_NUM_THREADS"] = str(allocation.threads)
+        popen_kwargs = {}
+        if os.name == "posix":
+            # Own process group so the Flask/uvicorn reloader children stop with it
+            popen_kwargs["start_new_session"] = True
+        else:
+            popen_kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+
+        try:
+            self.process = subprocess.Popen(
+                self.command,
+                cwd=self.cwd,
+                env=env,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+                bufsize=1,
+                **popen_kwargs
+            )
+        except Exception as e:
+            log(f"❌ Failed to start {self.name}: {e}")
+            self.ready_status = "failed"
+            return False
+
+        self.started_at = time.monotonic()
+        self.ready_at = None
+        self.ready_status = "starting"
+        log(f"✅ Started {self.name} (PID: {self.process.pid})")
+
+        threading.Thread(target=self._drain_output, args=(self.process,), daemon=True).start()
+        threading.Thread(target=self._wait_until_ready, args=(self.process,), daemon=True).start()
+        return True
+
+    def _drain_output(self, process):
+        """Read the pipe continuously so a chatty service can never block on a full buffer"""
+        log_file = None
+        if self.log_dir:
+            log_file = open(os.path.join(self.log_dir, f"{self.key}.log"), "a", encoding="utf-8")
+        try:
+            for line in process.stdout:
+                line = line.rstrip("\n")
+                if self.echo:
+                    log(f"[{self.key}] {line}")
+                if log_file:
+                    log_file.write(line + "\n")
+                    log_file.flush()
+        finally:
+            if log_file:
+                log_file.close()
+
+    def _wait_until_ready(self, process):
+        """Poll /api/health until the model reports loaded (or the process dies)"""
+        while process.poll() is None and process is self.process:
+            try:
+                response = health_session.get(self.health_url, timeout=1)
+                if response.status_code == 200:
+                    status = response.json().get("status")
+                    if self.key == "gateway" or status == "healthy":
+                        self.ready_at = time.monotonic()
+                        self.ready_status = "ready"
+                        log(f"🟢 {self.name} ready in {self.time_to_ready:.1f}s")
+                        return
+                    if status == "model_not_loaded":
+                        self.ready_at = time.monotonic()
+                        self.ready_status = "model_not_loaded"
+                        log(f"⚠️  {self.name} is up but its model failed to load")
+                        return
+            except Exception:
+                pass
+            time.sleep(HEALTH_POLL_INTERVAL)
+
+    def check(self):
+        """Called from the supervisor loop: notice crashes and restart with backoff"""
+        now = time.monotonic()
+
+        if self.process is not None and self.process.poll() is not None:
+            code = self.process.returncode
+            self.process = None
+            self.ready_status = "crashed"
+            uptime = now - self.started_at if self.started_at else 0
+            if uptime > STABLE_AFTER:
+                self.backoff = BACKOFF_INITIAL
+            self.next_restart_at = now + self.backoff
+            log(f"💥 {self.name} exited with code {code}; restarting in {self.backoff:.0f}s")
+            self.backoff = min(self.backoff * 2, BACKOFF_MAX)
+
+        if self.process is None and self.next_restart_at is not None and now >= self.next_restart_at:
+            self.next_restart_at = None
+            self.restarts += 1
+            log(f"🔄 Restarting {self.name} (restart #{self.restarts})")
+            if not self.start():
+                self.next_restart_at = now + self.backoff
+                self.backoff = min(self.backoff * 2, BACKOFF_MAX)
+
+    def stop(self):
+        process = self.process
+        self.process = None
+        self.next_restart_at = None
+        if process is None or process.poll() is not None:
+            return
+        try:
+            if os.name == "posix":
+                os.killpg(process.pid, signal.SIGTERM)
+            else:
+                process.terminate()
+            process.wait(timeout=5)
+            log(f"✅ Stopped {self.name} (PID: {process.pid})")
+        except subprocess.TimeoutExpired:
+            if os.name == "posix":
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+            log(f"⚠️  Force killed {self.name} (PID: {process.pid})")
+        except ProcessLookupError:
+            pass
+
+
+def wait_for_ready(services, timeout):
+    """Block until every service is ready (or has failed), bounded by the slowest one"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        for service in services:
+            service.check()
+        if all(s.ready_status in ("ready", "model_not_loaded", "failed") for s in services):
+            return True
+        time.sleep(0.2)
+    return False
+
+
+def print_summary(services, started, all_ready):
+    log("\n" + "=" * 50)
+    log(f"{'Service':<26}{'Port':>6}{'Status':>18}{'Ready in':>10}")
+    for service in services:
+        ready = f"{service.time_to_ready:.1f}s" if service.time_to_ready is not None else "-"
+        log(f"{service.name:<26}{service.port:>6}{service.ready_status:>18}{ready:>10}")
+    elapsed = time.monotonic() - started
+    if all_ready:
+        log(f"\nStack ready after {elapsed:.1f}s (bounded by the slowest service)")
+    else:
+        log(f"\nStartup summary after {elapsed:.1f}s")
+    log("=" * 50)
 
-def start_service(script_name, service_name, cwd=None):
-    """Start a service in the background"""
-    try:
-        if cwd is None:
-            cwd = os.path.dirname(os.path.abspath(__file__))
-        
-        # Use the current Python interpreter
-        process = subprocess.Popen(
-            [sys.executable, script_name],
-            cwd=cwd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        print(f"✅ Started {service_name} (PID: {process.pid})")
-        return process
-    except Exception as e:
-        print(f"❌ Failed to start {service_name}: {e}")
-        return None
 
 def main():
+    parser = argparse.ArgumentParser(description="Start and supervise all NeuroPulse services")
+    parser.add_argument("--ready-timeout", type=float, default=300, help="Seconds to wait for all services to become ready")
+    parser.add_argument("--log-dir", help="Also append each service's output to <log-dir>/<service>.log")
+    parser.add_argument("--workers", help="Run each model service pre-forked with this many workers "
+                                          "('auto': each service's count from the CPU plan, see cpu_budget.py)")
+    args = parser.parse_args()
+
+    if args.log_dir:
+        os.makedirs(args.log_dir, exist_ok=True)
+
+    specs = SERVICES
+    if os.getenv("GATEWAY_MODE", "services").lower() == "monolith":
+        # The gateway hosts every model itself
+        specs = [spec for spec in SERVICES if spec["key"] == "gateway"]
+
     print("🚀 Starting NeuroPulse Backend Services...")
     print("=" * 50)
-    
-    processes = []
-    
-    # Start microservices
-    print("Starting Microservices...")
-    audio_process = start_service("audio_model.py", "Audio Emotion Service")
-    if audio_process:
-        processes.append(audio_process)
-        time.sleep(2)  # Wait for service to start
-    
-    text_process = start_service("text_model.py", "Text Emotion Service")
-    if text_process:
-        processes.append(text_process)
-        time.sleep(2)  # Wait for service to start
-    
-    face_process = start_service("face_model.py", "Face Emotion Service")
-    if face_process:
-        processes.append(face_process)
-        time.sleep(2)  # Wait for service to start
-    
-    # Start gateway
-    print("\nStarting API Gateway...")
-    gateway_process = start_service("app.py", "API Gateway", cwd=os.path.join(os.path.dirname(os.path.abspath(__file__)), "gateway"))
-    if gateway_process:
-        processes.append(gateway_process)
-    
-    print("\n" + "=" * 50)
-    if len(processes) == 4:
-        print("🎉 All services started successfully!")
-        print("Services running in background:")
-        print("  - Audio Emotion Service (Port 5000)")
-        print("  - Text Emotion Service (Port 5001)")
-        print("  - Face Emotion Service (Port 5002)")
-        print("  - API Gateway (Port 8000)")
-        print("\nPress Ctrl+C to stop all services.")
+
+    model_keys = [spec["key"] for spec in specs if spec["key"] != "gateway"]
+    if model_keys:
+        # Children inherit this, so each one plans for exactly the services started here
+        os.environ.setdefault("CPU_BUDGET_SERVICES", ",".join(model_keys))
+
+    if args.workers == "auto":
+        planned = plan_from_env()
+        workers = {key: planned[key].workers for key in model_keys}
     else:
-        print("⚠️  Some services failed to start.")
-        print(f"Started {len(processes)}/4 services.")
-    
-    print("=" * 50)
-    
+        workers = {key: int(args.workers) if args.workers else None for key in model_keys}
+
+    if model_keys:
+        print("🧮 CPU plan (see cpu_budget.py):")
+        print_plan(plan_from_env(workers={key: workers[key] or 1 for key in model_keys}))
+        print("=" * 50)
+
+    services = [ManagedService(spec, log_dir=args.log_dir, workers=workers.get(spec["key"])) for spec in specs]
+    started = time.monotonic()
+
     try:
-        # Keep the script running
+        # Launch everything at once; readiness is tracked per service
+        for service in services:
+            service.start()
+
+        if wait_for_ready(services, args.ready_timeout):
+            print_summary(services, started, all_ready=True)
+            if all(s.ready_status == "ready" for s in services):
+                log("🎉 All services are ready!")
+            else:
+                log("⚠️  Some services are not fully ready.")
+        else:
+            print_summary(services, started, all_ready=False)
+            log(f"⚠️  Timed out after {args.ready_timeout:.0f}s waiting for services.")
+
+        log("\nPress Ctrl+C to stop all services.")
+
+        # Supervise: restart crashed services with backoff
         while True:
+            for service in services:
+                service.check()
             time.sleep(1)
     except KeyboardInterrupt:
-        print("\n\n🛑 Stopping all services...")
-        for process in processes:
-            try:
-                process.terminate()
-                process.wait(timeout=5)
-                print(f"✅ Stopped process {process.pid}")
-            except subprocess.TimeoutExpired:
-                process.kill()
-                print(f"⚠️  Force killed process {process.pid}")
-        
-        print("👋 All services stopped. Goodbye!")
+        log("\n\n🛑 Stopping all services...")
+        for service in services:
+            service.stop()
+        log("👋 All services stopped. Goodbye!")
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,19 @@
+"""
+pytest setup for the unit tests
+
+Makes the backend modules, the gateway's services and the benchmark helpers importable
+by name, the way the services, the gateway and the benchmark scripts import them.
+"""
+
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for path in (
+    BACKEND_DIR,
+    os.path.join(BACKEND_DIR, 'gateway', 'services'),
+    os.path.join(BACKEND_DIR, 'benchmarks'),
+):
+    if path not in sys.path:
+        sys.path.insert(0, path)
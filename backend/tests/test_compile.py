@@ -0,0 +1,69 @@
+"""
+Unit tests for the compiled-graph cache keys (inference/compile.py)
+"""
+
+import os
+from types import SimpleNamespace
+
+import pytest
+import torch
+
+from inference.compile import artifact_key, weights_identity
+from inference.model_store import ModelSource
+
+EXAMPLE_BATCH = {'input_ids': torch.zeros(1, 8, dtype=torch.long), 'attention_mask': torch.ones(1, 8, dtype=torch.long)}
+
+
+def make_runner(source=None, commit_hash=None, stubbed=False):
+    model = SimpleNamespace(config=SimpleNamespace(_commit_hash=commit_hash))
+    return SimpleNamespace(model_name='org/model', model=model, source=source, stubbed=stubbed, device='cpu')
+
+
+@pytest.fixture
+def store_copy(tmp_path):
+    (tmp_path / 'config.json').write_text('{}')
+    (tmp_path / 'model.safetensors').write_bytes(b'weights')
+    return tmp_path
+
+
+def test_key_is_stable_for_the_same_weights(store_copy):
+    source = ModelSource('org/model', str(store_copy), local=True, revision='abc')
+    assert artifact_key(make_runner(source), EXAMPLE_BATCH) == artifact_key(make_runner(source), EXAMPLE_BATCH)
+
+
+def test_store_revision_changes_the_key(store_copy):
+    old = ModelSource('org/model', str(store_copy), local=True, revision='abc')
+    new = ModelSource('org/model', str(store_copy), local=True, revision='def')
+    assert artifact_key(make_runner(old), EXAMPLE_BATCH) != artifact_key(make_runner(new), EXAMPLE_BATCH)
+
+
+def test_replaced_weight_files_change_the_key(store_copy):
+    source = ModelSource('org/model', str(store_copy), local=True, revision='abc')
+    before = artifact_key(make_runner(source), EXAMPLE_BATCH)
+
+    weights = store_copy / 'model.safetensors'
+    weights.write_bytes(b'new weights')
+    stat = weights.stat()
+    os.utime(weights, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert artifact_key(make_runner(source), EXAMPLE_BATCH) != before
+
+
+def test_other_store_files_do_not_change_the_key(store_copy):
+    source = ModelSource('org/model', str(store_copy), local=True, revision='abc')
+    before = weights_identity(make_runner(source))
+    (store_copy / 'tokenizer.json').write_text('{}')
+    assert weights_identity(make_runner(source)) == before
+
+
+def test_hub_models_are_keyed_by_their_snapshot_commit():
+    hub = ModelSource('org/model', 'org/model', local=False)
+    old = artifact_key(make_runner(hub, commit_hash='1111'), EXAMPLE_BATCH)
+    new = artifact_key(make_runner(hub, commit_hash='2222'), EXAMPLE_BATCH)
+    assert old != new
+
+
+def test_stub_and_input_signature_change_the_key():
+    base = artifact_key(make_runner(), EXAMPLE_BATCH)
+    assert artifact_key(make_runner(stubbed=True), EXAMPLE_BATCH) != base
+    assert artifact_key(make_runner(), {'pixel_values': torch.zeros(1, 3, 4, 4)}) != base
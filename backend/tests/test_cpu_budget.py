@@ -0,0 +1,77 @@
+"""
+Unit tests for the CPU thread budget planner (cpu_budget.py)
+"""
+
+import pytest
+
+import cpu_budget
+from cpu_budget import apply_service_budget, describe_cpus, parse_weights, plan, plan_from_env, split_cores
+
+
+@pytest.fixture(autouse=True)
+def clean_env(monkeypatch):
+    for name in ('CPU_BUDGET_SERVICES', 'CPU_BUDGET_WEIGHTS', 'CPU_BUDGET_CORES', 'CPU_BUDGET_RESERVED',
+                 'CPU_AFFINITY', 'CPU_PLAN_FILE', 'TEXT_WORKERS', 'TEXT_THREADS'):
+        monkeypatch.delenv(name, raising=False)
+
+
+@pytest.fixture
+def applied(monkeypatch):
+    """Records apply_threads calls instead of changing this process's torch threads"""
+    calls = []
+    monkeypatch.setattr(cpu_budget, 'apply_threads', lambda *args: calls.append(args))
+    return calls
+
+
+def test_split_cores_by_weight():
+    assert split_cores(12, {'audio': 3, 'face': 2, 'text': 1}) == {'audio': 6, 'face': 4, 'text': 2}
+    assert sum(split_cores(7, {'audio': 3, 'face': 2, 'text': 1}).values()) == 7
+
+
+def test_every_service_gets_at_least_one_core():
+    shares = split_cores(3, {'audio': 10, 'face': 1, 'text': 1})
+    assert shares == {'audio': 1, 'face': 1, 'text': 1}
+
+
+def test_plan_gives_disjoint_cores_and_reserves_one_on_larger_hosts():
+    allocations = plan(cpus=list(range(8)), weights={'audio': 3, 'face': 2, 'text': 2})
+
+    cores = [cpu for allocation in allocations.values() for cpu in allocation.cpus]
+    assert len(cores) == len(set(cores)) == 7
+    assert allocations['audio'].workers == 1 and allocations['audio'].threads == 3
+
+
+def test_workers_split_a_share_and_get_their_own_cores_with_affinity():
+    allocation = plan(services=('text',), cpus=list(range(9)), workers={'text': 4}, affinity=True)['text']
+
+    assert (allocation.workers, allocation.threads) == (4, 2)
+    assert [allocation.worker_cpus(i) for i in range(4)] == [[0, 1], [2, 3], [4, 5], [6, 7]]
+
+
+def test_parse_weights_and_describe_cpus():
+    assert parse_weights('audio=3, text=1') == {'audio': 3.0, 'text': 1.0}
+    assert describe_cpus([0, 1, 2, 5, 7, 8]) == '0-2,5,7-8'
+
+
+def test_no_budget_without_cpu_budget_services(applied):
+    assert apply_service_budget('text') is None
+    assert applied == []
+
+
+def test_budget_applies_to_the_configured_services(monkeypatch, applied):
+    monkeypatch.setenv('CPU_BUDGET_SERVICES', 'text,face')
+    monkeypatch.setenv('CPU_BUDGET_CORES', '1')
+
+    assert apply_service_budget('text') is not None
+    assert apply_service_budget('audio') is None
+    assert len(applied) == 1
+
+
+def test_plan_from_env_reads_the_settings(monkeypatch):
+    monkeypatch.setenv('CPU_BUDGET_SERVICES', 'text')
+    monkeypatch.setenv('TEXT_THREADS', '3')
+
+    allocations = plan_from_env()
+
+    assert list(allocations) == ['text']
+    assert allocations['text'].threads == 3
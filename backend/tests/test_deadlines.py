@@ -0,0 +1,124 @@
+"""
+Unit tests for per-request deadlines (deadlines.py) and where ModelRunner drops expired work
+"""
+
+import contextvars
+
+import pytest
+
+import deadlines
+from deadlines import (
+    DROPPED_TOTAL, DeadlineExceeded, check, dropped, format_budget, parse_budget, remaining,
+    runner_deadline_hook, set_deadline
+)
+from inference import ModelRunner
+
+
+class StubRunner(ModelRunner):
+    name = 'deadline-test'
+    stub_labels = ['anger', 'joy', 'neutral']
+
+
+def in_new_context(fn):
+    """Run fn in a fresh context, as each request is"""
+    return contextvars.Context().run(fn)
+
+
+def dropped_count(point, service='test'):
+    return DROPPED_TOTAL._values.get((service, point), 0)
+
+
+def test_budget_header_parsing():
+    assert parse_budget('1500') == 1.5
+    assert parse_budget('-20') == 0.0
+    assert parse_budget('soon') is None
+    assert parse_budget(None) is None
+    assert format_budget(1.8405) == '1840'
+    assert format_budget(-1) == '0'
+
+
+def test_no_deadline_never_drops():
+    def request():
+        set_deadline(None)
+        check('test', 'arrival')
+        return remaining(), dropped()
+
+    assert in_new_context(request) == (None, None)
+
+
+def test_live_deadline_passes():
+    def request():
+        set_deadline(5.0)
+        check('test', 'arrival')
+        return remaining()
+
+    assert 4.0 < in_new_context(request) <= 5.0
+
+
+def test_expired_deadline_is_dropped_and_counted_once():
+    before = dropped_count('arrival')
+
+    def request():
+        set_deadline(0)
+        for _ in range(2):
+            with pytest.raises(DeadlineExceeded, match='arrival') as exc:
+                check('test', 'arrival')
+            assert exc.value.point == 'arrival'
+        return dropped()
+
+    assert in_new_context(request) == 'arrival'
+    assert dropped_count('arrival') - before == 1
+
+
+def test_deadline_runs_out_between_checks(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(deadlines.time, 'monotonic', lambda: now[0])
+
+    def request():
+        set_deadline(1.0)
+        check('test', 'dispatch')
+        now[0] += 1.5
+        with pytest.raises(DeadlineExceeded):
+            check('test', 'dispatch')
+
+    in_new_context(request)
+
+
+@pytest.fixture
+def runner(monkeypatch):
+    monkeypatch.setenv('INFERENCE_STUB_MODELS', '1')
+    runner = StubRunner('stub/deadline', max_batch_size=2, device='cpu')
+    assert runner.load(), runner.load_error
+    runner.add_checkpoint(runner_deadline_hook('test'))
+    return runner
+
+
+def test_runner_drops_expired_requests_before_inference(runner):
+    def request():
+        set_deadline(0)
+        with pytest.raises(DeadlineExceeded, match='inference'):
+            runner.predict_batch(['a', 'b', 'c'])
+
+    in_new_context(request)
+    assert runner.stats()['batches'] == 0
+
+
+def test_runner_drops_the_remaining_chunks_once_the_deadline_passes(runner):
+    def expire_after_first_chunk(stage, seconds, batch_size):
+        if stage == 'inference':
+            set_deadline(0)
+
+    runner.add_timing_hook(expire_after_first_chunk)
+
+    def request():
+        set_deadline(5.0)
+        with pytest.raises(DeadlineExceeded, match='chunk'):
+            runner.predict_batch(['a', 'b', 'c', 'd', 'e'])
+
+    in_new_context(request)
+    assert runner.stats()['batches'] == 1
+
+
+def test_runner_without_deadline_runs_every_chunk(runner):
+    in_new_context(lambda: runner.predict_batch(['a', 'b', 'c', 'd', 'e']))
+    assert runner.stats()['batches'] == 3
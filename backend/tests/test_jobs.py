@@ -0,0 +1,122 @@
+"""
+Unit tests for asynchronous jobs (jobs.py)
+"""
+
+import threading
+import time
+
+import pytest
+
+from jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, JobQueue, JobQueueFull, JobStore, jobs_from_env, sse_event
+from priorities import BULK, current_priority
+
+
+def wait_for(queue, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = queue.get(job_id)
+        if job['status'] in (SUCCEEDED, FAILED) or time.monotonic() > deadline:
+            return job
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / 'jobs.sqlite'), ttl=60)
+
+
+@pytest.fixture
+def queue(store):
+    return JobQueue('test', store, workers=1, max_queued=2)
+
+
+def test_job_reports_progress_and_result(queue):
+    def analyze(progress, seconds):
+        progress(0.5, 'halfway')
+        return {'seconds': seconds, 'priority': current_priority()}
+
+    job_id = queue.submit('upload', analyze, 12)
+    job = wait_for(queue, job_id)
+
+    assert job['status'] == SUCCEEDED and job['success']
+    assert job['progress'] == 1.0
+    assert job['message'] == 'halfway'
+    assert job['result'] == {'seconds': 12, 'priority': BULK}
+    assert job['created'] and job['started'] and job['finished']
+
+
+def test_failing_job_records_the_error(queue):
+    def broken(progress):
+        raise ValueError('bad audio')
+
+    job = wait_for(queue, queue.submit('upload', broken))
+
+    assert job['status'] == FAILED and not job['success']
+    assert job['error'] == 'bad audio'
+    assert job['result'] is None
+
+
+def test_unknown_and_expired_jobs(store, queue, monkeypatch):
+    assert queue.get('missing') is None
+
+    job_id = store.create('upload')
+    assert queue.get(job_id)['status'] == QUEUED
+    later = time.time() + 61
+    monkeypatch.setattr('jobs.time.time', lambda: later)
+    assert queue.get(job_id) is None
+
+
+def test_job_of_an_exited_process_is_failed(store):
+    job_id = store.create('upload')
+    store.update(job_id, status=RUNNING, pid=2 ** 22 + 1)
+
+    job = store.get(job_id)
+
+    assert job['status'] == FAILED
+    assert 'exited' in job['error']
+    assert store.get(job_id)['status'] == FAILED
+
+
+def test_submissions_beyond_max_queued_are_refused(queue):
+    release = threading.Event()
+    queue.submit('upload', lambda progress: release.wait(5))
+    # The first job occupies the only worker; two more may wait
+    time.sleep(0.05)
+    queue.submit('upload', lambda progress: None)
+    queue.submit('upload', lambda progress: None)
+    with pytest.raises(JobQueueFull):
+        queue.submit('upload', lambda progress: None)
+    release.set()
+
+
+def test_events_end_with_done(queue):
+    def analyze(progress):
+        for step in range(3):
+            progress(step / 3, f"window {step}")
+            time.sleep(0.02)
+        return {'ok': True}
+
+    job_id = queue.submit('upload', analyze)
+    events = list(queue.events(job_id, interval=0.005))
+
+    assert events[-1][0] == 'done'
+    assert events[-1][1]['result'] == {'ok': True}
+    assert all(event == 'progress' for event, _ in events[:-1])
+
+
+def test_events_for_an_unknown_job(queue):
+    assert [event for event, _ in queue.events('missing')] == ['failed']
+
+
+def test_sse_event_format():
+    assert sse_event('done', {'a': 1}) == 'event: done\ndata: {"a": 1}\n\n'
+
+
+def test_jobs_from_env(monkeypatch, tmp_path):
+    monkeypatch.setenv('JOBS_DB_PATH', str(tmp_path / 'env.sqlite'))
+    monkeypatch.setenv('JOBS_WORKERS', '3')
+    monkeypatch.setenv('JOBS_TTL_SECONDS', '10')
+
+    queue = jobs_from_env('audio')
+
+    assert (queue.workers, queue.store.ttl, queue.store.path) == (3, 10.0, str(tmp_path / 'env.sqlite'))
@@ -0,0 +1,35 @@
+"""
+Unit tests for the benchmark latency summaries (benchmarks/latency_stats.py)
+"""
+
+from latency_stats import percentile, summarize
+
+
+def test_nearest_rank_percentiles():
+    values = list(range(1, 101))
+
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+
+
+def test_small_samples_round_the_rank_up():
+    assert percentile(list(range(1, 11)), 50) == 5
+    assert percentile(list(range(1, 11)), 95) == 10
+    assert percentile([3.0, 1.0, 2.0], 50) == 2.0
+
+
+def test_percentile_edges():
+    assert percentile([], 95) == 0.0
+    assert percentile([7.0], 99) == 7.0
+    assert percentile([1.0, 2.0], 0) == 1.0
+
+
+def test_summarize():
+    summary = summarize([float(v) for v in range(1, 101)], elapsed=2.0)
+
+    assert summary['requests'] == 100
+    assert summary['throughput_rps'] == 50.0
+    assert (summary['p50_ms'], summary['p95_ms'], summary['p99_ms'], summary['max_ms']) == (50.0, 95.0, 99.0, 100.0)
+    assert summarize([], elapsed=0)['throughput_rps'] == 0.0
@@ -0,0 +1,100 @@
+"""
+Unit tests for the LLM response cache (gateway/services/llm_cache.py)
+"""
+
+import sqlite3
+
+import llm_cache
+from llm_cache import LLMCache, NullLLMCache, cache_from_env
+
+
+class Clock:
+    """Stand-in for time.time() that only moves when told to"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_lookups_miss_until_the_variety_pool_is_full(monkeypatch):
+    monkeypatch.setattr(llm_cache.random, 'choice', lambda variants: variants[-1])
+    cache = LLMCache(variety=3)
+
+    for text in ('a', 'b', 'c'):
+        assert cache.get('profile') is None
+        cache.set('profile', text)
+
+    assert cache.get('profile') == 'c'
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 3
+
+
+def test_full_pool_keeps_the_newest_variants():
+    cache = LLMCache(variety=2)
+    for text in ('a', 'b', 'c'):
+        cache.set('profile', text)
+
+    assert {cache.get('profile') for _ in range(50)} == {'b', 'c'}
+
+
+def test_variants_expire_after_the_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache.time, 'time', clock)
+    cache = LLMCache(ttl=60, variety=1)
+    cache.set('profile', 'a')
+
+    clock.now += 59
+    assert cache.get('profile') == 'a'
+    clock.now += 2
+    assert cache.get('profile') is None
+    assert cache.stats()['size'] == 0
+
+
+def test_least_recently_used_profiles_are_evicted():
+    cache = LLMCache(maxsize=2, variety=1)
+    cache.set('first', 'a')
+    cache.set('second', 'b')
+    cache.get('first')
+    cache.set('third', 'c')
+
+    assert cache.get('first') == 'a'
+    assert cache.get('second') is None
+    assert cache.get('third') == 'c'
+
+
+def test_sqlite_keeps_at_most_variety_rows_per_key(tmp_path):
+    path = str(tmp_path / 'llm.sqlite')
+    cache = LLMCache(variety=2, path=path)
+    for i in range(6):
+        cache.set('profile', {'text': f"variant {i}"})
+    cache.set('other', {'text': 'other'})
+
+    with sqlite3.connect(path) as db:
+        rows = db.execute("SELECT value FROM llm_cache WHERE key = 'profile'").fetchall()
+    assert len(rows) == 2
+
+
+def test_sqlite_reload_serves_the_newest_variants(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache.time, 'time', clock)
+    path = str(tmp_path / 'llm.sqlite')
+    cache = LLMCache(variety=2, path=path)
+    for i in range(5):
+        clock.now += 1
+        cache.set('profile', f"variant {i}")
+
+    reloaded = LLMCache(variety=2, path=path)
+    assert {reloaded.get('profile') for _ in range(50)} == {'variant 3', 'variant 4'}
+
+
+def test_cache_from_env(monkeypatch, tmp_path):
+    monkeypatch.setenv('LLM_CACHE_SIZE', '0')
+    assert isinstance(cache_from_env(), NullLLMCache)
+
+    monkeypatch.setenv('LLM_CACHE_SIZE', '16')
+    monkeypatch.setenv('LLM_CACHE_VARIETY', '4')
+    monkeypatch.setenv('LLM_CACHE_PATH', str(tmp_path / 'llm.sqlite'))
+    stats = cache_from_env().stats()
+    assert (stats['type'], stats['maxsize'], stats['variety']) == ('sqlite', 16, 4)
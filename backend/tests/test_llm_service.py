@@ -0,0 +1,116 @@
+"""
+Unit tests for the async LLM calls in gateway/services/llm_service.py, against a
+counting stand-in provider
+"""
+
+import asyncio
+
+import pytest
+
+import llm_service
+from llm_cache import NullLLMCache
+from llm_providers import Completion, LLMProvider, set_provider
+
+
+class CountingProvider(LLMProvider):
+    """Answers every request with its prompt after `latency` seconds, counting calls"""
+
+    name = "counting"
+
+    def __init__(self, latency=0.05, chunks=5):
+        self.latency = latency
+        self.chunks = chunks
+        self.calls = 0
+
+    async def acomplete(self, request_kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return Completion(request_kwargs["messages"][-1]["content"], 1)
+
+    async def astream(self, request_kwargs):
+        self.calls += 1
+        for i in range(self.chunks):
+            await asyncio.sleep(self.latency / self.chunks)
+            yield f"chunk {i} "
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    provider = CountingProvider()
+    set_provider(provider)
+    monkeypatch.setattr(llm_service, "llm_cache", NullLLMCache())
+    monkeypatch.setattr(llm_service, "_semaphore", None)
+    yield provider
+    set_provider(None)
+
+
+def chat(prompt):
+    return {"model": "test", "messages": [{"role": "user", "content": prompt}]}
+
+
+def test_identical_concurrent_calls_share_one_completion(provider):
+    async def run():
+        return await asyncio.gather(*(llm_service.complete(chat("same prompt")) for _ in range(5)))
+
+    coalesced = llm_service.llm_metrics["coalesced"]
+    completions = asyncio.run(run())
+
+    assert provider.calls == 1
+    assert llm_service.llm_metrics["coalesced"] - coalesced == 4
+    assert [c.text for c in completions] == ["same prompt"] * 5
+    assert [c.coalesced for c in completions].count(False) == 1
+    assert not llm_service._inflight
+
+
+def test_whitespace_differences_still_coalesce(provider):
+    async def run():
+        await asyncio.gather(llm_service.complete(chat("same  prompt")), llm_service.complete(chat("same prompt\n")))
+
+    asyncio.run(run())
+    assert provider.calls == 1
+
+
+def test_different_prompts_are_not_coalesced(provider):
+    async def run():
+        await asyncio.gather(llm_service.complete(chat("one")), llm_service.complete(chat("two")))
+
+    asyncio.run(run())
+    assert provider.calls == 2
+
+
+def test_one_caller_giving_up_does_not_cancel_the_others(provider):
+    provider.latency = 0.2
+
+    async def run():
+        impatient = asyncio.ensure_future(llm_service.complete(chat("shared"), timeout=0.05))
+        patient = asyncio.ensure_future(llm_service.complete(chat("shared"), timeout=5))
+        with pytest.raises(asyncio.TimeoutError):
+            await impatient
+        return await patient
+
+    assert asyncio.run(run()).text == "shared"
+    assert provider.calls == 1
+
+
+def test_later_identical_call_starts_a_new_completion(provider):
+    async def run():
+        await llm_service.complete(chat("again"))
+        await llm_service.complete(chat("again"))
+
+    asyncio.run(run())
+    assert provider.calls == 2
+
+
+def test_streamed_summary_releases_its_slot_before_a_slow_reader_finishes(provider):
+    async def run():
+        stream = llm_service.astream_emotion_summary({"stress": 0.5})
+        parts = [await stream.__anext__()]
+        # The reader stalls; the upstream completion finishes meanwhile
+        await asyncio.sleep(provider.latency * 3)
+        free = llm_service.get_semaphore()._value
+        parts.extend([part async for part in stream])
+        return parts, free
+
+    parts, free = asyncio.run(run())
+    assert free == llm_service.LLM_MAX_CONCURRENCY
+    assert "".join(parts) == "".join(f"chunk {i} " for i in range(provider.chunks))
@@ -0,0 +1,68 @@
+"""
+Unit tests for resolving models through the local model store (inference/model_store.py)
+"""
+
+import json
+import os
+
+import pytest
+
+from inference.model_store import MANIFEST, model_dir, resolve
+
+MODEL = 'org/emotion-model'
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setenv('MODEL_STORE_DIR', str(tmp_path))
+    for name in ('INFERENCE_OFFLINE', 'HF_HUB_OFFLINE', 'TRANSFORMERS_OFFLINE'):
+        monkeypatch.delenv(name, raising=False)
+    return tmp_path
+
+
+def prefetched(revision='abc123', safetensors=True):
+    path = model_dir(MODEL)
+    os.makedirs(path)
+    with open(os.path.join(path, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump({'model': MODEL, 'revision': revision, 'safetensors': safetensors}, f)
+    return path
+
+
+def test_prefetched_model_loads_from_the_store():
+    path = prefetched()
+
+    source = resolve(MODEL)
+
+    assert source.local and source.path == path and source.revision == 'abc123'
+    assert source.kwargs() == {'local_files_only': True}
+    assert source.kwargs(weights=True)['use_safetensors'] is True
+
+
+def test_missing_model_falls_back_to_the_hub():
+    source = resolve(MODEL)
+
+    assert not source.local and source.path == MODEL
+    assert source.kwargs() == {}
+
+
+def test_inference_offline_makes_a_store_miss_fatal(monkeypatch):
+    monkeypatch.setenv('INFERENCE_OFFLINE', '1')
+
+    with pytest.raises(FileNotFoundError, match='prefetch_models.py'):
+        resolve(MODEL)
+
+
+@pytest.mark.parametrize('flag', ['HF_HUB_OFFLINE', 'TRANSFORMERS_OFFLINE'])
+def test_hf_offline_flags_still_load_from_the_hf_cache(monkeypatch, flag):
+    monkeypatch.setenv(flag, '1')
+
+    source = resolve(MODEL)
+
+    assert not source.local and source.path == MODEL
+    assert source.kwargs() == {'local_files_only': True}
+
+
+def test_store_wins_in_offline_mode(monkeypatch):
+    monkeypatch.setenv('INFERENCE_OFFLINE', '1')
+    prefetched()
+    assert resolve(MODEL).local
@@ -0,0 +1,89 @@
+"""
+Unit tests for ModelRunner batching and caching, run on the stub models
+(inference/stub.py) so no real model is downloaded
+"""
+
+import pytest
+
+from inference import LRUCache, ModelRunner
+
+LABELS = ['anger', 'disgust', 'fear', 'joy', 'neutral', 'sadness', 'surprise']
+
+
+class StubTextRunner(ModelRunner):
+    name = 'test'
+    stub_labels = LABELS
+
+    def cache_key(self, text):
+        return text
+
+
+@pytest.fixture
+def runner(monkeypatch):
+    monkeypatch.setenv('INFERENCE_STUB_MODELS', '1')
+    runner = StubTextRunner('stub/text', cache=LRUCache(maxsize=64), max_batch_size=4, device='cpu')
+    assert runner.load(), runner.load_error
+    return runner
+
+
+def test_stub_model_loads_with_its_labels(runner):
+    assert runner.stubbed
+    assert runner.labels == LABELS
+    assert runner.model is not None
+
+
+def test_predictions_are_sorted_distributions_over_the_labels(runner):
+    prediction = runner.predict("I am feeling happy today!")
+
+    scores = [p['score'] for p in prediction]
+    assert sorted(p['label'] for p in prediction) == sorted(LABELS)
+    assert scores == sorted(scores, reverse=True)
+    assert sum(scores) == pytest.approx(1.0, abs=1e-5)
+
+
+def test_top_k_limits_the_predictions(runner):
+    runner.top_k = 3
+    assert len(runner.predict("hello")) == 3
+
+
+def test_large_batches_are_split_into_chunks(runner):
+    stages = []
+    runner.add_timing_hook(lambda stage, seconds, batch_size: stages.append((stage, batch_size)))
+
+    results = runner.predict_batch([f"text {i}" for i in range(10)])
+
+    assert len(results) == 10
+    assert runner.stats()['batches'] == 3
+    assert [size for stage, size in stages if stage == 'inference'] == [4, 4, 2]
+
+
+def test_batched_and_single_predictions_agree(runner):
+    texts = [f"text {i}" for i in range(6)]
+    batched = runner.predict_batch(texts)
+    runner.cache.clear()
+
+    for text, prediction in zip(texts, batched):
+        single = runner.predict(text)
+        assert [p['label'] for p in single] == [p['label'] for p in prediction]
+        assert [p['score'] for p in single] == pytest.approx([p['score'] for p in prediction], abs=1e-5)
+
+
+def test_cached_inputs_skip_the_model(runner):
+    first = runner.predict_batch(['a', 'b'])
+    second = runner.predict_batch(['a', 'b', 'c'])
+
+    stats = runner.stats()
+    assert stats['cache_hits'] == 2
+    assert stats['items'] == 3
+    assert second[:2] == first
+
+
+def test_cached_results_are_copies(runner):
+    runner.predict('a')[0]['score'] = -1.0
+    assert runner.predict('a')[0]['score'] >= 0.0
+
+
+def test_predict_without_a_model_fails():
+    runner = StubTextRunner('stub/text')
+    with pytest.raises(RuntimeError, match='Model not loaded'):
+        runner.predict('hello')
@@ -0,0 +1,126 @@
+"""
+Unit tests for priority scheduling of forward passes (inference/scheduler.py)
+"""
+
+import threading
+import time
+
+import pytest
+
+from inference.scheduler import PriorityScheduler, parse_weights, scheduler_from_env
+from priorities import BULK, INTERACTIVE, parse_priority
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('condition not reached')
+        time.sleep(0.001)
+
+
+def admission_order(scheduler, waiting):
+    """
+    Queue one waiter per entry of `waiting` (in that order) behind a held slot,
+    release it, and return the classes in the order they were admitted
+    """
+    order = []
+    lock = threading.Lock()
+
+    def work(priority):
+        with scheduler.slot(priority):
+            with lock:
+                order.append(priority)
+
+    threads = []
+    with scheduler.slot(INTERACTIVE):
+        for count, priority in enumerate(waiting, 1):
+            thread = threading.Thread(target=work, args=(priority,))
+            thread.start()
+            threads.append(thread)
+            # Start the next waiter only once this one is queued, so queue order is known
+            wait_until(lambda: sum(scheduler.state()['queued'].values()) == count)
+    for thread in threads:
+        thread.join(5)
+    return order
+
+
+def test_uncontended_slot_is_admitted_without_waiting():
+    scheduler = PriorityScheduler(slots=1)
+    with scheduler.slot(BULK) as waited:
+        assert waited < 0.01
+        assert scheduler.state()['busy'] == 1
+    assert scheduler.state()['busy'] == 0
+
+
+def test_slots_are_shared_by_weight_under_contention():
+    scheduler = PriorityScheduler(slots=1, weights={INTERACTIVE: 3, BULK: 1})
+
+    order = admission_order(scheduler, [BULK] * 6 + [INTERACTIVE] * 6)
+
+    # Smooth weighted round robin: three interactive passes per bulk pass, interleaved
+    assert order[:8] == [INTERACTIVE, INTERACTIVE, BULK, INTERACTIVE] * 2
+    assert sorted(order) == sorted([BULK] * 6 + [INTERACTIVE] * 6)
+
+
+def test_bulk_gets_every_slot_when_nothing_interactive_waits():
+    scheduler = PriorityScheduler(slots=1)
+    assert admission_order(scheduler, [BULK] * 4) == [BULK] * 4
+    assert scheduler.state()['admitted'][BULK] == 4
+
+
+def test_each_class_is_first_in_first_out():
+    scheduler = PriorityScheduler(slots=1)
+    order = []
+
+    def work(name):
+        with scheduler.slot(BULK):
+            order.append(name)
+
+    with scheduler.slot(BULK):
+        threads = []
+        for i in range(4):
+            threads.append(threading.Thread(target=work, args=(i,)))
+            threads[-1].start()
+            wait_until(lambda: scheduler.state()['queued'][BULK] == i + 1)
+    for thread in threads:
+        thread.join(5)
+    assert order == [0, 1, 2, 3]
+
+
+def test_several_slots_run_at_once():
+    scheduler = PriorityScheduler(slots=2)
+    with scheduler.slot(INTERACTIVE), scheduler.slot(BULK) as waited:
+        assert waited < 0.01
+        assert scheduler.state()['busy'] == 2
+
+
+def test_unknown_classes_run_as_interactive():
+    scheduler = PriorityScheduler(slots=1)
+    with scheduler.slot('batch-import'):
+        pass
+    assert scheduler.state()['admitted'][INTERACTIVE] == 1
+    assert parse_priority('BULK') == BULK
+    assert parse_priority('urgent') == INTERACTIVE
+    assert parse_priority(None, default=BULK) == BULK
+
+
+def test_weights_from_env(monkeypatch):
+    assert parse_weights('interactive=4, bulk=2') == {INTERACTIVE: 4.0, BULK: 2.0}
+    assert parse_weights('bulk=0,other=5') == {INTERACTIVE: 8, BULK: 0.001}
+
+    monkeypatch.setenv('INFERENCE_CONCURRENCY', '3')
+    monkeypatch.setenv('TEXT_CONCURRENCY', '0')
+    monkeypatch.setenv('INFERENCE_PRIORITY_WEIGHTS', 'bulk=2')
+    assert scheduler_from_env('text') is None
+    scheduler = scheduler_from_env('face')
+    assert (scheduler.slots, scheduler.weights[BULK]) == (3, 2.0)
+
+
+@pytest.mark.parametrize('priority', [INTERACTIVE, BULK])
+def test_slot_is_released_when_the_pass_fails(priority):
+    scheduler = PriorityScheduler(slots=1)
+    with pytest.raises(ValueError):
+        with scheduler.slot(priority):
+            raise ValueError('forward pass failed')
+    assert scheduler.state()['busy'] == 0
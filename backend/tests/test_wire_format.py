@@ -0,0 +1,79 @@
+"""
+Unit tests for the compact msgpack wire format (wire_format.py)
+"""
+
+import pytest
+
+from wire_format import (
+    build_label_index, compact_payload, expand_payload, packb, unpack_scores, unpackb, wants_msgpack
+)
+
+LABELS = ['anger', 'disgust', 'fear', 'joy', 'neutral', 'sadness', 'surprise']
+
+
+def prediction_payload(*scored):
+    return {
+        'success': True,
+        'predictions': [{'label': label, 'score': score} for label, score in scored],
+        'top_emotion': scored[0][0],
+        'confidence': scored[0][1],
+    }
+
+
+def test_compact_payload_uses_label_indices_and_float32_scores():
+    payload = prediction_payload(('joy', 0.75), ('neutral', 0.25))
+
+    compact = compact_payload(payload, build_label_index(LABELS))
+
+    assert compact['label_idx'] == [3, 4]
+    assert unpack_scores(compact['scores']) == [0.75, 0.25]
+    assert 'predictions' not in compact
+    assert 'top_emotion' not in compact
+    assert compact['confidence'] == 0.75
+
+
+def test_round_trip_restores_predictions_and_top_emotion():
+    payload = prediction_payload(('sadness', 0.6), ('fear', 0.3), ('anger', 0.1))
+
+    expanded = expand_payload(compact_payload(payload, build_label_index(LABELS)), LABELS)
+
+    assert [p['label'] for p in expanded['predictions']] == ['sadness', 'fear', 'anger']
+    assert [p['score'] for p in expanded['predictions']] == pytest.approx([0.6, 0.3, 0.1], abs=1e-6)
+    assert expanded['top_emotion'] == 'sadness'
+    assert expanded['success'] is True
+
+
+def test_round_trip_through_msgpack_bytes():
+    payload = prediction_payload(('surprise', 0.9), ('joy', 0.1))
+
+    decoded = unpackb(packb(compact_payload(payload, build_label_index(LABELS))))
+    expanded = expand_payload(decoded, LABELS)
+
+    assert [p['label'] for p in expanded['predictions']] == ['surprise', 'joy']
+    assert expanded['top_emotion'] == 'surprise'
+
+
+def test_batch_results_are_compacted_and_expanded():
+    payload = {
+        'success': True,
+        'results': [prediction_payload(('joy', 1.0)), prediction_payload(('anger', 1.0))],
+    }
+
+    compact = compact_payload(payload, build_label_index(LABELS))
+    assert [item['label_idx'] for item in compact['results']] == [[3], [0]]
+
+    expanded = expand_payload(compact, LABELS)
+    assert [item['top_emotion'] for item in expanded['results']] == ['joy', 'anger']
+
+
+def test_unknown_label_falls_back_to_json():
+    payload = prediction_payload(('bored', 1.0))
+
+    assert compact_payload(payload, build_label_index(LABELS)) is None
+    assert compact_payload({'results': [payload]}, build_label_index(LABELS)) is None
+
+
+def test_msgpack_only_on_request():
+    assert wants_msgpack('application/x-msgpack')
+    assert not wants_msgpack('application/json')
+    assert not wants_msgpack(None)
@@ -5,46 +5,106 @@ Pure PyTorch implementation to avoid TensorFlow conflicts
 
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import torch
-from transformers import pipeline
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
 from datetime import datetime
 
+from inference import MODELS, ModelRunner, cache_from_env, error_response, prediction_payload
+from deadlines import enforce_deadlines
+from instrumentation import instrument_flask, stage
+from profiling import register_profiling
+from serving import assign_priorities, respond, run_app
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend communication
 
 # Use a PyTorch-only model to avoid TensorFlow conflicts
-MODEL_NAME = "j-hartmann/emotion-english-distilroberta-base"
+MODEL_NAME = MODELS['text']
+MAX_TEXT_LENGTH = 5000
+MAX_BATCH_TEXTS = 64
+
+
+class TextEmotionRunner(ModelRunner):
+    """DistilRoBERTa emotion classifier loaded with plain PyTorch (no TensorFlow)"""
+
+    name = 'text'
+    stub_labels = ['anger', 'disgust', 'fear', 'joy', 'neutral', 'sadness', 'surprise']
+
+    def load_model(self):
+        self.tokenizer = self.pretrained_processor(AutoTokenizer)
+        model = self.pretrained_model(AutoModelForSequenceClassification)
+        # Emotion labels from the model config, in logit order
+        self.labels = [model.config.id2label[i] for i in range(model.config.num_labels)]
+        return model
+
+    def preprocess(self, texts):
+        return self.tokenizer(texts, padding=True, truncation=True, max_length=512, return_tensors="pt")
+
+    def cache_key(self, text):
+        return text
+
+    def warmup_inputs(self):
+        # A short and a long text, so warm-up covers padding up to the tokenizer limit
+        return [
+            "I am feeling happy today!",
+            "Today started well, but by the afternoon I was tired and a little anxious about tomorrow. " * 24,
+        ]
+
 
 print(f"Loading text emotion recognition model: {MODEL_NAME}")
 
-try:
-    # Force PyTorch framework and avoid TensorFlow entirely
-    classifier = pipeline(
-        "text-classification",
-        model=MODEL_NAME,
-        top_k=None,
-        framework="pt",  # Explicitly use PyTorch
-        device=0 if torch.cuda.is_available() else -1  # Use GPU if available
-    )
-    
+runner = TextEmotionRunner(MODEL_NAME, cache=cache_from_env('text', default_size=1024), max_batch_size=16)
+instrument_flask(app, 'text', runner)
+enforce_deadlines(app, 'text', runner)
+assign_priorities(app)
+register_profiling(app, runner)
+if runner.load():
+    runner.warmup()
     print("✅ Model loaded successfully!")
-    
-    # Emotion labels from the model
-    EMOTION_LABELS = ['anger', 'disgust', 'fear', 'joy', 'neutral', 'sadness', 'surprise']
-    print(f"😊 Emotions: {EMOTION_LABELS}")
-    
-except Exception as e:
-    print(f"❌ Error loading model: {e}")
-    classifier = None
-    EMOTION_LABELS = []
+    print(f"😊 Emotions: {runner.labels}")
+else:
+    print(f"❌ Error loading model: {runner.load_error}")
+
+
+def validate_text(text):
+    """Return (clean_text, error_message)"""
+    text = (text or '').strip()
+    if not text:
+        return text, 'Text cannot be empty'
+    if len(text) > MAX_TEXT_LENGTH:
+        return text, f'Text too long. Maximum {MAX_TEXT_LENGTH} characters.'
+    return text, None
+
+def run_text_analysis(text):
+    """
+    Analyze text and predict emotion without going through HTTP
+
+    Used by the Flask route below and by the gateway's monolith mode.
+    Returns a (payload, status_code) tuple.
+    """
+    if not runner.available:
+        return {
+            'success': False,
+            'error': 'Model not loaded'
+        }, 500
+
+    text, error = validate_text(text)
+    if error:
+        return {
+            'success': False,
+            'error': error
+        }, 400
+
+    predictions = runner.predict(text)
+    return prediction_payload(predictions, text_length=len(text)), 200
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
-        'status': 'healthy' if classifier is not None else 'model_not_loaded',
+        'status': runner.status,
+        'model_state': runner.load_state(),
         'model': MODEL_NAME,
-        'emotions': EMOTION_LABELS,
+        'emotions': runner.labels,
         'timestamp': datetime.now().isoformat(),
         'type': 'text-emotion-analysis'
     })
@@ -54,81 +114,68 @@ def analyze_text():
     """
     Analyze text and predict emotion
     """
-    if classifier is None:
-        return jsonify({
-            'success': False,
-            'error': 'Model not loaded'
-        }), 500
-    
+    if not runner.available:
+        return error_response('Model not loaded', 500)
+
     try:
         # Get text from request
-        data = request.get_json()
-        
+        with stage('decode'):
+            data = request.get_json()
+
         if not data or 'text' not in data:
-            return jsonify({
-                'success': False,
-                'error': 'No text provided. Send JSON with "text" field.'
-            }), 400
-        
-        text = data.get('text', '').strip()
-        
-        if not text:
-            return jsonify({
-                'success': False,
-                'error': 'Text cannot be empty'
-            }), 400
-        
-        if len(text) > 5000:
-            return jsonify({
-                'success': False,
-                'error': 'Text too long. Maximum 5000 characters.'
-            }), 400
-        
-        # Predict emotion using the pipeline
-        results = classifier(text)
-        
-        # Format results - handle different result structures
-        if isinstance(results, list) and len(results) > 0:
-            if isinstance(results[0], list):
-                # Results is a list of lists (top_k format)
-                predictions = [
-                    {
-                        "label": result["label"],
-                        "score": float(result["score"])
-                    }
-                    for result in results[0]
-                ]
+            return error_response('No text provided. Send JSON with "text" field.', 400)
+
+        payload, status = run_text_analysis(data.get('text', ''))
+        if status != 200:
+            return jsonify(payload), status
+
+        return respond(payload, runner.label_index)
+
+    except Exception as e:
+        return error_response(str(e), 500)
+
+@app.route('/api/analyze-batch', methods=['POST'])
+def analyze_batch():
+    """
+    Analyze several texts in one batched forward pass
+    Accepts: JSON with a "texts" list
+    """
+    if not runner.available:
+        return error_response('Model not loaded', 500)
+
+    try:
+        data = request.get_json()
+        texts = data.get('texts') if data else None
+
+        if not isinstance(texts, list) or len(texts) == 0:
+            return error_response('No texts provided. Send JSON with a "texts" list.', 400)
+
+        if len(texts) > MAX_BATCH_TEXTS:
+            return error_response(f'Maximum {MAX_BATCH_TEXTS} texts per batch', 400)
+
+        batch_results = [None] * len(texts)
+        valid_indices = []
+        valid_texts = []
+        for idx, text in enumerate(texts):
+            text, error = validate_text(text if isinstance(text, str) else '')
+            if error:
+                batch_results[idx] = {'success': False, 'error': error, 'index': idx}
             else:
-                # Results is a list of dictionaries
-                predictions = [
-                    {
-                        "label": result["label"],
-                        "score": float(result["score"])
-                    }
-                    for result in results
-                ]
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Unexpected result format from model'
-            }), 500
-        
-        top_emotion = predictions[0]["label"]
-        confidence = predictions[0]["score"]
-        
-        return jsonify({
+                valid_indices.append(idx)
+                valid_texts.append(text)
+
+        if valid_texts:
+            for idx, text, predictions in zip(valid_indices, valid_texts, runner.predict_batch(valid_texts)):
+                batch_results[idx] = prediction_payload(predictions, text_length=len(text), index=idx)
+
+        return respond({
             'success': True,
-            'predictions': predictions,
-            'top_emotion': top_emotion,
-            'confidence': confidence,
-            'text_length': len(text)
-        })
-        
+            'results': batch_results,
+            'total': len(texts)
+        }, runner.label_index)
+
     except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
+        return error_response(str(e), 500)
 
 @app.route('/api/emotions', methods=['GET'])
 def get_emotions():
@@ -137,8 +184,8 @@ def get_emotions():
     """
     return jsonify({
         'success': True,
-        'emotions': EMOTION_LABELS,
-        'count': len(EMOTION_LABELS)
+        'emotions': runner.labels,
+        'count': len(runner.labels)
     })
 
 @app.route('/api/model-info', methods=['GET'])
@@ -150,25 +197,26 @@ def model_info():
         'success': True,
         'model_name': MODEL_NAME,
         'model_type': 'distilroberta-base',
-        'emotions': EMOTION_LABELS,
+        'emotions': runner.labels,
         'max_length': 512,
         'language': 'English',
-        'description': 'Fine-tuned DistilRoBERTa for emotion classification (PyTorch only)'
+        'description': 'Fine-tuned DistilRoBERTa for emotion classification (PyTorch only)',
+        'runner': runner.stats()
     })
 
 if __name__ == '__main__':
     print("\nStarting Text Emotion Analysis Server...")
     print("=" * 60)
     print(f"Model: {MODEL_NAME}")
-    print(f"Emotions: {', '.join(EMOTION_LABELS)}")
+    print(f"Emotions: {', '.join(runner.labels)}")
     print("=" * 60)
     print("\nAvailable endpoints:")
     print("  - GET  /api/health           - Health check")
     print("  - GET  /api/emotions         - List emotions")
     print("  - GET  /api/model-info       - Model details")
     print("  - POST /api/analyze-text     - Analyze single text")
+    print("  - POST /api/analyze-batch    - Analyze multiple texts")
     print("=" * 60)
-    print("\nServer starting on http://127.0.0.1:5001")
     print("Press CTRL+C to quit\n")
-    
-    app.run(debug=True, host='0.0.0.0', port=5001)
\ No newline at end of file
+
+    run_app(app, 'text')
@@ -0,0 +1,126 @@
+"""
+Client-side transport for calling the model services
+Provides HTTP sessions that can reach services over loopback TCP or Unix domain sockets
+"""
+
+import os
+import socket
+import threading
+from urllib.parse import quote, unquote, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool
+
+UNIX_SCHEME = "http+unix://"
+
+# Default TCP ports for each model service
+SERVICE_PORTS = {
+    'audio': 5000,
+    'text': 5001,
+    'face': 5002,
+}
+
+
+def service_socket_path(service_name):
+    """
+    Return the Unix socket path configured for a service, or None for TCP
+
+    Set e.g. TEXT_SERVICE_SOCKET=/tmp/neuropulse-text.sock to enable it.
+    """
+    return os.getenv(f"{service_name.upper()}_SERVICE_SOCKET") or None
+
+
+def service_base_url(service_name):
+    """
+    Return the base URL for a model service
+
+    Uses http+unix://<quoted socket path> when <NAME>_SERVICE_SOCKET is set,
+    then <NAME>_SERVICE_URL, then the default loopback port.
+    """
+    socket_path = service_socket_path(service_name)
+    if socket_path:
+        return UNIX_SCHEME + quote(socket_path, safe="")
+    return os.getenv(
+        f"{service_name.upper()}_SERVICE_URL",
+        f"http://127.0.0.1:{SERVICE_PORTS[service_name]}"
+    )
+
+
+class UnixHTTPConnection(HTTPConnection):
+    """HTTP connection that connects to a Unix domain socket instead of a TCP port"""
+
+    def __init__(self, socket_path, timeout=None, **kwargs):
+        super().__init__("localhost", timeout=timeout, **kwargs)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if isinstance(self.timeout, (int, float)):
+            sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class UnixHTTPConnectionPool(HTTPConnectionPool):
+    """Connection pool whose connections all go to one Unix socket"""
+
+    def __init__(self, socket_path, timeout=None, maxsize=1, block=False):
+        super().__init__("localhost", timeout=timeout, maxsize=maxsize, block=block)
+        self.socket_path = socket_path
+
+    def _new_conn(self):
+        self.num_connections += 1
+        return UnixHTTPConnection(self.socket_path, timeout=self.timeout.connect_timeout)
+
+
+class UnixSocketAdapter(HTTPAdapter):
+    """
+    requests adapter for http+unix:// URLs
+
+    The socket path is the percent-encoded host part of the URL, e.g.
+    http+unix://%2Ftmp%2Fneuropulse-text.sock/api/analyze-text
+    """
+
+    def __init__(self, pool_maxsize=10, **kwargs):
+        self._unix_pools = {}
+        self._unix_pools_lock = threading.Lock()
+        self._unix_pool_maxsize = pool_maxsize
+        super().__init__(pool_maxsize=pool_maxsize, **kwargs)
+
+    def get_connection(self, url, proxies=None):
+        socket_path = unquote(urlparse(url).netloc)
+        with self._unix_pools_lock:
+            pool = self._unix_pools.get(socket_path)
+            if pool is None:
+                pool = UnixHTTPConnectionPool(socket_path, maxsize=self._unix_pool_maxsize)
+                self._unix_pools[socket_path] = pool
+        return pool
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        # Newer requests versions call this instead of get_connection
+        return self.get_connection(request.url, proxies)
+
+    def request_url(self, request, proxies):
+        return request.path_url
+
+    def close(self):
+        with self._unix_pools_lock:
+            for pool in self._unix_pools.values():
+                pool.close()
+            self._unix_pools.clear()
+        super().close()
+
+
+def create_session(pool_maxsize=20):
+    """
+    Create a requests session that reaches services over both TCP and Unix sockets
+
+    The services run on Werkzeug's server, which closes the connection after every
+    response, so each call still opens a new connection on either transport.
+    """
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize))
+    session.mount(UNIX_SCHEME, UnixSocketAdapter(pool_maxsize=pool_maxsize))
+    return session
@@ -0,0 +1,110 @@
+"""
+Compact binary wire format for emotion predictions
+Encodes predictions as label index arrays plus little-endian float32 score vectors in msgpack.
+Labels themselves are sent once through each service's /api/emotions endpoint.
+
+Compact prediction payloads look like:
+    {"success": true, "label_idx": [3, 6, 4, ...], "scores": <float32 bytes>, "confidence": 0.81, ...}
+"top_emotion" is dropped because it is always labels[label_idx[0]].
+"""
+
+import struct
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MIMETYPE = "application/x-msgpack"
+JSON_MIMETYPE = "application/json"
+
+
+def msgpack_available():
+    return msgpack is not None
+
+
+def wants_msgpack(accept_header):
+    """Return True if the Accept header asks for msgpack and msgpack is installed"""
+    return msgpack is not None and MSGPACK_MIMETYPE in (accept_header or "")
+
+
+def is_msgpack(content_type):
+    return MSGPACK_MIMETYPE in (content_type or "")
+
+
+def packb(obj):
+    return msgpack.packb(obj, use_bin_type=True)
+
+
+def unpackb(data):
+    return msgpack.unpackb(data, raw=False)
+
+
+def pack_scores(scores):
+    return struct.pack(f"<{len(scores)}f", *scores)
+
+
+def unpack_scores(data):
+    return list(struct.unpack(f"<{len(data) // 4}f", data))
+
+
+def build_label_index(labels):
+    """Map each label to its position in the list published by /api/emotions"""
+    return {label: idx for idx, label in enumerate(labels)}
+
+
+def compact_payload(payload, label_index):
+    """
+    Return a copy of a response payload with every predictions list in compact form
+
+    Nested batch results (the "results" list) are compacted too. Returns None if a
+    prediction uses a label that is not in the index, so callers can fall back to JSON.
+    """
+    compact = dict(payload)
+
+    predictions = compact.pop('predictions', None)
+    if isinstance(predictions, list):
+        try:
+            compact['label_idx'] = [label_index[p['label']] for p in predictions]
+        except KeyError:
+            return None
+        compact['scores'] = pack_scores([p['score'] for p in predictions])
+        compact.pop('top_emotion', None)
+    elif predictions is not None:
+        compact['predictions'] = predictions
+
+    results = compact.get('results')
+    if isinstance(results, list):
+        compact_results = []
+        for item in results:
+            item = compact_payload(item, label_index) if isinstance(item, dict) else item
+            if item is None:
+                return None
+            compact_results.append(item)
+        compact['results'] = compact_results
+
+    return compact
+
+
+def expand_payload(payload, labels):
+    """Inverse of compact_payload: rebuild the label/score dict lists"""
+    expanded = dict(payload)
+
+    if 'label_idx' in expanded:
+        label_idx = expanded.pop('label_idx')
+        scores = unpack_scores(expanded.pop('scores'))
+        expanded['predictions'] = [
+            {'label': labels[idx], 'score': score}
+            for idx, score in zip(label_idx, scores)
+        ]
+        if label_idx:
+            expanded['top_emotion'] = labels[label_idx[0]]
+
+    results = expanded.get('results')
+    if isinstance(results, list):
+        expanded['results'] = [
+            expand_payload(item, labels) if isinstance(item, dict) else item
+            for item in results
+        ]
+
+    return expanded